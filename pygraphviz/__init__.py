@@ -37,9 +37,37 @@ __graphviz_version__ = (
     f"{GRAPHVIZ_MAJOR_VERSION}.{GRAPHVIZ_MINOR_VERSION}.{GRAPHVIZ_PATCH_VERSION}"
 )
 
-from .agraph import AGraph, Attribute, DotError, Edge, ItemAttribute, Node
+from .agraph import (
+    AGraph,
+    Attribute,
+    DotError,
+    Edge,
+    ItemAttribute,
+    Node,
+    iter_graphs,
+    union,
+)
+from .context import GVContext, get_context, release_context
+from .batch import RenderResult, render_many
+from .cache import LayoutCache, RenderCache
 
-__all__ = ["AGraph", "Attribute", "DotError", "Edge", "ItemAttribute", "Node"]
+__all__ = [
+    "AGraph",
+    "Attribute",
+    "DotError",
+    "Edge",
+    "GVContext",
+    "ItemAttribute",
+    "LayoutCache",
+    "Node",
+    "RenderCache",
+    "RenderResult",
+    "get_context",
+    "iter_graphs",
+    "release_context",
+    "render_many",
+    "union",
+]
 
 from . import testing
 
@@ -2,23 +2,37 @@
 A Python interface to Graphviz.
 """
 
+import array
+import bisect
+import codecs
+import functools
+import hashlib
+import importlib
 import os
 import re
 import shlex
 import subprocess
 import sys
 import threading
+import typing
 import warnings
-from collections.abc import MutableMapping
+from collections.abc import Mapping, MutableMapping
 import tempfile
 import io
 import pathlib
 
 from . import graphviz as gv
+from .context import get_context
 import contextlib
 
 _DEFAULT_ENCODING = "UTF-8"
 
+# how much of a string to look at when guessing whether it is DOT data
+# and which charset it declares
+_SNIFF_SIZE = 65536
+_DOT_START = re.compile(r"(strict)?\s*(graph|digraph)[^{]*{")
+_CHARSET = re.compile(r'charset\s*=\s*"?([\w.:-]+)')
+
 
 class PipeReader(threading.Thread):
     """Read and write pipes using threads."""
@@ -43,10 +57,216 @@ class _Action:
     find, create = 0, 1
 
 
+class _Merge:
+    forward, reverse, both = 0, 1, 2
+
+
 class DotError(ValueError):
     """Dot data parsing error"""
 
 
+# compressed file extensions and the modules that open them, by preference;
+# zstd needs Python 3.14 or the zstandard package
+_COMPRESSION = {
+    ".gz": ("gzip",),
+    ".bz2": ("bz2",),
+    ".xz": ("lzma",),
+    ".lzma": ("lzma",),
+    ".zst": ("compression.zstd", "zstandard"),
+}
+
+
+def _open_compressed(path, mode):
+    # private: open path with the module for its extension in binary mode,
+    # or return None if it is not a compressed file
+    ext = os.path.splitext(os.fspath(path))[1].lower()
+    if ext not in _COMPRESSION:
+        return None
+    mode = mode.replace("t", "").replace("b", "") + "b"
+    for name in _COMPRESSION[ext]:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        return module.open(path, mode)
+    raise ImportError(f"Opening {ext} files requires {' or '.join(_COMPRESSION[ext])}.")
+
+
+def _is_text(fh):
+    # private: whether file object fh reads and writes str instead of bytes
+    if isinstance(fh, io.TextIOBase):
+        return True
+    mode = getattr(fh, "mode", None)
+    return isinstance(mode, str) and "b" not in mode
+
+
+def _open_path(path, mode):
+    # private: the implementation of AGraph._get_fh()
+    if isinstance(path, str | os.PathLike):
+        fh = _open_compressed(path, mode)
+        if fh is None:
+            fh = open(path, mode=mode)
+    elif hasattr(path, "write"):
+        # Note, mode of file handle is unchanged.
+        fh = path
+    elif hasattr(path, "open"):
+        fh = path.open(mode=mode)
+    else:
+        raise TypeError("path must be a string, path, or file handle.")
+    return fh
+
+
+def _binary_source(fh):
+    # private: a binary file object to read the dot data of fh from
+    if not _is_text(fh):
+        return fh
+    encoding = getattr(fh, "encoding", None)
+    if encoding is None:
+        text = fh.read()
+        return io.BytesIO(text.encode(_sniff_charset(text)))
+    return _EncodedReader(fh, encoding)
+
+
+class _EncodedReader:
+    # private: a binary file object over the text file object fh, encoding
+    # its text back to the bytes of the file.  It reads through fh rather
+    # than fh.buffer, which is past the text fh has already read ahead.
+    def __init__(self, fh, encoding):
+        self.fh = fh
+        self.encoding = encoding
+        self.errors = getattr(fh, "errors", None) or "strict"
+
+    def read(self, size=-1):
+        return self.fh.read(size).encode(self.encoding, self.errors)
+
+
+def _is_dot(string):
+    # private: whether string, a str, is dot data rather than a file name.
+    # The start of the graph is looked for in a prefix only; a string
+    # holding a newline or a brace is dot data anyway.
+    if _DOT_START.match(string[:_SNIFF_SIZE]):
+        return True
+    return "\n" in string or "{" in string
+
+
+def _sniff_charset(string):
+    # private: the charset declared near the start of DOT data, a str or
+    # bytes, or the default
+    head = string[:_SNIFF_SIZE]
+    if isinstance(head, bytes):
+        head = head.decode("latin-1")
+    match = _CHARSET.search(head)
+    return match.group(1) if match is not None else _DEFAULT_ENCODING
+
+
+def _as_buffer(values, typecode=None):
+    # private: return values as a one dimensional number buffer if possible.
+    # With a typecode anything else is converted to an array of that type,
+    # otherwise it is returned as is.
+    try:
+        view = memoryview(values)
+    except TypeError:
+        pass
+    else:
+        if view.ndim == 1 and view.format.lstrip("@") in "bBhHiIlLqQfd":
+            if typecode is None or view.format.lstrip("@") not in "fd":
+                return values
+    if typecode is None:
+        return values
+    return array.array(typecode, values)
+
+
+def _from_buffer(buf, typecode, ncols=None):
+    # private: wrap a buffer filled in by Graphviz as a NumPy array, or as
+    # an array.array when NumPy is not installed.  Typecode "?" is one byte
+    # per bool, returned as a list of bools without NumPy.  With ncols the
+    # NumPy array is reshaped to that many columns; array.array stays flat.
+    try:
+        import numpy as np
+    except ImportError:
+        if typecode == "?":
+            return [bool(b) for b in buf]
+        values = array.array(typecode)
+        values.frombytes(buf)
+        return values
+    dtype = {"?": np.bool_, "q": np.int64, "d": np.float64}[typecode]
+    values = np.frombuffer(buf, dtype=dtype)
+    return values if ncols is None else values.reshape(-1, ncols)
+
+
+def _from_list(values):
+    # private: return a list of Python objects as a NumPy object array,
+    # or as is when NumPy is not installed
+    try:
+        import numpy as np
+    except ImportError:
+        return values
+    result = np.empty(len(values), dtype=object)
+    result[:] = values
+    return result
+
+
+class _NameCacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class _NameCache:
+    # private: bounded caches from node names to their encoded bytes and
+    # back, owned by an AGraph.  Only str and int names are cached since
+    # their string form cannot change.  When full the oldest entry is dropped.
+    maxsize = 8192
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        # every charset Graphviz supports is a superset of ASCII
+        self.utf8 = codecs.lookup(encoding).name == "utf-8"
+        self.encoded = {}
+        self.decoded = {}
+        self.hits = self.misses = 0
+
+    def encode(self, n):
+        # not floats or bools: 1.0 and True equal 1 but print differently
+        cached = type(n) is int or isinstance(n, str)
+        if cached:
+            b = self.encoded.get(n)
+            if b is not None:
+                self.hits += 1
+                return b
+        s = n if isinstance(n, str) else str(n)
+        if self.utf8 or s.isascii():
+            b = s.encode()
+        else:
+            b = s.encode(self.encoding)
+        if cached:
+            self.misses += 1
+            if len(self.encoded) >= self.maxsize:
+                del self.encoded[next(iter(self.encoded))]
+            self.encoded[n] = b
+        return b
+
+    def decode(self, b):
+        try:
+            s = self.decoded[b]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            return s
+        self.misses += 1
+        s = b.decode() if self.utf8 or b.isascii() else b.decode(self.encoding)
+        if len(self.decoded) >= self.maxsize:
+            del self.decoded[next(iter(self.decoded))]
+        self.decoded[b] = s
+        return s
+
+    def info(self):
+        size = len(self.encoded) + len(self.decoded)
+        return _NameCacheInfo(self.hits, self.misses, self.maxsize, size)
+
+
 class AGraph:
     """Class for Graphviz agraph type.
 
@@ -103,6 +323,18 @@ class AGraph:
 
       handle:  Swig pointer to an agraph_t data structure
 
+    Thread safety::
+
+      An AGraph, its subgraphs and the Node and Edge objects taken from
+      it must be used by one thread at a time.  Different graphs may be
+      used from different threads.
+
+      layout(), draw(), read() and write() release the GIL while Graphviz
+      works, so other Python threads keep running.  Graphviz itself is not
+      thread-safe, so these calls are serialized: layouts of independent
+      graphs in several threads do not run in parallel.  Use processes
+      for that.
+
     """
 
     def __init__(
@@ -126,6 +358,11 @@ class AGraph:
         # a dict of dicts (or dict of lists) data structure
 
         self.has_layout = False  # avoid creating members outside of init
+        self._node_seqs = None  # cached node order, see _node_order()
+        self._layout = None  # layout arrays, see layout(attributes=False)
+        self._svg = None  # (generation, svg) cached by _svg_repr()
+        self._dot_digest = None  # (generation, digest) cached by _dot_hash()
+        self._generation_floor = 0  # carried over to a new handle, see generation
 
         # backward compability
         filename = attr.pop("file", filename)
@@ -140,9 +377,10 @@ class AGraph:
                 data = thing  # a dictionary of dictionaries (or lists)
             elif hasattr(thing, "own"):  # a Swig pointer - graph handle
                 handle = thing
+            elif isinstance(thing, bytes):
+                string = thing  # dot format data, encoded
             elif isinstance(thing, str):
-                pattern = re.compile(r"(strict)?\s*(graph|digraph).*{.*}\s*", re.DOTALL)
-                if pattern.match(thing):
+                if _is_dot(thing):
                     string = thing  # this is a dot format graph in a string
                 else:
                     filename = thing  # assume this is a file name
@@ -160,14 +398,20 @@ class AGraph:
             self.read(filename)
         elif string is not None:
             # load new graph from string (creates self.handle)
-            # get the charset from the string to properly encode it for
-            # writing to the temporary file in from_string()
-            match = re.search(r'charset\s*=\s*"([^"]+)"', string)
-            if match is not None:
-                self.encoding = match.group(1)
-            else:
-                self.encoding = _DEFAULT_ENCODING
+            # get the charset from the start of the string to properly
+            # encode it for parsing in from_string()
+            self.encoding = _sniff_charset(string)
             self.from_string(string)
+            charset = gv.agget(self.handle, b"charset")
+            if (
+                charset is not None
+                and charset.decode("utf-8").lower() != self.encoding.lower()
+                and isinstance(string, str)
+                and not string.isascii()
+            ):
+                # declared past the start of the string, parse it again
+                self.encoding = charset.decode("utf-8")
+                self.from_string(string)
         else:
             # no handle, need to
             self.handle = None
@@ -182,10 +426,12 @@ class AGraph:
                 )
             else:
                 self.encoding = _DEFAULT_ENCODING
+            self._names = _NameCache(self.encoding)
         else:
             # no handle was specified or created
             # get encoding from the "charset" kwarg
             self.encoding = attr.get("charset", _DEFAULT_ENCODING)
+            self._names = _NameCache(self.encoding)
             try:
                 if name is None:
                     name = ""
@@ -197,7 +443,7 @@ class AGraph:
             # encoding is already set but if it was specified explicitly
             # as an attr, then set it explicitly for the graph
             if "charset" in attr:
-                gv.agattr_label(self.handle, 0, "charset", self.encoding)
+                gv.agattr_label(self.handle, 0, b"charset", self.encoding.encode())
 
             # if data is specified, populate the newly created graph
             if data is not None:
@@ -213,10 +459,56 @@ class AGraph:
             del attr["charset"]
 
         # assign any attributes specified through keywords
-        self.graph_attr = Attribute(self.handle, 0)  # graph attributes
+        self.graph_attr = Attribute(self.handle, 0, self.encoding)  # graph attributes
         self.graph_attr.update(attr)  # apply attributes passed to init
-        self.node_attr = Attribute(self.handle, 1)  # default node attributes
-        self.edge_attr = Attribute(self.handle, 2)  # default edge attribtes
+        # default node and edge attributes
+        self.node_attr = Attribute(self.handle, 1, self.encoding)
+        self.edge_attr = Attribute(self.handle, 2, self.encoding)
+
+    @classmethod
+    def from_edge_arrays(
+        cls, src, dst, edge_attrs=None, name="", strict=True, directed=False, **attr
+    ):
+        """Return a new graph with an edge src[i]-dst[i] for every i.
+
+        src and dst are sequences of integer node ids of the same length,
+        typically NumPy arrays or array.array objects.  Nodes are named by
+        the decimal representation of their ids.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph.from_edge_arrays([0, 1, 2], [1, 2, 0], directed=True)
+        >>> G.edges()
+        [('0', '1'), ('1', '2'), ('2', '0')]
+
+        The optional edge_attrs dictionary maps edge attribute names to
+        sequences of values, one per edge.
+
+        >>> G = pgv.AGraph.from_edge_arrays(
+        ...     [0, 1], [1, 2], edge_attrs={"weight": [0.5, 2]}
+        ... )
+        >>> G.get_edge(1, 2).attr["weight"]
+        '2'
+
+        Integer buffers are read directly, with node names and numeric
+        attribute values formatted in Graphviz, so no Python objects are
+        created per edge.  Other keyword arguments are passed to AGraph.
+        """
+        G = cls(name=name, strict=strict, directed=directed, **attr)
+        src = _as_buffer(src, "q")
+        dst = _as_buffer(dst, "q")
+        if len(src) != len(dst):
+            raise ValueError("src and dst must have the same length.")
+        columns = {}
+        for key, values in (edge_attrs or {}).items():
+            values = _as_buffer(values)
+            if len(values) != len(src):
+                raise ValueError(
+                    f"Edge attribute {key} has {len(values)} values "
+                    f"for {len(src)} edges."
+                )
+            columns[key] = values
+        gv.agedges_from_arrays(G.handle, src, dst, columns, G.encoding.encode())
+        return G
 
     def __enter__(self):
         return self
@@ -235,7 +527,13 @@ class AGraph:
         return f"<AGraph {name} {self.handle}>"
 
     def _svg_repr(self):
-        return self.draw(format="svg").decode(self.encoding)
+        # cached until the graph is modified; drawing itself sets attributes
+        # such as bb, so take the generation afterwards
+        if self._svg is not None and self._svg[0] == self.generation:
+            return self._svg[1]
+        svg = self.draw(format="svg").decode(self.encoding)
+        self._svg = (self.generation, svg)
+        return svg
 
     def _repr_mimebundle_(self, include=None, exclude=None):
         if self.has_layout:
@@ -280,7 +578,7 @@ class AGraph:
 
     def __contains__(self, n):
         # provide "n in G"
-        return self.has_node(n)
+        return gv.agnode_has(self.handle, self._names.encode(n))
 
     def __len__(self):
         return self.number_of_nodes()
@@ -304,6 +602,48 @@ class AGraph:
 
     name = property(get_name)
 
+    @property
+    def generation(self):
+        """A number that increases whenever the graph is modified.
+
+        Adding or removing nodes, edges and subgraphs, setting attributes
+        and replacing the graph, as read(), from_string(), clear(), tred(),
+        acyclic() and unflatten() do, all increase it, so comparing it with
+        an earlier value tells whether the graph may have changed since,
+        without looking at the graph.  Modifying a subgraph counts as
+        modifying the whole graph.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> before = G.generation
+        >>> G.add_edge(1, 2)
+        >>> G.generation > before
+        True
+
+        layout() and draw() store positions and the bounding box in the
+        graph, so they increase it too.
+        """
+        return gv.aggeneration(self.handle)
+
+    def _dot_hash(self):
+        # private: SHA-256 digest of the graph in dot format, computed once
+        # per generation.  A Graphviz context declares the default node
+        # label \N for graphs created after it, and a layout for the graph
+        # it runs on; a graph without the declaration is hashed through a
+        # copy declaring it, so that the digest is the same before and after
+        # the first layout while the graph itself is left alone.
+        generation = self.generation
+        if self._dot_digest is None or self._dot_digest[0] != generation:
+            source = self
+            try:
+                gv.agattr(self.handle, 1, b"label", None)
+            except KeyError:
+                source = self.copy()
+                gv.agattr(source.handle, 1, b"label", b"\\N")
+            data = source.to_string().encode(self.encoding)
+            self._dot_digest = (generation, hashlib.sha256(data).digest())
+        return self._dot_digest[1]
+
     def add_node(self, n, **attr):
         """Add a single node n.
 
@@ -330,17 +670,11 @@ class AGraph:
 
         Anonymous Graphviz nodes are currently not implemented.
         """
-        if not isinstance(n, str):
-            n = str(n)
-        n = n.encode(self.encoding)
-        try:
-            nh = gv.agnode(self.handle, n, _Action.find)
-        except KeyError:
-            nh = gv.agnode(self.handle, n, _Action.create)
+        nh = gv.agnode(self.handle, self._names.encode(n), _Action.create)
         node = Node(self, nh=nh)
         node.attr.update(**attr)
 
-    def add_nodes_from(self, nbunch, **attr):
+    def add_nodes_from(self, nbunch, columns=None, **attr):
         """Add nodes from a container nbunch.
 
         nbunch can be any iterable container such as a list or dictionary
@@ -356,9 +690,31 @@ class AGraph:
         Attributes can be added to nodes on creation or updated after creation
 
         >>> G.add_nodes_from(nlist, color="red")  # set all nodes in nlist red
+
+        Items of nbunch may also be (node, attrdict) pairs
+
+        >>> G.add_nodes_from([("c", {"shape": "box"}), ("d", {"color": "blue"})])
+        >>> G.get_node("c").attr["shape"]
+        'box'
+
+        or attributes can be given per node as columns, a dictionary mapping
+        attribute names to sequences of values in the same order as nbunch
+
+        >>> G.add_nodes_from(["e", "f"], columns={"color": ["red", "green"]})
+        >>> G.get_node("f").attr["color"]
+        'green'
+
+        All nodes and attributes are created in a single call into Graphviz.
         """
-        for n in nbunch:
-            self.add_node(n, **attr)
+        if columns is not None:
+            nbunch = list(nbunch)
+            for name, values in columns.items():
+                if len(values) != len(nbunch):
+                    raise ValueError(
+                        f"Attribute column {name} has {len(values)} values "
+                        f"for {len(nbunch)} nodes."
+                    )
+        gv.agnodes_from(self.handle, nbunch, attr, columns, self.encoding.encode())
 
     def remove_node(self, n):
         """Remove the single node n.
@@ -371,9 +727,7 @@ class AGraph:
         >>> G.add_node("a")
         >>> G.remove_node("a")
         """
-        if not isinstance(n, str):
-            n = str(n)
-        n = n.encode(self.encoding)
+        n = self._names.encode(n)
         try:
             nh = gv.agnode(self.handle, n, _Action.find)
             gv.agdelnode(self.handle, nh)
@@ -398,13 +752,25 @@ class AGraph:
 
     delete_nodes_from = remove_nodes_from
 
-    def nodes_iter(self):
+    def nodes_iter(self, raw=False):
         """Return an iterator over all the nodes in the graph.
 
+        If raw is True the nodes are yielded as plain strings rather
+        than Node objects, which is much faster for large graphs.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_nodes_from(["a", "b"])
+        >>> list(G.nodes_iter(raw=True))
+        ['a', 'b']
+
         Note: modifying the graph structure while iterating over
         the nodes may produce unpredictable results.  Use nodes()
         as an alternative.
         """
+        if raw:
+            yield from gv.agnodenames(self.handle, self.encoding.encode())
+            return
         nh = gv.agfstnode(self.handle)
         while nh is not None:
             yield Node(self, nh=nh)
@@ -439,11 +805,25 @@ class AGraph:
         True
 
         """
-        try:
-            node = Node(self, n)
-            return True
-        except KeyError:
-            return False
+        return gv.agnode_has(self.handle, self._names.encode(n))
+
+    def has_nodes(self, nbunch):
+        """Return whether each node in nbunch is in the graph.
+
+        The result is a boolean NumPy array, or a list of bools if NumPy
+        is not installed, aligned with nbunch.  All lookups are done in a
+        single call into Graphviz.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_nodes_from(["a", "b"])
+        >>> found = G.has_nodes(["a", "c", "b"])
+        >>> [bool(b) for b in found]
+        [True, False, True]
+        """
+        return _from_buffer(
+            gv.agnodes_has(self.handle, nbunch, self.encoding.encode()), "?"
+        )
 
     def get_node(self, n):
         """Return a node object (Node) corresponding to node n.
@@ -455,7 +835,178 @@ class AGraph:
         >>> print(node)
         a
         """
-        return Node(self, n)
+        nh = gv.agnode_find(self.handle, self._names.encode(n))
+        if nh is None:
+            raise KeyError(f"Node {n} not in graph.")
+        return Node(self, nh=nh)
+
+    def _node_order(self):
+        # private: return (seqs, names), the Graphviz sequence numbers and
+        # encoded names of the nodes in node order.  The cache is valid while
+        # the number of nodes and the last sequence number are unchanged:
+        # sequence numbers are never reused, so any other change to the node
+        # set alters one of them.
+        last = gv.aglstnode(self.handle)
+        key = (gv.agnnodes(self.handle), None if last is None else gv.agseq(last))
+        if self._node_seqs is None or self._node_seqs[0] != key:
+            buf, names = gv.agnodeseqs(self.handle)
+            seqs = array.array("Q")
+            seqs.frombytes(buf)
+            self._node_seqs = (key, seqs, names)
+        return self._node_seqs[1:]
+
+    def name_cache_info(self):
+        """Return statistics of the node name cache as a named tuple
+        (hits, misses, maxsize, currsize).
+
+        Node names passed to and returned from the graph are converted
+        between str and the bytes Graphviz stores through a bounded cache
+        owned by the graph.  It is emptied, and its counters reset, by
+        clear(), read() and from_string().
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_node("a")
+        >>> G.has_node("a")  # "a" was encoded by add_node()
+        True
+        >>> G.name_cache_info().hits
+        1
+        """
+        return self._names.info()
+
+    def node_index(self, n):
+        """Return the integer index of node n, its position in nodes().
+
+        Indices are dense (0 to number_of_nodes() - 1) and follow the
+        order in which Graphviz created the nodes.  They stay valid until
+        nodes are added or removed.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_nodes_from(["a", "b", "c"])
+        >>> G.node_index("b")
+        1
+        """
+        seqs, _ = self._node_order()
+        nh = gv.agnode_find(self.handle, self._names.encode(n))
+        if nh is None:
+            raise KeyError(f"Node {n} not in graph.")
+        return bisect.bisect_left(seqs, gv.agseq(nh))
+
+    def node_name(self, i):
+        """Return the name of the node with integer index i.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_nodes_from(["a", "b", "c"])
+        >>> G.node_name(2)
+        'c'
+        """
+        _, names = self._node_order()
+        return self._names.decode(names[i])
+
+    def edge_endpoints(self):
+        """Return arrays (tails, heads) of the integer node indices of the
+        endpoints of every edge, in the order of edges().
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph(directed=True)
+        >>> G.add_edges_from([("a", "b"), ("b", "c"), ("a", "c")])
+        >>> tails, heads = G.edge_endpoints()
+        >>> tails.tolist(), heads.tolist()
+        ([0, 0, 1], [1, 2, 2])
+
+        The arrays are NumPy int64 arrays if NumPy is installed and
+        array.array objects otherwise.  See node_index() and node_name().
+        """
+        tails, heads = gv.agedgeends(self.handle)
+        return _from_buffer(tails, "q"), _from_buffer(heads, "q")
+
+    def get_node_attribute(self, name, default=None):
+        """Return the value of attribute name for every node, in the order
+        of nodes().
+
+        The values are strings, as from node.attr[name], and are returned
+        as a NumPy object array, or a list if NumPy is not installed.  If
+        default is not None it replaces the value of nodes on which the
+        attribute is not set.  If the attribute is not declared at all
+        every value is default.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_node("a", color="red")
+        >>> G.add_node("b")
+        >>> list(G.get_node_attribute("color"))
+        ['red', '']
+        >>> list(G.get_node_attribute("color", default="black"))
+        ['red', 'black']
+        """
+        values = gv.agattrcolumn(
+            self.handle, 1, name.encode(self.encoding), default, self.encoding.encode()
+        )
+        return _from_list(values)
+
+    def get_edge_attribute(self, name, default=None):
+        """Return the value of attribute name for every edge, in the order
+        of edges().
+
+        See get_node_attribute().
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_edge("a", "b", weight=2)
+        >>> G.add_edge("b", "c")
+        >>> list(G.get_edge_attribute("weight", default="1"))
+        ['2', '1']
+        """
+        values = gv.agattrcolumn(
+            self.handle, 2, name.encode(self.encoding), default, self.encoding.encode()
+        )
+        return _from_list(values)
+
+    def set_node_attribute(self, name, values):
+        """Set attribute name on many nodes at once.
+
+        values is either a mapping from nodes to values or a sequence with
+        one value for every node, in the order of nodes().  Values are
+        converted to strings, and HTML-like labels are kept as for
+        node.attr[name] = value.  The attribute is declared once and all
+        values are set in a single call into Graphviz.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_nodes_from(["a", "b", "c"])
+        >>> G.set_node_attribute("color", ["red", "green", "blue"])
+        >>> G.set_node_attribute("shape", {"b": "box"})
+        >>> G.get_node("b").attr["color"], G.get_node("b").attr["shape"]
+        ('green', 'box')
+        """
+        if isinstance(values, Mapping) and not isinstance(values, dict):
+            values = dict(values)
+        gv.agsetattrcolumn(
+            self.handle, 1, name.encode(self.encoding), values, self.encoding.encode()
+        )
+
+    def set_edge_attribute(self, name, values):
+        """Set attribute name on many edges at once.
+
+        values is either a mapping from (u, v) or (u, v, key) edges to
+        values or a sequence with one value for every edge, in the order
+        of edges().  See set_node_attribute().
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_edges_from([("a", "b"), ("b", "c")])
+        >>> G.set_edge_attribute("weight", [1, 2])
+        >>> G.set_edge_attribute("color", {("c", "b"): "red"})
+        >>> G.get_edge("b", "c").attr["color"]
+        'red'
+        """
+        if isinstance(values, Mapping) and not isinstance(values, dict):
+            values = dict(values)
+        gv.agsetattrcolumn(
+            self.handle, 2, name.encode(self.encoding), values, self.encoding.encode()
+        )
 
     def add_edge(self, u, v=None, key=None, **attr):
         """Add a single edge between nodes u and v.
@@ -494,28 +1045,16 @@ class AGraph:
         """
         if v is None:
             (u, v) = u  # no v given, assume u is an edge tuple
-        try:
-            uh = Node(self, u).handle
-        except:
-            self.add_node(u)
-            uh = Node(self, u).handle
-        try:
-            vh = Node(self, v).handle
-        except:
-            self.add_node(v)
-            vh = Node(self, v).handle
+        uh = gv.agnode(self.handle, self._names.encode(u), _Action.create)
+        vh = gv.agnode(self.handle, self._names.encode(v), _Action.create)
         if key is not None:
             if not isinstance(key, str):
                 key = str(key)
             key = key.encode(self.encoding)
-        try:
-            # new
-            eh = gv.agedge(self.handle, uh, vh, key, _Action.create)
-        except KeyError:
-            # for strict graph, or already added
-            eh = gv.agedge(self.handle, uh, vh, key, _Action.find)
-        e = Edge(self, eh=eh)
-        e.attr.update(**attr)
+        # finds the edge instead for a strict graph, or if it was already added
+        eh = gv.agedge_add(self.handle, uh, vh, key)
+        if attr:
+            Edge(self, eh=eh).attr.update(**attr)
 
     def add_edges_from(self, ebunch, **attr):
         """Add nodes to graph from a container ebunch.
@@ -527,12 +1066,28 @@ class AGraph:
         >>> elist = [("a", "b"), ("b", "c")]
         >>> G.add_edges_from(elist)
 
+        Edges may also carry a key, as (u, v, key) tuples
+
+        >>> G = pgv.AGraph(strict=False)
+        >>> G.add_edges_from([("a", "b", "first"), ("a", "b", "second")])
+        >>> sorted(G.edges(keys=True))
+        [('a', 'b', 'first'), ('a', 'b', 'second')]
+
         Attributes can be added when edges are created or updated after creation
 
         >>> G.add_edges_from(elist, color="green")
+
+        Without attributes the edges (and any missing nodes) are created
+        in a single call into Graphviz.
         """
+        if not attr:
+            gv.agedges_from(self.handle, ebunch, self.encoding.encode())
+            return
         for e in ebunch:
-            self.add_edge(e, **attr)
+            if len(e) == 3:
+                self.add_edge(*e, **attr)
+            else:
+                self.add_edge(e, **attr)
 
     def get_edge(self, u, v, key=None):
         """Return an edge object (Edge) corresponding to edge (u,v).
@@ -588,11 +1143,34 @@ class AGraph:
 
         if v is None:
             (u, v) = u  # no v given, assume u is an edge tuple
-        try:
-            Edge(self, u, v, key)
-            return True
-        except KeyError:
-            return False
+        if key is not None:
+            key = str(key).encode(self.encoding)
+        return gv.agedge_has(
+            self.handle, self._names.encode(u), self._names.encode(v), key
+        )
+
+    def has_edges(self, ebunch, keys=None):
+        """Return whether each edge in ebunch is in the graph.
+
+        ebunch is a sequence of (u, v) or (u, v, key) tuples.  If keys is
+        given it is a sequence of edge keys aligned with ebunch, where None
+        matches any edge u-v.  The result is a boolean NumPy array, or a
+        list of bools if NumPy is not installed.  All lookups are done in a
+        single call into Graphviz.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph(strict=False)
+        >>> G.add_edge("a", "b", key="x")
+        >>> found = G.has_edges([("a", "b"), ("b", "c")])
+        >>> [bool(b) for b in found]
+        [True, False]
+        >>> found = G.has_edges([("a", "b"), ("a", "b")], keys=["x", "y"])
+        >>> [bool(b) for b in found]
+        [True, False]
+        """
+        return _from_buffer(
+            gv.agedges_has(self.handle, ebunch, keys, self.encoding.encode()), "?"
+        )
 
     def edges(self, nbunch=None, keys=False):
         """Return list of edges in the graph.
@@ -624,14 +1202,20 @@ class AGraph:
         """
         return self.has_edge(u, v)
 
-    def neighbors_iter(self, n):
+    def neighbors_iter(self, n, raw=False):
         """Return iterator over the nodes attached to n.
 
+        If raw is True the neighbors are yielded as plain strings.
+
         Note: modifying the graph structure while iterating over
         node neighbors may produce unpredictable results.  Use neighbors()
         as an alternative.
         """
         n = Node(self, n)
+        if raw:
+            for s, t, key in self._edge_names(n, 2):
+                yield t if s == n else s
+            return
         nh = n.handle
         eh = gv.agfstedge(self.handle, nh)
         while eh is not None:
@@ -651,16 +1235,50 @@ class AGraph:
 
     iterneighbors = neighbors_iter
 
-    def out_edges_iter(self, nbunch=None, keys=False):
+    def _edge_names(self, nbunch, direction):
+        # private: return a list of (tail, head, key) string tuples for the
+        # out (0), in (1) or all (2) edges of the nodes in nbunch
+        encoding = self.encoding.encode()
+        if nbunch is None:
+            return gv.agedgenames(self.handle, None, direction, encoding)
+        if nbunch in self:
+            nh = Node(self, nbunch).handle
+            return gv.agedgenames(self.handle, nh, direction, encoding)
+        names = []
+        try:
+            bunch = [n for n in nbunch if n in self]
+        except TypeError:
+            raise TypeError("nbunch is not a node or a sequence of nodes.")
+        for n in bunch:
+            nh = Node(self, n).handle
+            names.extend(gv.agedgenames(self.handle, nh, direction, encoding))
+        return names
+
+    def _raw_edges(self, nbunch, direction, keys):
+        # private: edge iterator for raw=True, yielding plain tuples
+        if keys:
+            yield from self._edge_names(nbunch, direction)
+        else:
+            for u, v, key in self._edge_names(nbunch, direction):
+                yield (u, v)
+
+    def out_edges_iter(self, nbunch=None, keys=False, raw=False):
         """Return iterator over out edges in the graph.
 
         If the optional nbunch (container of nodes) only out edges
         adjacent to nodes in nbunch will be returned.
 
+        If raw is True the edges are yielded as plain (u, v) tuples, or
+        (u, v, key) tuples if keys is True, of strings instead of Edge
+        objects.
+
         Note: modifying the graph structure while iterating over
         edges may produce unpredictable results.  Use out_edges()
         as an alternative.
         """
+        if raw:
+            yield from self._raw_edges(nbunch, 0, keys)
+            return
 
         if nbunch is None:  # all nodes
             nh = gv.agfstnode(self.handle)
@@ -718,16 +1336,22 @@ class AGraph:
 
     iteroutedges = out_edges_iter
 
-    def in_edges_iter(self, nbunch=None, keys=False):
+    def in_edges_iter(self, nbunch=None, keys=False, raw=False):
         """Return iterator over out edges in the graph.
 
         If the optional nbunch (container of nodes) only out edges
         adjacent to nodes in nbunch will be returned.
 
+        If raw is True the edges are yielded as plain tuples of strings,
+        as in out_edges_iter().
+
         Note: modifying the graph structure while iterating over
         edges may produce unpredictable results.  Use in_edges()
         as an alternative.
         """
+        if raw:
+            yield from self._raw_edges(nbunch, 1, keys)
+            return
         if nbunch is None:  # all nodes
             nh = gv.agfstnode(self.handle)
             while nh is not None:
@@ -782,16 +1406,41 @@ class AGraph:
                     except StopIteration:
                         break
 
-    def edges_iter(self, nbunch=None, keys=False):
+    def edges_iter(self, nbunch=None, keys=False, raw=False):
         """Return iterator over edges in the graph.
 
         If the optional nbunch (container of nodes) only edges
         adjacent to nodes in nbunch will be returned.
 
+        If raw is True the edges are yielded as plain (u, v) tuples, or
+        (u, v, key) tuples if keys is True, of strings instead of Edge
+        objects.  This avoids creating an Edge and two Node objects per
+        edge.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph(strict=False)
+        >>> G.add_edge("a", "b", key="x")
+        >>> list(G.edges_iter(raw=True, keys=True))
+        [('a', 'b', 'x')]
+
         Note: modifying the graph structure while iterating over
         edges may produce unpredictable results.  Use edges()
         as an alternative.
         """
+        if raw:
+            if nbunch is None or nbunch in self:
+                # out-edges then in-edges, each self-loop once
+                direction = 0 if nbunch is None else 2
+                yield from self._raw_edges(nbunch, direction, keys)
+                return
+            used = set()
+            for e in self._edge_names(nbunch, 0):
+                used.add(e)
+                yield e if keys else e[:2]
+            for e in self._edge_names(nbunch, 1):
+                if e not in used:
+                    yield e if keys else e[:2]
+            return
         if nbunch is None:  # all nodes
             for e in self.out_edges_iter(keys=keys):
                 yield e
@@ -799,7 +1448,7 @@ class AGraph:
             for e in self.out_edges_iter(nbunch, keys=keys):
                 yield e
             for e in self.in_edges_iter(nbunch, keys=keys):
-                if e != (nbunch, nbunch):
+                if e[0] != e[1]:  # self-loops were yielded as out-edges
                     yield e
         else:  # a group of nodes
             used = set()
@@ -950,21 +1599,7 @@ class AGraph:
     def reverse(self):
         """Return copy of directed graph with edge directions reversed."""
         if self.directed:
-            # new empty DiGraph
-            H = self.__class__(strict=self.strict, directed=True, name=self.name)
-            H.graph_attr.update(self.graph_attr)
-            H.node_attr.update(self.node_attr)
-            H.edge_attr.update(self.edge_attr)
-            for n in self.nodes():
-                H.add_node(n)
-                new_n = Node(H, n)
-                new_n.attr.update(n.attr)
-            for e in self.edges():
-                (u, v) = e
-                H.add_edge(v, u)
-                uv = H.get_edge(v, u)
-                uv.attr.update(e.attr)
-            return H
+            return self._copy(self.__class__, True, _Merge.reverse, name=self.name)
         else:
             return self
 
@@ -990,6 +1625,67 @@ class AGraph:
         """Return the number of edges in the graph."""
         return gv.agnedges(self.handle)
 
+    def to_csr(self, edge_attrs=None, default=float("nan")):
+        """Return the adjacency structure in compressed sparse row form.
+
+        Returns a tuple (indptr, indices, nodes, values).  The neighbors of
+        nodes[i] are nodes[indices[indptr[i]:indptr[i + 1]]]; directed graphs
+        list successors and undirected graphs list every edge at both ends.
+        values maps each attribute named in edge_attrs to an array of floats
+        aligned with indices, holding default where the attribute is unset
+        or not a number.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph(directed=True)
+        >>> G.add_edge("a", "b", weight=2)
+        >>> G.add_edge("a", "c")
+        >>> indptr, indices, nodes, values = G.to_csr(["weight"])
+        >>> indptr.tolist(), indices.tolist(), nodes
+        ([0, 2, 2, 2], [1, 2], ['a', 'b', 'c'])
+        >>> values["weight"].tolist()
+        [2.0, nan]
+
+        The arrays are NumPy arrays if NumPy is installed and array.array
+        objects otherwise.  They are filled in a single walk of the graph
+        without creating Python objects per edge.
+        """
+        edge_attrs = list(edge_attrs or [])
+        indptr, indices, names, columns = gv.agcsr(
+            self.handle, [a.encode(self.encoding) for a in edge_attrs], default
+        )
+        nodes = [n.decode(self.encoding) for n in names]
+        values = {
+            a: _from_buffer(c, "d") for a, c in zip(edge_attrs, columns, strict=True)
+        }
+        return _from_buffer(indptr, "q"), _from_buffer(indices, "q"), nodes, values
+
+    def to_sparse(self, weight=None, default=1.0):
+        """Return the adjacency matrix as a SciPy sparse CSR array.
+
+        Rows and columns follow the order of nodes().  Entries are 1, or the
+        value of the edge attribute weight if given (default where unset).
+        Parallel edges give duplicate entries.  See to_csr() for the
+        underlying arrays and node names.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_edge("a", "b")
+        >>> G.to_sparse().toarray()  # doctest: +SKIP
+        array([[0., 1.],
+               [1., 0.]])
+
+        Requires SciPy.
+        """
+        import numpy as np
+        import scipy.sparse
+
+        edge_attrs = [] if weight is None else [weight]
+        indptr, indices, nodes, values = self.to_csr(edge_attrs, default)
+        data = values[weight] if weight is not None else np.ones(len(indices))
+        return scipy.sparse.csr_array(
+            (data, indices, indptr), shape=(len(nodes), len(nodes))
+        )
+
     def clear(self):
         """Remove all nodes, edges, and attributes from the graph."""
         self.remove_edges_from(self.edges())
@@ -1011,6 +1707,8 @@ class AGraph:
         # this should completely remove all of the existing graphviz data
         if self._owns_handle:
             if self.handle is not None:
+                # carried over to the next handle, see generation
+                self._generation_floor = gv.aggeneration(self.handle) + 1
                 gv.agclose(self.handle)
                 self.handle = None
             self._owns_handle = False
@@ -1023,22 +1721,64 @@ class AGraph:
         Notes
         =====
         Versions <=1.6 made a copy by writing and the reading a dot string.
-        This version loads a new graph with nodes, edges and attributes.
+        Versions <=2.0 loaded a new graph with nodes, edges and attributes.
+        This version copies the graph in Graphviz, including its subgraphs,
+        like concat() into an empty graph.
         """
-        G = self.__class__(
-            directed=self.is_directed(), strict=self.strict, name=self.name
-        )
-        for node in self.nodes():
-            G.add_node(node)
-            G.get_node(node).attr.update(self.get_node(node).attr)
-        for edge in self.edges(keys=True):
-            G.add_edge(*edge)
-            G.get_edge(*edge).attr.update(self.get_edge(*edge).attr)
-        G.graph_attr.update(self.graph_attr)
-        G.node_attr.update(self.node_attr)
-        G.edge_attr.update(self.edge_attr)
+        return self._copy(self.__class__, self.directed, _Merge.forward, name=self.name)
+
+    def _copy(self, cls, directed, direction, **attr):
+        # private: a new graph of class cls with the contents of this one,
+        # its edges as they are, reversed or both ways, see _Merge
+        if gv.agget(self.handle, b"charset"):
+            attr["charset"] = self.encoding
+        G = cls(strict=self.strict, directed=directed, **attr)
+        gv.agmerge(G.handle, self.handle, direction)
         return G
 
+    def concat(self, thing):
+        """Merge the graphs in thing into this graph.
+
+        thing can be an AGraph, a string of dot format data, or a file
+        name, pathlib.Path or file object holding any number of graphs
+        (see iter_graphs()).  The merge runs in Graphviz, without a call
+        into Python per node or edge.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph("digraph { a -> b [color=red] }")
+        >>> G.concat("digraph { rankdir=LR; a -> b [style=bold]; b -> c }")
+        >>> G.edges()
+        [('a', 'b'), ('b', 'c')]
+        >>> G.get_edge("a", "b").attr["color"], G.get_edge("a", "b").attr["style"]
+        ('red', 'bold')
+
+        Subgraphs and nodes are matched by name and edges by their nodes
+        and key.  Edges without a key match by position among the parallel
+        edges between the same nodes, so merging the same graph again
+        changes nothing, while anonymous subgraphs are always added.
+        Where values conflict the merged graph wins:
+
+        - its graph attributes and attribute defaults (node [...] and
+          edge [...]) replace those of this graph, existing nodes and
+          edges keep their values,
+        - node, edge and subgraph attributes it sets replace existing
+          values,
+        - empty values and values equal to its defaults count as not set
+          and never replace existing ones.
+
+        This graph keeps its name, strictness and directedness: in a
+        strict graph parallel edges collapse into one, and undirected
+        edges merged into a directed graph point from the node they were
+        written with first.  The graphs must have the same encoding.
+        """
+        for H in _graphs_of(thing):
+            if codecs.lookup(H.encoding).name != codecs.lookup(self.encoding).name:
+                raise ValueError(
+                    f"cannot merge a graph encoded in {H.encoding} "
+                    f"into one encoded in {self.encoding}"
+                )
+            gv.agmerge(self.handle, H.handle, _Merge.forward)
+
     def add_path(self, nlist):
         """Add the path of nodes given in nlist."""
         fromv = nlist.pop(0)
@@ -1102,6 +1842,7 @@ class AGraph:
         if handle is None:
             raise KeyError(f"Subgraph {name} not in graph.")
         gv.agdelsubg(self.handle, handle)
+        gv.agtouch(self.handle)  # agdelsubg() only unlinks, without callbacks
 
     delete_subgraph = remove_subgraph
 
@@ -1183,20 +1924,7 @@ class AGraph:
         if not self.directed:
             return self.copy()
         else:
-            U = AGraph(strict=self.strict)
-            U.graph_attr.update(self.graph_attr)
-            U.node_attr.update(self.node_attr)
-            U.edge_attr.update(self.edge_attr)
-            for n in self.nodes():
-                U.add_node(n)
-                new_n = Node(U, n)
-                new_n.attr.update(n.attr)
-            for e in self.edges():
-                (u, v) = e
-                U.add_edge(u, v)
-                uv = U.get_edge(u, v)
-                uv.attr.update(e.attr)
-            return U
+            return self._copy(AGraph, False, _Merge.forward)
 
     def to_directed(self, **kwds):
         """Return directed copy of graph.
@@ -1205,24 +1933,7 @@ class AGraph:
         edges u->v and v->u.
         """
         if not self.directed:
-            D = AGraph(strict=self.strict, directed=True)
-            D.graph_attr.update(self.graph_attr)
-            D.node_attr.update(self.node_attr)
-            D.edge_attr.update(self.edge_attr)
-            for n in self.nodes():
-                D.add_node(n)
-                new_n = Node(D, n)
-                new_n.attr.update(n.attr)
-            for e in self.edges():
-                (u, v) = e
-                D.add_edge(u, v)
-                D.add_edge(v, u)
-                uv = D.get_edge(u, v)
-                vu = D.get_edge(v, u)
-                uv.attr.update(e.attr)
-                uv.attr.update(e.attr)
-                vu.attr.update(e.attr)
-            return D
+            return self._copy(AGraph, True, _Merge.both)
         else:
             return self.copy()
 
@@ -1230,23 +1941,35 @@ class AGraph:
     def read(self, path):
         """Read graph from dot format file on path.
 
-        path can be a file name or file handle
+        path can be a file name, a pathlib.Path or a file object.  Files
+        with a compressed file extension ('.gz', '.bz2', '.xz', '.lzma' or
+        '.zst') are decompressed while reading, and the graph is read from
+        file objects such as gzip.GzipFile in chunks.
 
         use::
 
            G.read("file.dot")
+           G.read("file.dot.gz")
 
+        Only the first graph in the file is read, see iter_graphs() for
+        files holding more than one.
+
+        The read() method of a file object is called while Graphviz parses,
+        so it must not read, write, lay out or render graphs itself: that
+        raises RuntimeError.
         """
-        fh = self._get_fh(path)
+        fh = self._get_fh(path, "rb")
         try:
+            source = _binary_source(fh)
             self._close_handle()
             try:
-                self.handle = gv.agread(fh, None)
+                self.handle = gv.agreadnext(gv.agreader(source))
             except ValueError:
                 raise DotError("Invalid Input")
-            else:
-                self._owns_handle = True
-                self._update_handle_references()
+            if self.handle is None:
+                raise DotError("Invalid Input: no graph found")
+            self._owns_handle = True
+            self._update_handle_references()
         except OSError:
             print("IO error reading file")
         finally:
@@ -1256,7 +1979,12 @@ class AGraph:
     def write(self, path=None):
         """Write graph in dot format to file on path.
 
-        path can be a file name or file handle
+        path can be a file name, a pathlib.Path or a file object opened in
+        text or binary mode, such as io.StringIO or io.BytesIO.  If it is
+        None the graph is written to sys.stdout.  Files with a compressed
+        file extension are compressed as in read(), and binary file
+        objects are written in chunks.  Their write() method must not
+        read, write, lay out or render graphs, see read().
 
         use::
 
@@ -1264,12 +1992,17 @@ class AGraph:
         """
         if path is None:
             path = sys.stdout
-        fh = self._get_fh(path, "w")
         # NOTE: TemporaryFile objects are not instances of IOBase on windows.
-        if not isinstance(fh, io.IOBase | tempfile._TemporaryFileWrapper):
-            raise TypeError(f"{fh} is not a file handle")
+        if hasattr(path, "write") and not isinstance(
+            path, io.IOBase | tempfile._TemporaryFileWrapper
+        ):
+            raise TypeError(f"{path} is not a file handle")
+        fh = self._get_fh(path, "wb")
         try:
-            gv.agwrite(self.handle, fh)
+            if _is_text(fh):
+                fh.write(gv.agwritebytes(self.handle).decode(self.encoding))
+            else:
+                gv.agwritestream(self.handle, fh)
         except OSError:
             print("IO error writing file")
         finally:
@@ -1279,7 +2012,7 @@ class AGraph:
     def string_nop(self):
         """Return a string (unicode) representation of graph in dot format."""
         # this will fail for graphviz-2.8 because of a broken nop
-        # so use tempfile version below
+        # so use the agwrite version below
         return self.draw(format="dot", prog="nop").decode(self.encoding)
 
     def to_string(self):
@@ -1287,13 +2020,10 @@ class AGraph:
 
         `to_string()` uses "agwrite" to produce "dot" format w/o rendering.
         The function `string_nop()` layouts with "nop" and renders to "dot".
+
+        The graph is written to memory, without a temporary file.
         """
-        fh = tempfile.TemporaryFile()
-        self.write(fh)
-        fh.seek(0)
-        data = fh.read()
-        fh.close()
-        return data.decode(self.encoding)
+        return gv.agwritebytes(self.handle).decode(self.encoding)
 
     def string(self):
         """Return a string (unicode) representation of graph in dot format."""
@@ -1313,16 +2043,20 @@ class AGraph:
         >>> t = A.from_string(s)
         >>> A = pgv.AGraph(string=s)  # specify s is a string
         >>> A = pgv.AGraph(s)  # s assumed to be a string during initialization
+
+        string may also be bytes in the charset of the graph.  It is parsed
+        from memory, without a temporary file.
         """
         # allow either unicode or encoded string
-        with contextlib.suppress(UnicodeEncodeError, AttributeError):
-            string = string.decode(self.encoding)
-        from tempfile import TemporaryFile
-
-        with TemporaryFile() as fh:
-            fh.write(string.encode(self.encoding))
-            fh.seek(0)
-            self.read(fh)
+        if isinstance(string, str):
+            string = string.encode(self.encoding)
+        self._close_handle()
+        try:
+            self.handle = gv.agmemread(string)
+        except ValueError:
+            raise DotError("Invalid Input")
+        self._owns_handle = True
+        self._update_handle_references()
         return self
 
     def _get_prog(self, prog):
@@ -1475,7 +2209,7 @@ class AGraph:
         else:
             return self.from_string(data)
 
-    def layout(self, prog="neato", args=""):
+    def layout(self, prog="neato", args="", attributes=True, context=None, cache=None):
         """Assign positions to nodes in graph.
 
         Optional prog=['neato'|'dot'|'twopi'|'circo'|'fdp'|'nop']
@@ -1496,29 +2230,168 @@ class AGraph:
         when rendering, it will take node positions from the AGraph attributes.
         If you use prog="nop2" it will take node and edge positions from the
         AGraph when rendering.
+
+        With attributes=False the positions are not written back as the
+        pos, width, height and bb attributes.  Instead node_positions(),
+        node_sizes(), edge_splines() and bounding_box() return the layout
+        as computed, read straight from Graphviz, until nodes or edges are
+        added or removed.  This skips formatting and storing the layout as
+        strings, which is a large share of the cost for big graphs.
+
+        >>> A.layout(prog="dot", attributes=False)
+        >>> positions, nodes = A.node_positions()
+        >>> nodes
+        ['1', '2']
+
+        The layout runs in the Graphviz context given as context, a
+        GVContext, or else in the default context of the calling thread.
+
+        If cache is a LayoutCache, a layout of the same graph with the same
+        prog and args found in it is restored instead of computed, and a
+        computed layout is added to it.
+
+        >>> cache = pgv.LayoutCache()
+        >>> A.layout(prog="dot", cache=cache)
+        >>> cache.info().misses
+        1
         """
         _, prog = self._manually_parse_args(args, None, prog)
 
+        if cache is not None:
+            key = cache.key(self, prog, args, attributes)
+            if cache._restore(key, self, attributes):
+                return
+
         # convert input strings to type bytes (encode it)
         if isinstance(prog, str):
             prog = prog.encode(self.encoding)
 
-        gvc = gv.gvContextWithBuiltins()
-        retval = gv.gvLayout(gvc, self.handle, prog)
-        # gvLayout returns -1 if `prog` is not a valid program.
-        # TODO: Check other possible return values from gvLayout
-        # TODO: Catch/suppress msg on stderr from graphviz
-        if retval == -1:
-            raise ValueError(f"Program {prog} is not a valid layout program.")
-        gv.gvRender(gvc, self.handle, format=b"dot")
+        with (context or get_context())._use() as gvc:
+            retval = gv.gvLayout(gvc, self.handle, prog)
+            # gvLayout returns -1 if `prog` is not a valid program.
+            # TODO: Check other possible return values from gvLayout
+            # TODO: Catch/suppress msg on stderr from graphviz
+            if retval == -1:
+                raise ValueError(f"Program {prog} is not a valid layout program.")
+            try:
+                if attributes:
+                    gv.gvRender(gvc, self.handle, format=b"dot")
+                    self._layout = None
+                else:
+                    arrays = gv.aglayoutarrays(self.handle)
+                    self._layout = (self._structure_key(), arrays)
+            finally:
+                gv.gvFreeLayout(gvc, self.handle)
+
+        self.has_layout = attributes
+        if cache is not None:
+            cache._save(key, self, attributes)
+        return
 
-        gv.gvFreeLayout(gvc, self.handle)
-        gv.gvFreeContext(gvc)
+    def _structure_key(self):
+        # private: a value that changes when nodes or edges are added or
+        # removed, see _node_order()
+        last = gv.aglstnode(self.handle)
+        return (
+            gv.agnnodes(self.handle),
+            gv.agnedges(self.handle),
+            None if last is None else gv.agseq(last),
+        )
 
-        self.has_layout = True
-        return
+    def _layout_arrays(self):
+        # private: the arrays read by layout(attributes=False), or None if
+        # there are none or the graph has changed since
+        if self._layout is None or self._layout[0] != self._structure_key():
+            return None
+        return self._layout[1]
+
+    def node_positions(self):
+        """Return (positions, nodes), the coordinates of the nodes after
+        layout() and the node names in the same order as nodes().
+
+        positions is an (N, 2) float array of the x, y coordinates, in
+        points, parsed from the pos attribute of each node.  Nodes without
+        a position are NaN.  After layout(attributes=False) the coordinates
+        come from the layout itself instead.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_node("a", pos="1,2!")
+        >>> G.add_node("b", pos="3.5,4")
+        >>> positions, nodes = G.node_positions()
+        >>> nodes
+        ['a', 'b']
+        >>> positions.tolist()  # doctest: +SKIP
+        [[1.0, 2.0], [3.5, 4.0]]
+
+        positions is a NumPy array if NumPy is installed and a flat
+        array.array (x0, y0, x1, y1, ...) otherwise.
+        The attributes are parsed in a single pass without creating Python
+        objects per node.
+        """
+        native = self._layout_arrays()
+        if native is not None:
+            positions = native[0]
+        else:
+            positions = gv.agattrfloats(self.handle, 1, [b"pos"], 2)
+        return _from_buffer(positions, "d", 2), list(self.nodes_iter(raw=True))
+
+    def node_sizes(self):
+        """Return an (N, 2) float array of the width and height of the
+        nodes, in inches, in the order of nodes().
+
+        Missing values are NaN.  See node_positions().
+        """
+        native = self._layout_arrays()
+        if native is not None:
+            sizes = native[1]
+        else:
+            sizes = gv.agattrfloats(self.handle, 1, [b"width", b"height"], 1)
+        return _from_buffer(sizes, "d", 2)
+
+    def edge_splines(self):
+        """Return (points, offsets), the spline control points of the edges
+        after layout(), in the order of edges().
+
+        points is a (P, 2) float array of x, y coordinates parsed from the
+        pos attribute of the edges, and the points of edge i are
+        points[offsets[i]:offsets[i + 1]].  Arrowhead end points ("s,x,y"
+        and "e,x,y") are left out.
+
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph()
+        >>> G.add_edge("a", "b", pos="e,4,4 0,0 1,1 2,2 3,3")
+        >>> points, offsets = G.edge_splines()
+        >>> offsets.tolist()
+        [0, 4]
+
+        The arrays are NumPy arrays if NumPy is installed and flat
+        array.array objects otherwise.
+        """
+        native = self._layout_arrays()
+        if native is not None:
+            points, offsets = native[2:4]
+        else:
+            points, offsets = gv.agsplinepoints(self.handle)
+        return _from_buffer(points, "d", 2), _from_buffer(offsets, "q")
+
+    def bounding_box(self):
+        """Return the bounding box of the graph after layout() as a float
+        array (llx, lly, urx, ury) in points, NaN if there is none.
 
-    def draw(self, path=None, format=None, prog=None, args=""):
+        >>> import pygraphviz as pgv
+        >>> G = pgv.AGraph(bb="0,0,54,108")
+        >>> G.bounding_box().tolist()
+        [0.0, 0.0, 54.0, 108.0]
+        """
+        native = self._layout_arrays()
+        if native is not None:
+            return _from_buffer(native[4], "d")
+        return _from_buffer(gv.agattrfloats(self.handle, 0, [b"bb"], 4), "d")
+
+    def draw(
+        self, path=None, format=None, prog=None, args="", context=None, cache=None
+    ):
         """Output graph to path in specified format.
 
         An attempt will be made to guess the output format based on the file
@@ -1566,6 +2439,16 @@ class AGraph:
 
         The layout might take a long time on large graphs.
 
+        As for layout(), the optional context is the GVContext to use
+        instead of the default context of the calling thread.
+
+        If cache is a RenderCache, output of the same graph in the same
+        format with the same prog and args found in it is returned, or
+        written to path, without a layout or rendering, and new output is
+        added to it.
+
+        >>> cache = pgv.RenderCache()
+        >>> svg = G.draw(format="svg", prog="dot", cache=cache)
         """
         # try to guess format from extension
         if format is None and path is not None:
@@ -1596,6 +2479,27 @@ class AGraph:
         # process args
         format, prog = self._manually_parse_args(args, format, prog)
 
+        if cache is not None:
+            key = cache.key(self, format, prog, args)
+            data = cache._lookup(key)
+            if data is None:
+                data = self.draw(format=format, prog=prog, context=context)
+                cache._put(key, data)
+                # the layout can leave attributes such as bb on the graph,
+                # so keep the output for the graph as it is now as well
+                changed = cache.key(self, format, prog, args)
+                if changed != key:
+                    cache._put(changed, data)
+            if path is None:
+                return data
+            fh = self._get_fh(path, "wb")
+            try:
+                fh.write(data)
+            finally:
+                if not hasattr(path, "write"):
+                    fh.close()
+            return
+
         # convert input strings to type bytes (encode it)
         if isinstance(format, str):
             format = format.encode(self.encoding)
@@ -1603,36 +2507,43 @@ class AGraph:
             prog = prog.encode(self.encoding)
 
         # Start the drawing
-        gvc = gv.gvContextWithBuiltins()
-        G = self.handle
-
-        # Layout
-        err = gv.gvLayout(gvc, G, prog)
-        if err:
-            if err != -1:
-                raise ValueError("Graphviz raised a layout error.")
-            prog = prog.decode(self.encoding)
-            raise ValueError(f"Can't find prog={prog} in this graphviz installation")
-
-        # Render
-        if path is None:
-            out = gv.gvRenderData(gvc, G, format)
-            if out[0]:
-                raise ValueError(f"Graphviz Error creating dot representation:{out[0]}")
-            err, dot_string = out
-            gv.gvFreeLayout(gvc, G)
-            gv.gvFreeContext(gvc)
-            return dot_string
-
-        # path is string holding the filename, a file handle, or pathlib.Path
-        fh = self._get_fh(path, "wb")
-        err = gv.gvRender(gvc, G, format, fh)
-        if err:
-            raise ValueError("Graphviz raised a render error. Maybe bad format?")
-        if isinstance(path, str):
-            fh.close()
-        gv.gvFreeLayout(gvc, G)
-        gv.gvFreeContext(gvc)
+        with (context or get_context())._use() as gvc:
+            G = self.handle
+
+            # Layout
+            err = gv.gvLayout(gvc, G, prog)
+            if err:
+                if err != -1:
+                    raise ValueError("Graphviz raised a layout error.")
+                prog = prog.decode(self.encoding)
+                raise ValueError(
+                    f"Can't find prog={prog} in this graphviz installation"
+                )
+
+            try:
+                # Render
+                if path is None:
+                    out = gv.gvRenderData(gvc, G, format)
+                    if isinstance(out, int):  # no data, e.g. for a bad format
+                        out = [out]
+                    if out[0]:
+                        raise ValueError(
+                            f"Graphviz Error creating dot representation:{out[0]}"
+                        )
+                    err, dot_string = out
+                    return dot_string
+
+                # path is string holding the filename, a file handle, or pathlib.Path
+                fh = self._get_fh(path, "wb")
+                err = gv.gvRender(gvc, G, format, fh)
+                if err:
+                    raise ValueError(
+                        "Graphviz raised a render error. Maybe bad format?"
+                    )
+                if isinstance(path, str):
+                    fh.close()
+            finally:
+                gv.gvFreeLayout(gvc, G)
 
     # some private helper functions
 
@@ -1665,29 +2576,11 @@ class AGraph:
         """Return a file handle for given path.
 
         Path can be a string, pathlib.Path, or a file handle.
-        Attempt to uncompress/compress files ending in '.gz' and '.bz2'.
+        Files ending in '.gz', '.bz2', '.xz', '.lzma' and '.zst' are
+        opened for (de)compression in binary mode.  '.zst' files need
+        Python 3.14 or the zstandard package.
         """
-        import os
-
-        if isinstance(path, str):
-            if path.endswith(".gz"):
-                # import gzip
-                # fh = gzip.open(path,mode=mode)  # doesn't return real fh
-                fh = os.popen("gzcat " + path)  # probably not portable
-            elif path.endswith(".bz2"):
-                # import bz2
-                # fh = bz2.BZ2File(path,mode=mode) # doesn't return real fh
-                fh = os.popen("bzcat " + path)  # probably not portable
-            else:
-                fh = open(path, mode=mode)
-        elif hasattr(path, "write"):
-            # Note, mode of file handle is unchanged.
-            fh = path
-        elif hasattr(path, "open"):
-            fh = path.open(mode=mode)
-        else:
-            raise TypeError("path must be a string, path, or file handle.")
-        return fh
+        return _open_path(path, mode)
 
     def _which(self, name):
         """Searches for name in exec path and returns full path"""
@@ -1742,6 +2635,16 @@ class AGraph:
         return env
 
     def _update_handle_references(self):
+        self._node_seqs = None
+        self._layout = None
+        self._svg = None
+        self._dot_digest = None
+        if self.handle is not None and self._generation_floor:
+            # replaces a closed handle, continue from its generation once
+            if gv.aggeneration(self.handle) < self._generation_floor:
+                gv.agsetgeneration(self.handle, self._generation_floor)
+            self._generation_floor = 0
+        self._names = _NameCache(getattr(self, "encoding", _DEFAULT_ENCODING))
         try:
             self.graph_attr.handle = self.handle
             self.node_attr.handle = self.handle
@@ -1750,6 +2653,79 @@ class AGraph:
             pass  # ignore as likely still in __init__()
 
 
+def iter_graphs(path):
+    """Iterate over the graphs in a dot format file holding any number of
+    them, one after another.
+
+    path can be a file name, a pathlib.Path or a file object, and
+    compressed files are decompressed, as for AGraph.read().  The graphs
+    are parsed one at a time as the iteration advances, so memory use
+    does not grow with the number of graphs in the file.
+
+    >>> import io
+    >>> import pygraphviz as pgv
+    >>> data = io.StringIO("graph a { x }\\ndigraph b { y -> z }\\n")
+    >>> [(G.name, G.directed) for G in pgv.iter_graphs(data)]
+    [('a', False), ('b', True)]
+
+    Graphviz reads its input a line at a time, so a graph is skipped if it
+    starts on the line where the previous one ends.  A file with invalid
+    data raises DotError when the iteration reaches it.
+    """
+    fh = _open_path(path, "rb")
+    try:
+        reader = gv.agreader(_binary_source(fh))
+        while True:
+            try:
+                handle = gv.agreadnext(reader)
+            except ValueError:
+                raise DotError("Invalid Input")
+            if handle is None:
+                return
+            G = AGraph(handle=handle)
+            G._owns_handle = True
+            yield G
+    finally:
+        if hasattr(fh, "close") and not hasattr(path, "write"):
+            fh.close()
+
+
+def union(graphs):
+    """Return a new graph merging all graphs in the iterable graphs.
+
+    The items can be anything AGraph.concat() accepts, AGraph objects,
+    strings of dot format data, or files holding one or more graphs, and
+    are merged in order by the rules of AGraph.concat().  The new graph
+    has the name, strictness and directedness of the first graph.
+
+    >>> import pygraphviz as pgv
+    >>> parts = ["digraph svc { a -> b }", "digraph { b -> c; a -> b }"]
+    >>> G = pgv.union(parts)
+    >>> G.name, G.edges()
+    ('svc', [('a', 'b'), ('b', 'c')])
+    """
+    G = None
+    for thing in graphs:
+        for H in _graphs_of(thing):
+            if G is None:
+                G = H._copy(AGraph, H.directed, _Merge.forward, name=H.name)
+            else:
+                G.concat(H)
+    return G if G is not None else AGraph()
+
+
+def _graphs_of(thing):
+    # private: the graphs in thing, as accepted by AGraph.concat()
+    if isinstance(thing, AGraph):
+        yield thing
+    elif isinstance(thing, bytes):
+        yield from iter_graphs(io.BytesIO(thing))
+    elif isinstance(thing, str) and _is_dot(thing):
+        yield from iter_graphs(io.StringIO(thing))
+    else:
+        yield from iter_graphs(thing)
+
+
 class Node(str):
     """Node object based on unicode.
 
@@ -1782,20 +2758,24 @@ class Node(str):
 
     def __new__(self, graph, name=None, nh=None):
         if nh is not None:
-            n = super().__new__(self, gv.agnameof(nh), graph.encoding)
+            n = super().__new__(self, graph._names.decode(gv.agnameof(nh)))
         else:
             n = super().__new__(self, name)
-            try:
-                nh = gv.agnode(graph.handle, n.encode(graph.encoding), _Action.find)
-            except KeyError:
+            nh = gv.agnode_find(graph.handle, graph._names.encode(name))
+            if nh is None:
                 raise KeyError(f"Node {n} not in graph.")
 
         n.ghandle = graph.handle
-        n.attr = ItemAttribute(nh, 1)
         n.handle = nh
         n.encoding = graph.encoding
         return n
 
+    @functools.cached_property
+    def attr(self):
+        # created on first access: most nodes handed out by the iterators
+        # never have their attributes looked at
+        return ItemAttribute(self.handle, 1, self.encoding)
+
     def get_handle(self):
         """Return pointer to graphviz node object."""
         return gv.agnode(self.ghandle, self.encode(self.encoding), _Action.find)
@@ -1861,18 +2841,20 @@ class Edge(tuple):
                 if not isinstance(key, str):
                     key = str(key)
                 key = key.encode(graph.encoding)
-            try:
-                eh = gv.agedge(graph.handle, s.handle, t.handle, key, _Action.find)
-            except KeyError:
+            eh = gv.agedge_find(graph.handle, s.handle, t.handle, key)
+            if eh is None:
                 raise KeyError(f"Edge {source}-{target} not in graph.")
 
         tp = tuple.__new__(self, (s, t))
         tp.ghandle = graph.handle
         tp.handle = eh
-        tp.attr = ItemAttribute(eh, 3)
         tp.encoding = graph.encoding
         return tp
 
+    @functools.cached_property
+    def attr(self):
+        return ItemAttribute(self.handle, 3, self.encoding)
+
     def get_name(self):
         name = gv.agnameof(self.handle)
         if name is not None:
@@ -1903,9 +2885,12 @@ class Attribute(MutableMapping):
 
     # use for graph, node, and edge default attributes
     # atype:graph=0, node=1,edge=3
-    def __init__(self, handle, atype):
+    def __init__(self, handle, atype, encoding=None):
         self.handle = handle
         self.type = atype
+        if encoding is not None:
+            self.encoding = encoding
+            return
         # get the encoding
         ghandle = gv.agraphof(handle)
         root_handle = gv.agroot(ghandle)  # get root graph
@@ -2001,10 +2986,13 @@ class ItemAttribute(Attribute):
 
     # use for individual item attributes - either a node or an edge
     # graphs and default node and edge attributes use Attribute
-    def __init__(self, handle, atype):
+    def __init__(self, handle, atype, encoding=None):
         self.handle = handle
         self.type = atype
         self.ghandle = gv.agraphof(handle)
+        if encoding is not None:
+            self.encoding = encoding
+            return
         # get the encoding
         root_handle = gv.agroot(self.ghandle)  # get root graph
         try:
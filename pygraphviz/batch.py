@@ -0,0 +1,113 @@
+"""
+Batch rendering
+===============
+
+Lay out and render many independent graphs in a pool of processes.
+
+Graphviz is not thread-safe, so layouts in one process run one at a time
+(see AGraph).  render_many() uses worker processes instead, sending each
+graph to a worker as DOT text.
+
+>>> import pygraphviz as pgv
+>>> graphs = [pgv.AGraph(data={i: [i + 1]}) for i in range(3)]
+>>> for result in pgv.render_many(graphs, prog="dot", format="svg"):  # doctest: +SKIP
+...     print(result.index, result.error, result.data[:5])
+0 None b'<?xml'
+1 None b'<?xml'
+2 None b'<?xml'
+"""
+
+import concurrent.futures
+import itertools
+import os
+import typing
+from concurrent.futures.process import BrokenProcessPool
+
+__all__ = ["RenderResult", "render_many"]
+
+
+class RenderResult(typing.NamedTuple):
+    """Result of rendering one graph with render_many().
+
+    index is the position of the graph in the input, data the rendered
+    bytes (None on failure) and error the exception raised (None on
+    success).
+    """
+
+    index: int
+    data: bytes | None
+    error: Exception | None
+
+
+def _render(dot, prog, format, args):
+    # runs in a worker process
+    from .agraph import AGraph
+
+    return AGraph(string=dot).draw(format=format, prog=prog, args=args)
+
+
+def render_many(graphs, prog="dot", format="svg", args="", workers=None, ordered=True):
+    """Lay out and render graphs in a pool of worker processes.
+
+    graphs is an iterable of AGraph objects or strings of DOT text.  It is
+    consumed lazily and at most a few graphs per worker are in flight at
+    a time, so arbitrarily long streams use bounded memory.  Each graph is
+    rendered as by AGraph.draw(format=format, prog=prog, args=args).
+
+    Yields a RenderResult (index, data, error) per graph: in input order
+    if ordered is True and in completion order otherwise.  A graph that
+    fails, for example because it is not valid DOT or the worker crashed,
+    gives a result with the exception as error instead of raising, and
+    the remaining graphs are still rendered.
+
+    workers is the number of processes, by default os.cpu_count().
+    """
+    workers = workers or os.cpu_count() or 1
+    window = 2 * workers
+    inputs = enumerate(graphs)
+    pending = {}  # future -> index
+    done = {}  # results of ordered=True waiting for earlier ones
+    next_index = 0
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+    def submit(count):
+        nonlocal pool
+        for index, graph in itertools.islice(inputs, count):
+            try:
+                dot = graph if isinstance(graph, str) else graph.to_string()
+            except Exception as err:
+                future = concurrent.futures.Future()
+                future.set_exception(err)
+            else:
+                try:
+                    future = pool.submit(_render, dot, prog, format, args)
+                except BrokenProcessPool:
+                    # a worker died: start over with a fresh pool
+                    pool.shutdown(wait=False)
+                    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+                    future = pool.submit(_render, dot, prog, format, args)
+            pending[future] = index
+
+    try:
+        submit(window)
+        while pending:
+            finished, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                index = pending.pop(future)
+                try:
+                    result = RenderResult(index, future.result(), None)
+                except Exception as err:
+                    result = RenderResult(index, None, err)
+                if not ordered:
+                    yield result
+                    continue
+                done[index] = result
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+            # keep the window full, counting results held back for order
+            submit(window - len(pending) - len(done))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
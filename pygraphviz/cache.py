@@ -0,0 +1,469 @@
+"""
+Caching layouts and renderings
+==============================
+
+Laying out the same graph again gives the same result, so the layout of
+a graph can be kept and restored instead of recomputed.  A LayoutCache
+passed to AGraph.layout() as cache= does this.
+
+>>> import pygraphviz as pgv
+>>> cache = pgv.LayoutCache(maxsize=100)
+>>> for i in range(3):
+...     G = pgv.AGraph(data={"a": ["b", "c"]})
+...     G.layout(prog="dot", cache=cache)
+>>> cache.info()
+LayoutCacheInfo(hits=2, misses=1, maxsize=100, currsize=1)
+
+Likewise a RenderCache passed to AGraph.draw() as cache= keeps the
+rendered output, so that drawing an unchanged graph again returns the
+same bytes without a layout or rendering.
+
+>>> cache = pgv.RenderCache()
+>>> svg = G.draw(format="svg", prog="dot", cache=cache)
+>>> G.draw(format="svg", prog="dot", cache=cache) == svg
+True
+
+Entries are looked up by a hash of the graph in DOT format, which covers
+its nodes, edges, subgraphs and attributes in order, together with the
+program, output format and arguments.  Caching is opt-in: without cache=
+layout() and draw() always run Graphviz.
+"""
+
+import collections
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import typing
+
+from . import graphviz as gv
+
+__all__ = ["LayoutCache", "RenderCache"]
+
+
+# attributes written by a layout, see gvrender_core_dot.c
+_GRAPH_ATTRS = (b"bb", b"lp", b"lwidth", b"lheight")
+_NODE_ATTRS = ("pos", "width", "height", "rects", "vertices", "xlp")
+_EDGE_ATTRS = ("pos", "lp", "xlp", "head_lp", "tail_lp")
+
+
+class LayoutCacheInfo(typing.NamedTuple):
+    """Statistics of a LayoutCache, as returned by LayoutCache.info()."""
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class RenderCacheInfo(typing.NamedTuple):
+    """Statistics of a RenderCache, as returned by RenderCache.info()."""
+
+    hits: int
+    misses: int
+    maxbytes: int
+    currbytes: int
+
+
+class _DiskStore:
+    # private: entries in a directory, one file per key, evicting the least
+    # recently used files beyond maxsize files or maxbytes bytes
+
+    suffix = ".pgvcache"
+
+    def __init__(self, directory, maxsize=None, maxbytes=None):
+        self.directory = os.fspath(directory)
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def load(self, fh):
+        return pickle.load(fh)
+
+    def dump(self, value, fh):
+        pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = self.load(fh)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or from an incompatible version: drop it
+            self.discard(key)
+            return None
+        return value
+
+    def put(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                self.dump(value, fh)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def discard(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        with os.scandir(self.directory) as it:
+            return [e for e in it if e.name.endswith(self.suffix) and e.is_file()]
+
+    def evict(self):
+        if self.maxsize is None and self.maxbytes is None:
+            return
+        entries = []
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # removed by another process sharing the directory
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if (self.maxsize is None or count <= self.maxsize) and (
+                self.maxbytes is None or total <= self.maxbytes
+            ):
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+
+    def clear(self):
+        for entry in self.entries():
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class _BytesDiskStore(_DiskStore):
+    # private: a _DiskStore of bytes, kept as they are
+
+    suffix = ".pgvrender"
+
+    def load(self, fh):
+        return fh.read()
+
+    def dump(self, value, fh):
+        fh.write(value)
+
+
+class _Cache:
+    # private: a least recently used cache in memory, bounded to maxsize
+    # entries and maxbytes bytes as given by _sizeof(), in front of an
+    # optional _DiskStore, counting hits and misses
+
+    def __init__(self, maxsize, maxbytes, disk):
+        for bound in (maxsize, maxbytes):
+            if bound is not None and bound < 0:
+                raise ValueError("cache size must not be negative")
+        self._maxsize = maxsize
+        self._maxbytes = maxbytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def _sizeof(self, entry):
+        return 0
+
+    def clear(self):
+        """Remove all entries, including those on disk, and reset the
+        statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+    def _get(self, key):
+        # private: the entry for key or None, loading it from disk into
+        # memory if needed
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self._disk is None:
+            return None
+        entry = self._disk.get(key)
+        if entry is not None:
+            with self._lock:
+                self._insert(key, entry)
+        return entry
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _insert(self, key, entry):
+        # private: add to memory, called with the lock held
+        size = self._sizeof(entry)
+        if self._maxsize == 0 or (self._maxbytes is not None and size > self._maxbytes):
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= self._sizeof(old)
+        self._entries[key] = entry
+        self._bytes += size
+        while (self._maxsize is not None and len(self._entries) > self._maxsize) or (
+            self._maxbytes is not None and self._bytes > self._maxbytes
+        ):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= self._sizeof(old)
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._insert(key, entry)
+        if self._disk is not None:
+            self._disk.put(key, entry)
+
+
+class LayoutCache(_Cache):
+    """A cache of graph layouts for AGraph.layout().
+
+    Up to maxsize layouts are kept in memory, dropping the least recently
+    used one when full.  If directory is given layouts are also stored
+    there, one file per layout, so that they survive the process and can
+    be shared between processes; at most disk_maxsize files are kept, or
+    any number if it is None.  Layouts found on disk are loaded into
+    memory.  The files are pickles, so only point directory to a location
+    that is not writable by others.
+
+    >>> import pygraphviz as pgv
+    >>> cache = pgv.LayoutCache(maxsize=2)
+    >>> G = pgv.AGraph(data={1: [2]})
+    >>> G.layout(prog="dot", cache=cache)  # computes the layout
+    >>> H = pgv.AGraph(data={1: [2]})
+    >>> H.layout(prog="dot", cache=cache)  # restores it
+    >>> H.get_node(1).attr["pos"] == G.get_node(1).attr["pos"]
+    True
+
+    On a hit layout() sets the attributes a layout computes (pos, width
+    and height of nodes, pos and label positions of edges, bb of the graph
+    and its clusters) to their cached values.  With
+    layout(attributes=False) the arrays returned by node_positions() and
+    the related methods are cached instead.
+
+    A cache can be shared between threads.
+    """
+
+    def __init__(self, maxsize=128, directory=None, disk_maxsize=None):
+        disk = None if directory is None else _DiskStore(directory, disk_maxsize)
+        super().__init__(maxsize, None, disk)
+
+    @property
+    def maxsize(self):
+        """The number of layouts kept in memory."""
+        return self._maxsize
+
+    def info(self):
+        """Return the statistics of the cache as a named tuple
+        (hits, misses, maxsize, currsize), currsize being the number of
+        layouts held in memory.
+        """
+        with self._lock:
+            return LayoutCacheInfo(
+                self.hits, self.misses, self._maxsize, len(self._entries)
+            )
+
+    def key(self, graph, prog, args="", attributes=True):
+        """Return the key under which the layout of graph is cached, a hex
+        string.
+
+        It is the SHA-256 hash of the graph in DOT format, prog, args and
+        whether attributes or arrays are cached.  Graphviz layouts depend
+        on the order of nodes and edges, and so does the key.
+        """
+        return _dot_digest(graph, prog, args, bool(attributes))
+
+    def _restore(self, key, graph, attributes):
+        # private: called by AGraph.layout(), apply the cached layout for
+        # key to graph and return True, or return False on a miss
+        entry = self._get(key)
+        # a graph with the same DOT text normally has the same order of
+        # nodes and edges, but check as the values are stored in order
+        if entry is None or entry[0] != _order_digest(graph):
+            self._count(False)
+            return False
+        self._count(True)
+        layout = entry[1]
+        if attributes:
+            graph_values, node_values, edge_values = layout
+            for handle, values in zip(_graph_handles(graph), graph_values, strict=True):
+                for name, value in values.items():
+                    gv.agsafeset(handle, name, value, b"")
+            for name, values in node_values.items():
+                graph.set_node_attribute(name, values)
+            for name, values in edge_values.items():
+                graph.set_edge_attribute(name, values)
+            graph._layout = None
+        else:
+            graph._layout = (graph._structure_key(), layout)
+        graph.has_layout = attributes
+        return True
+
+    def _save(self, key, graph, attributes):
+        # private: called by AGraph.layout() after computing a layout
+        if attributes:
+            graph_values = []
+            for handle in _graph_handles(graph):
+                values = {}
+                for name in _GRAPH_ATTRS:
+                    value = gv.agget(handle, name)
+                    if value is not None:
+                        values[name] = value
+                graph_values.append(values)
+            layout = (
+                graph_values,
+                _columns(graph.get_node_attribute, _NODE_ATTRS),
+                _columns(graph.get_edge_attribute, _EDGE_ATTRS),
+            )
+        else:
+            layout = graph._layout_arrays()
+        self._put(key, (_order_digest(graph), layout))
+
+
+class RenderCache(_Cache):
+    """A cache of rendered graphs for AGraph.draw().
+
+    Rendered output of up to maxbytes bytes in total is kept in memory,
+    dropping the least recently used when full.  If directory is given
+    the output is also stored there, one file per rendering, so that it
+    survives the process and can be shared between processes; files of
+    at most disk_maxbytes bytes in total are kept, or any number if it is
+    None.  Output found on disk is loaded into memory.
+
+    >>> import pygraphviz as pgv
+    >>> cache = pgv.RenderCache(maxbytes=2**20)
+    >>> G = pgv.AGraph(data={1: [2]})
+    >>> png = G.draw(format="png", prog="dot", cache=cache)
+    >>> png == pgv.AGraph(data={1: [2]}).draw(format="png", prog="dot", cache=cache)
+    True
+    >>> cache.info().hits
+    1
+
+    draw() with a cache gives the same result as without one.  Note that
+    drawing with prog=None renders the positions stored in the graph, so
+    the output depends on them as it does without a cache.
+
+    A cache can be shared between threads.
+    """
+
+    def __init__(self, maxbytes=64 * 2**20, directory=None, disk_maxbytes=None):
+        disk = (
+            None
+            if directory is None
+            else _BytesDiskStore(directory, maxbytes=disk_maxbytes)
+        )
+        super().__init__(None, maxbytes, disk)
+
+    @property
+    def maxbytes(self):
+        """The number of bytes of output kept in memory."""
+        return self._maxbytes
+
+    def _sizeof(self, entry):
+        return len(entry)
+
+    def info(self):
+        """Return the statistics of the cache as a named tuple
+        (hits, misses, maxbytes, currbytes), currbytes being the size of
+        the output held in memory.
+        """
+        with self._lock:
+            return RenderCacheInfo(self.hits, self.misses, self._maxbytes, self._bytes)
+
+    def key(self, graph, format, prog, args=""):
+        """Return the key under which the rendering of graph is cached, a
+        hex string.
+
+        It is the SHA-256 hash of the graph in DOT format, format, prog
+        and args.
+        """
+        return _dot_digest(graph, format, prog, args)
+
+    def _lookup(self, key):
+        # private: called by AGraph.draw(), the cached output or None
+        data = self._get(key)
+        self._count(data is not None)
+        return data
+
+
+def _dot_digest(graph, *parts):
+    # private: hex SHA-256 of parts and the DOT text of graph, whose own
+    # hash is kept by the graph until it is modified
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            part = part.decode(graph.encoding)
+        digest.update(f"{part}\0".encode(graph.encoding))
+    digest.update(graph._dot_hash())
+    return digest.hexdigest()
+
+
+def _columns(get, names):
+    # private: the values of the declared attributes among names
+    columns = {}
+    for name in names:
+        values = list(get(name))
+        if values and None not in values:
+            columns[name] = values
+    return columns
+
+
+def _graph_handles(graph):
+    # private: the handles of graph and all its subgraphs, breadth first
+    handles = [graph.handle]
+    i = 0
+    while i < len(handles):
+        handle = gv.agfstsubg(handles[i])
+        while handle is not None:
+            handles.append(handle)
+            try:
+                handle = gv.agnxtsubg(handle)
+            except StopIteration:
+                break
+        i += 1
+    return handles
+
+
+def _order_digest(graph):
+    # private: a hash of the order of nodes, edges and subgraphs, which
+    # cached values are stored in
+    digest = hashlib.sha256()
+    for name in graph.nodes_iter(raw=True):
+        digest.update(name.encode(graph.encoding) + b"\0")
+    digest.update(b"\1")
+    for u, v, key in graph.edges_iter(keys=True, raw=True):
+        digest.update(f"{u}\0{v}\0{key}\0".encode(graph.encoding))
+    digest.update(b"\1")
+    for handle in _graph_handles(graph):
+        digest.update((gv.agnameof(handle) or b"") + b"\0")
+    return digest.digest()
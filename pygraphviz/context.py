@@ -0,0 +1,100 @@
+"""
+Reusable Graphviz contexts
+==========================
+
+Laying out and rendering a graph needs a Graphviz context (GVC) with the
+layout engines and renderers registered.  Creating one is expensive
+compared to laying out a small graph, so AGraph.layout() and AGraph.draw()
+reuse a context per thread instead of creating one for every call.
+
+>>> import pygraphviz as pgv
+>>> G = pgv.AGraph()
+>>> G.add_edge("a", "b")
+>>> G.layout(prog="dot")  # uses the default context of this thread
+>>> with pgv.GVContext() as context:  # or an explicitly managed one
+...     G.layout(prog="dot", context=context)
+>>> pgv.release_context()  # free this thread's default context
+"""
+
+import contextlib
+import threading
+
+from . import graphviz as gv
+
+__all__ = ["GVContext", "get_context", "release_context"]
+
+
+class GVContext:
+    """A Graphviz context with the builtin layout engines and renderers.
+
+    Pass it to AGraph.layout() and AGraph.draw() as context= to control
+    its lifetime explicitly; otherwise a default context per thread is
+    used, see get_context().  The context is freed by close(), when
+    leaving a with block, or when it is garbage collected.
+
+    A context is not used by two threads at once: calls from different
+    threads sharing one context are serialized.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.handle = gv.gvContextWithBuiltins()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass  # the graphviz module may be gone at interpreter exit
+
+    @property
+    def closed(self):
+        """True once the context has been freed."""
+        return self.handle is None
+
+    def close(self):
+        """Free the Graphviz context.  Closing twice does nothing."""
+        with self._lock:
+            if self.handle is not None:
+                gv.gvFreeContext(self.handle)
+                self.handle = None
+
+    @contextlib.contextmanager
+    def _use(self):
+        # private: hold the context for one layout or render, yielding the
+        # GVC handle
+        with self._lock:
+            if self.handle is None:
+                raise ValueError("Graphviz context is closed.")
+            yield self.handle
+
+
+_local = threading.local()
+
+
+def get_context():
+    """Return the default context of the calling thread.
+
+    It is created on first use and kept until release_context() is called
+    or the thread exits.
+    """
+    context = getattr(_local, "context", None)
+    if context is None or context.closed:
+        context = _local.context = GVContext()
+    return context
+
+
+def release_context():
+    """Free the default context of the calling thread, if it has one.
+
+    The next layout or render in this thread creates a new one.
+    """
+    context = getattr(_local, "context", None)
+    _local.context = None
+    if context is not None:
+        context.close()
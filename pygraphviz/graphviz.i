@@ -7,6 +7,7 @@
 %{
 #include "graphviz/cgraph.h"
 #include "graphviz/gvc.h"
+#include <stdbool.h>
 #include <stdlib.h>
 #include <string.h>
 %}
@@ -125,14 +126,104 @@
   }
 }
 
+/* Long running Graphviz calls release the GIL so that other Python threads
+   can run meanwhile.  Graphviz itself is not thread-safe (the parser, error
+   reporting and the renderers share global state), so these calls are
+   serialized by gvlock, which is taken only after the GIL is released.
+
+   Reading and writing Python file objects calls their methods under gvlock
+   (see Streams below).  Graphviz is not reentrant either, so a method using
+   these calls itself, from the thread holding gvlock, raises RuntimeError
+   rather than waiting for gvlock forever. */
+%{
+  static PyThread_type_lock gvlock;
+  static unsigned long gvlock_owner;  /* thread holding gvlock, or 0 */
+
+  /* with the GIL held: whether gvlock can be taken, else set RuntimeError */
+  static bool pgv_lock_free(void) {
+    if (gvlock_owner == PyThread_get_thread_ident()) {
+      PyErr_SetString(PyExc_RuntimeError,
+                      "Graphviz is busy reading or writing a file object in "
+                      "this thread");
+      return false;
+    }
+    return true;
+  }
+
+  /* without the GIL */
+  static void pgv_lock(void) {
+    PyThread_acquire_lock(gvlock, WAIT_LOCK);
+    gvlock_owner = PyThread_get_thread_ident();
+  }
+
+  static void pgv_unlock(void) {
+    gvlock_owner = 0;
+    PyThread_release_lock(gvlock);
+  }
+%}
+
+%init %{
+  gvlock = PyThread_allocate_lock();
+%}
+
+%define PYGRAPHVIZ_ALLOW_THREADS(action)
+  if (!pgv_lock_free()) SWIG_fail;
+  Py_BEGIN_ALLOW_THREADS
+  pgv_lock();
+  action
+  pgv_unlock();
+  Py_END_ALLOW_THREADS
+%enddef
+
 %exception agread {
-  $action
+  PYGRAPHVIZ_ALLOW_THREADS($action)
   if (!result) {
      PyErr_SetString(PyExc_ValueError,"agread: bad input data");
      return NULL;
   }
 }
 
+%exception agmemread {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+  if (!result) {
+     PyErr_SetString(PyExc_ValueError,"agmemread: bad input data");
+     return NULL;
+  }
+}
+
+%exception agwrite {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+%exception gvLayout {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+%exception gvRender {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+%exception gvRenderFilename {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+%exception gvRenderData {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+/* creating and freeing a context touches state shared by all graphs */
+%exception gvContext {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+%exception gvContextWithBuiltins {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
+%exception gvFreeContext {
+  PYGRAPHVIZ_ALLOW_THREADS($action)
+}
+
 
 /* graphs */
 Agraph_t *agopen(char *name, Agdesc_t kind, Agdisc_t *disc);
@@ -154,6 +245,7 @@ def agraphnew(name,strict=False,directed=False):
 
 int       agclose(Agraph_t *g);
 Agraph_t *agread(FILE *input_file, Agdisc_t *);
+Agraph_t *agmemread(const char *cp);
 int       agwrite(Agraph_t *g, FILE *output_file);
 int	  agisundirected(Agraph_t * g);
 int       agisdirected(Agraph_t * g);
@@ -263,6 +355,1187 @@ int      agsafeset(void *obj, char *name, char *value, char *def);
 
 
 
+/* lookups that return NULL (None) or false instead of raising KeyError */
+%inline %{
+  Agnode_t *agnode_find(Agraph_t *g, char *name)
+{
+    return agnode(g, name, 0);
+}
+
+  Agedge_t *agedge_find(Agraph_t *g, Agnode_t *t, Agnode_t *h, char *key)
+{
+    return agedge(g, t, h, key, 0);
+}
+
+  /* create an edge, or find it if it cannot be created, as in a strict graph */
+  Agedge_t *agedge_add(Agraph_t *g, Agnode_t *t, Agnode_t *h, char *key)
+{
+    Agedge_t *e = agedge(g, t, h, key, 1);
+
+    return e != NULL ? e : agedge(g, t, h, key, 0);
+}
+
+  bool agnode_has(Agraph_t *g, char *name)
+{
+    return agnode(g, name, 0) != NULL;
+}
+
+  bool agedge_has(Agraph_t *g, char *tail, char *head, char *key)
+{
+    Agnode_t *t, *h;
+
+    if ((t = agnode(g, tail, 0)) == NULL || (h = agnode(g, head, 0)) == NULL)
+      return false;
+    return agedge(g, t, h, key, 0) != NULL;
+}
+  %}
+
+/* bulk operations */
+%{
+  /** convert a Python object to an object name, like `str(obj).encode(encoding)`
+   *
+   * @param obj Python object naming a node or edge key
+   * @param encoding Encoding of the graph
+   * @param owner [out] New reference that keeps the returned buffer alive
+   * @return The encoded name, or NULL with a Python exception set
+   */
+  static char *pyname(PyObject *obj, const char *encoding, PyObject **owner) {
+    PyObject *s = PyObject_Str(obj);
+
+    *owner = NULL;
+    if (s == NULL)
+      return NULL;
+    *owner = PyUnicode_AsEncodedString(s, encoding, "strict");
+    Py_DECREF(s);
+    if (*owner == NULL)
+      return NULL;
+    return PyBytes_AS_STRING(*owner);
+  }
+
+  /** find or declare an attribute the way AGraph's ItemAttribute does
+   *
+   * @param g Graph holding the objects
+   * @param kind AGNODE or AGEDGE
+   * @param name Name of the attribute
+   * @return The attribute symbol of the root graph
+   */
+  static Agsym_t *safeattr(Agraph_t *g, int kind, char *name) {
+    Agraph_t *root = agroot(g);
+    Agsym_t *sym = agattr(root, kind, name, NULL);
+
+    if (sym == NULL) {
+      if (kind == AGNODE && strcmp(name, "label") == 0)
+        sym = agattr(root, kind, name, (char *)"\\N");
+      else
+        sym = agattr(root, kind, name, (char *)"");
+    }
+    return sym;
+  }
+
+  /** set an attribute of obj to `str(value)`, keeping HTML-like labels
+   *
+   * @return 0 on success, or -1 with a Python exception set
+   */
+  static int pysetattr(Agraph_t *g, void *obj, Agsym_t *sym, PyObject *value,
+                       const char *encoding) {
+    PyObject *owner;
+    char *val = pyname(value, encoding, &owner);
+
+    if (val == NULL)
+      return -1;
+    agxset(obj, sym, htmlize(agroot(g), sym->name, val));
+    Py_DECREF(owner);
+    return 0;
+  }
+
+  /** set the attributes of obj from a dict of name: value
+   *
+   * @return 0 on success, or -1 with a Python exception set
+   */
+  static int pysetattrs(Agraph_t *g, void *obj, int kind, PyObject *attrs,
+                        const char *encoding) {
+    PyObject *key, *value, *owner;
+    Py_ssize_t pos = 0;
+    Agsym_t *sym;
+    char *name;
+
+    while (PyDict_Next(attrs, &pos, &key, &value)) {
+      name = pyname(key, encoding, &owner);
+      if (name == NULL)
+        return -1;
+      sym = safeattr(g, kind, name);
+      Py_DECREF(owner);
+      if (pysetattr(g, obj, sym, value, encoding) < 0)
+        return -1;
+    }
+    return 0;
+  }
+%}
+
+%{
+  /** type code of a one dimensional, native byte order number buffer
+   *
+   * @param view Buffer requested with PyBUF_STRIDES | PyBUF_FORMAT
+   * @param codes Acceptable struct module type codes
+   * @return The type code, or 0 with a Python exception set
+   */
+  static char bufcode(Py_buffer *view, const char *codes) {
+    const char *fmt = view->format ? view->format : "B";
+
+    if (fmt[0] == '@')
+      fmt++;
+    if (view->ndim != 1 || strlen(fmt) != 1 || strchr(codes, fmt[0]) == NULL) {
+      PyErr_Format(PyExc_TypeError, "unsupported buffer format '%s'", view->format);
+      return 0;
+    }
+    return fmt[0];
+  }
+
+  /** format item i of a number buffer the way Python's str() would
+   *
+   * @return 0 on success, or -1 with a Python exception set
+   */
+  static int bufstr(Py_buffer *view, char code, Py_ssize_t i, char *out, size_t size) {
+    const char *p = (const char *)view->buf + i * view->strides[0];
+    char *s;
+
+    switch (code) {
+    case 'b': snprintf(out, size, "%d", *(const signed char *)p); break;
+    case 'B': snprintf(out, size, "%u", *(const unsigned char *)p); break;
+    case 'h': snprintf(out, size, "%d", *(const short *)p); break;
+    case 'H': snprintf(out, size, "%u", *(const unsigned short *)p); break;
+    case 'i': snprintf(out, size, "%d", *(const int *)p); break;
+    case 'I': snprintf(out, size, "%u", *(const unsigned int *)p); break;
+    case 'l': snprintf(out, size, "%ld", *(const long *)p); break;
+    case 'L': snprintf(out, size, "%lu", *(const unsigned long *)p); break;
+    case 'q': snprintf(out, size, "%lld", *(const long long *)p); break;
+    case 'Q': snprintf(out, size, "%llu", *(const unsigned long long *)p); break;
+    case 'f':
+    case 'd':
+      s = PyOS_double_to_string(code == 'f' ? *(const float *)p : *(const double *)p,
+                                'r', 0, Py_DTSF_ADD_DOT_0, NULL);
+      if (s == NULL)
+        return -1;
+      snprintf(out, size, "%s", s);
+      PyMem_Free(s);
+      break;
+    default:
+      PyErr_SetString(PyExc_TypeError, "unsupported buffer format");
+      return -1;
+    }
+    return 0;
+  }
+
+  /* struct module type codes of integer buffers */
+  #define PYGRAPHVIZ_INT_CODES "bBhHiIlLqQ"
+%}
+
+/* Add the edges src[i] - dst[i] for integer buffers src and dst, naming nodes
+   by their decimal ids.  attrs maps edge attribute names to number buffers or
+   sequences of values aligned with the edges. */
+%inline %{
+  PyObject *agedges_from_arrays(Agraph_t *g, PyObject *src, PyObject *dst,
+                                PyObject *attrs, char *encoding)
+{
+    Py_buffer sview, dview;
+    Py_buffer *views = NULL;
+    PyObject **cols = NULL;
+    PyObject *result = NULL, *key, *value, *owner;
+    Agsym_t **syms = NULL;
+    char *name, scode, dcode;
+    char *codes = NULL;
+    char uname[32], vname[32], val[64];
+    Agnode_t *u, *v;
+    Agedge_t *e;
+    Py_ssize_t nattr, nedges, i, k, pos;
+
+    if (PyObject_GetBuffer(src, &sview, PyBUF_STRIDES | PyBUF_FORMAT) < 0)
+      return NULL;
+    if (PyObject_GetBuffer(dst, &dview, PyBUF_STRIDES | PyBUF_FORMAT) < 0) {
+      PyBuffer_Release(&sview);
+      return NULL;
+    }
+    nattr = 0;
+    if ((scode = bufcode(&sview, PYGRAPHVIZ_INT_CODES)) == 0 ||
+        (dcode = bufcode(&dview, PYGRAPHVIZ_INT_CODES)) == 0)
+      goto done;
+    nedges = sview.shape[0];
+    if (dview.shape[0] != nedges) {
+      PyErr_SetString(PyExc_ValueError, "src and dst must have the same length");
+      goto done;
+    }
+
+    nattr = attrs == Py_None ? 0 : PyDict_Size(attrs);
+    if (nattr < 0) {
+      nattr = 0;
+      goto done;
+    }
+    syms = calloc((size_t)(nattr + 1), sizeof(*syms));
+    views = calloc((size_t)(nattr + 1), sizeof(*views));
+    cols = calloc((size_t)(nattr + 1), sizeof(*cols));
+    codes = calloc((size_t)(nattr + 1), sizeof(*codes));
+    if (!syms || !views || !cols || !codes) {
+      PyErr_NoMemory();
+      goto done;
+    }
+    for (k = 0, pos = 0; k < nattr && PyDict_Next(attrs, &pos, &key, &value); k++) {
+      if ((name = pyname(key, encoding, &owner)) == NULL)
+        goto done;
+      syms[k] = safeattr(g, AGEDGE, name);
+      Py_DECREF(owner);
+      if (PyObject_CheckBuffer(value)) {
+        if (PyObject_GetBuffer(value, &views[k], PyBUF_STRIDES | PyBUF_FORMAT) < 0)
+          goto done;
+        if ((codes[k] = bufcode(&views[k], PYGRAPHVIZ_INT_CODES "fd")) == 0)
+          goto done;
+        if (views[k].shape[0] != nedges) {
+          PyErr_SetString(PyExc_ValueError, "attribute columns must match the edges");
+          goto done;
+        }
+      } else {
+        cols[k] = PySequence_Fast(value, "attribute columns must be sequences");
+        if (cols[k] == NULL)
+          goto done;
+        if (PySequence_Fast_GET_SIZE(cols[k]) != nedges) {
+          PyErr_SetString(PyExc_ValueError, "attribute columns must match the edges");
+          goto done;
+        }
+      }
+    }
+
+    for (i = 0; i < nedges; i++) {
+      if (bufstr(&sview, scode, i, uname, sizeof(uname)) < 0 ||
+          bufstr(&dview, dcode, i, vname, sizeof(vname)) < 0)
+        goto done;
+      u = agnode(g, uname, 1);
+      v = agnode(g, vname, 1);
+      e = agedge(g, u, v, NULL, 1);
+      if (e == NULL)
+        e = agedge(g, u, v, NULL, 0);
+      if (e == NULL) {
+        PyErr_Format(PyExc_KeyError, "agedge: cannot add edge %s-%s", uname, vname);
+        goto done;
+      }
+      for (k = 0; k < nattr; k++) {
+        if (cols[k] != NULL) {
+          if (pysetattr(g, e, syms[k], PySequence_Fast_GET_ITEM(cols[k], i), encoding) < 0)
+            goto done;
+        } else {
+          if (bufstr(&views[k], codes[k], i, val, sizeof(val)) < 0)
+            goto done;
+          agxset(e, syms[k], val);
+        }
+      }
+    }
+    Py_INCREF(Py_None);
+    result = Py_None;
+
+  done:
+    PyBuffer_Release(&sview);
+    PyBuffer_Release(&dview);
+    for (k = 0; k < nattr; k++) {
+      if (views && views[k].obj != NULL)
+        PyBuffer_Release(&views[k]);
+      if (cols)
+        Py_XDECREF(cols[k]);
+    }
+    free(syms);
+    free(views);
+    free(cols);
+    free(codes);
+    return result;
+}
+  %}
+
+%{
+  /** first edge of n in an adjacency walk: out-edges if directed, else all */
+  static Agedge_t *adjfirst(Agraph_t *g, Agnode_t *n, int directed) {
+    return directed ? agfstout(g, n) : agfstedge(g, n);
+  }
+
+  /** next edge of n in an adjacency walk */
+  static Agedge_t *adjnext(Agraph_t *g, Agedge_t *e, Agnode_t *n, int directed) {
+    return directed ? agnxtout(g, e) : agnxtedge(g, e, n);
+  }
+
+  /** position of sequence number seq in the sorted array seqs of length len */
+  static Py_ssize_t seqindex(const uint64_t *seqs, Py_ssize_t len, uint64_t seq) {
+    Py_ssize_t lo = 0, hi = len, mid;
+
+    while (lo < hi) {
+      mid = lo + (hi - lo) / 2;
+      if (seqs[mid] < seq)
+        lo = mid + 1;
+      else
+        hi = mid;
+    }
+    return lo;
+  }
+
+  /** attribute value as a double, or defval if unset or not a number */
+  static double attrdouble(void *obj, Agsym_t *sym, double defval) {
+    char *s, *end;
+    double v;
+
+    if (sym == NULL || (s = agxget(obj, sym)) == NULL || *s == '\0')
+      return defval;
+    v = PyOS_string_to_double(s, &end, NULL);
+    if (end == s) {
+      PyErr_Clear();
+      return defval;
+    }
+    /* the number must be the whole value, "2abc" is not a number */
+    end += strspn(end, " \t\r\n");
+    return *end == '\0' ? v : defval;
+  }
+%}
+
+/* Walk the graph once and return the adjacency in compressed sparse row form
+   as (indptr, indices, names, columns).  indptr and indices are bytearrays of
+   int64, names a list of node names in node order and columns a bytearray of
+   float64 per edge attribute name in attrs, aligned with indices.  Directed
+   graphs list out-neighbors; undirected graphs list each edge at both ends. */
+%inline %{
+  PyObject *agcsr(Agraph_t *g, PyObject *attrs, double defval)
+{
+    PyObject *result = NULL, *indptr = NULL, *indices = NULL, *names = NULL;
+    PyObject *columns = NULL, *col, *name;
+    Agraph_t *root = agroot(g);
+    Agsym_t **syms = NULL;
+    Agnode_t *n, *m;
+    Agedge_t *e;
+    uint64_t *seqs = NULL;
+    int64_t *ip, *ix;
+    double **vals = NULL;
+    int directed = agisdirected(g);
+    Py_ssize_t nnodes = agnnodes(g), nnz = 0, nattr, i, j, k;
+
+    attrs = PySequence_Fast(attrs, "attrs must be a sequence of attribute names");
+    if (attrs == NULL)
+      return NULL;
+    nattr = PySequence_Fast_GET_SIZE(attrs);
+    seqs = malloc((size_t)(nnodes + 1) * sizeof(*seqs));
+    syms = calloc((size_t)(nattr + 1), sizeof(*syms));
+    vals = calloc((size_t)(nattr + 1), sizeof(*vals));
+    if (!seqs || !syms || !vals) {
+      PyErr_NoMemory();
+      goto done;
+    }
+
+    /* nodes iterate in sequence order, so seqs is sorted */
+    for (n = agfstnode(g), i = 0; n != NULL; n = agnxtnode(g, n), i++) {
+      seqs[i] = AGSEQ(n);
+      for (e = adjfirst(g, n, directed); e != NULL; e = adjnext(g, e, n, directed))
+        nnz++;
+    }
+
+    indptr = PyByteArray_FromStringAndSize(NULL, (nnodes + 1) * (Py_ssize_t)sizeof(int64_t));
+    indices = PyByteArray_FromStringAndSize(NULL, nnz * (Py_ssize_t)sizeof(int64_t));
+    names = PyList_New(nnodes);
+    columns = PyList_New(nattr);
+    if (!indptr || !indices || !names || !columns)
+      goto done;
+    for (k = 0; k < nattr; k++) {
+      name = PySequence_Fast_GET_ITEM(attrs, k);
+      if (!PyBytes_Check(name)) {
+        PyErr_SetString(PyExc_TypeError, "attribute names must be bytes");
+        goto done;
+      }
+      syms[k] = agattr(root, AGEDGE, PyBytes_AS_STRING(name), NULL);
+      col = PyByteArray_FromStringAndSize(NULL, nnz * (Py_ssize_t)sizeof(double));
+      if (col == NULL)
+        goto done;
+      PyList_SET_ITEM(columns, k, col);
+      vals[k] = (double *)PyByteArray_AS_STRING(col);
+    }
+
+    ip = (int64_t *)PyByteArray_AS_STRING(indptr);
+    ix = (int64_t *)PyByteArray_AS_STRING(indices);
+    ip[0] = 0;
+    for (n = agfstnode(g), i = 0, j = 0; n != NULL; n = agnxtnode(g, n), i++) {
+      name = PyBytes_FromString(agnameof(n));
+      if (name == NULL)
+        goto done;
+      PyList_SET_ITEM(names, i, name);
+      for (e = adjfirst(g, n, directed); e != NULL; e = adjnext(g, e, n, directed)) {
+        m = aghead(e) == n ? agtail(e) : aghead(e);
+        ix[j] = (int64_t)seqindex(seqs, nnodes, AGSEQ(m));
+        for (k = 0; k < nattr; k++)
+          vals[k][j] = attrdouble(e, syms[k], defval);
+        j++;
+      }
+      ip[i + 1] = (int64_t)j;
+    }
+    result = Py_BuildValue("(OOOO)", indptr, indices, names, columns);
+
+  done:
+    Py_DECREF(attrs);
+    Py_XDECREF(indptr);
+    Py_XDECREF(indices);
+    Py_XDECREF(names);
+    Py_XDECREF(columns);
+    free(seqs);
+    free(syms);
+    free(vals);
+    return result;
+}
+  %}
+
+/* sequence number of a graph, node or edge: increases with creation order
+   and is never reused, so node and edge iteration follow it */
+%inline %{
+  unsigned long long agseq(void *obj) {
+    return (unsigned long long)AGSEQ(obj);
+  }
+  %}
+
+/* Return (seqs, names): a bytearray of the uint64 sequence numbers and a list
+   of the names of the nodes, both in node order. */
+%inline %{
+  PyObject *agnodeseqs(Agraph_t *g)
+{
+    PyObject *seqs, *names, *name, *result = NULL;
+    uint64_t *s;
+    Agnode_t *n;
+    Py_ssize_t i, nnodes = agnnodes(g);
+
+    seqs = PyByteArray_FromStringAndSize(NULL, nnodes * (Py_ssize_t)sizeof(uint64_t));
+    names = PyList_New(nnodes);
+    if (seqs == NULL || names == NULL)
+      goto done;
+    s = (uint64_t *)PyByteArray_AS_STRING(seqs);
+    for (n = agfstnode(g), i = 0; n != NULL; n = agnxtnode(g, n), i++) {
+      s[i] = AGSEQ(n);
+      if ((name = PyBytes_FromString(agnameof(n))) == NULL)
+        goto done;
+      PyList_SET_ITEM(names, i, name);
+    }
+    result = Py_BuildValue("(OO)", seqs, names);
+
+  done:
+    Py_XDECREF(seqs);
+    Py_XDECREF(names);
+    return result;
+}
+  %}
+
+/* Return (tails, heads): bytearrays of the int64 node order positions of the
+   endpoints of every edge, in edge order (out-edges of each node in turn). */
+%inline %{
+  PyObject *agedgeends(Agraph_t *g)
+{
+    PyObject *tails = NULL, *heads = NULL, *result = NULL;
+    uint64_t *seqs;
+    int64_t *t, *h;
+    Agnode_t *n;
+    Agedge_t *e;
+    Py_ssize_t i, nnodes = agnnodes(g), nedges = agnedges(g);
+
+    seqs = malloc((size_t)(nnodes + 1) * sizeof(*seqs));
+    if (seqs == NULL)
+      return PyErr_NoMemory();
+    for (n = agfstnode(g), i = 0; n != NULL; n = agnxtnode(g, n), i++)
+      seqs[i] = AGSEQ(n);
+
+    tails = PyByteArray_FromStringAndSize(NULL, nedges * (Py_ssize_t)sizeof(int64_t));
+    heads = PyByteArray_FromStringAndSize(NULL, nedges * (Py_ssize_t)sizeof(int64_t));
+    if (tails == NULL || heads == NULL)
+      goto done;
+    t = (int64_t *)PyByteArray_AS_STRING(tails);
+    h = (int64_t *)PyByteArray_AS_STRING(heads);
+    for (n = agfstnode(g), i = 0; n != NULL; n = agnxtnode(g, n)) {
+      for (e = agfstout(g, n); e != NULL && i < nedges; e = agnxtout(g, e), i++) {
+        t[i] = (int64_t)seqindex(seqs, nnodes, AGSEQ(agtail(e)));
+        h[i] = (int64_t)seqindex(seqs, nnodes, AGSEQ(aghead(e)));
+      }
+    }
+    result = Py_BuildValue("(OO)", tails, heads);
+
+  done:
+    free(seqs);
+    Py_XDECREF(tails);
+    Py_XDECREF(heads);
+    return result;
+}
+  %}
+
+%{
+  /** decode the name of a graph object, or return None if it has none */
+  static PyObject *pydecodedname(void *obj, const char *encoding) {
+    char *name = agnameof(obj);
+
+    if (name == NULL)
+      Py_RETURN_NONE;
+    return PyUnicode_Decode(name, (Py_ssize_t)strlen(name), encoding, "strict");
+  }
+
+  /** append the (tail, head, key) names of an edge to list, reusing tail or
+      head if either is node n, whose decoded name is nname */
+  static int appendedgenames(PyObject *list, Agedge_t *e, Agnode_t *n, PyObject *nname,
+                             const char *encoding) {
+    PyObject *t, *h, *k, *tuple;
+    char *key;
+    int rc;
+
+    t = agtail(e) == n ? (Py_INCREF(nname), nname) : pydecodedname(agtail(e), encoding);
+    h = aghead(e) == n ? (Py_INCREF(nname), nname) : pydecodedname(aghead(e), encoding);
+    key = agnameof(e);
+    if (key == NULL || key[0] == '\0' || key[0] == '%')
+      k = (Py_INCREF(Py_None), Py_None); /* anonymous edge, as in agnameof() */
+    else
+      k = pydecodedname(e, encoding);
+    if (t == NULL || h == NULL || k == NULL) {
+      Py_XDECREF(t);
+      Py_XDECREF(h);
+      Py_XDECREF(k);
+      return -1;
+    }
+    tuple = PyTuple_Pack(3, t, h, k);
+    Py_DECREF(t);
+    Py_DECREF(h);
+    Py_DECREF(k);
+    if (tuple == NULL)
+      return -1;
+    rc = PyList_Append(list, tuple);
+    Py_DECREF(tuple);
+    return rc;
+  }
+%}
+
+/* Return the decoded names of the nodes in node order. */
+%inline %{
+  PyObject *agnodenames(Agraph_t *g, char *encoding)
+{
+    PyObject *names, *name;
+    Agnode_t *n;
+    Py_ssize_t i;
+
+    if ((names = PyList_New(agnnodes(g))) == NULL)
+      return NULL;
+    for (n = agfstnode(g), i = 0; n != NULL; n = agnxtnode(g, n), i++) {
+      if ((name = pydecodedname(n, encoding)) == NULL) {
+        Py_DECREF(names);
+        return NULL;
+      }
+      PyList_SET_ITEM(names, i, name);
+    }
+    return names;
+}
+  %}
+
+/* Return a list of decoded (tail, head, key) names of the edges of node n, or
+   of every node if n is NULL.  dir selects the out-edges (0), in-edges (1) or
+   all edges (2) of each node; key is None for anonymous edges. */
+%inline %{
+  PyObject *agedgenames(Agraph_t *g, Agnode_t *n, int dir, char *encoding)
+{
+    PyObject *list, *nname;
+    Agnode_t *m;
+    Agedge_t *e;
+    int rc = 0;
+
+    if ((list = PyList_New(0)) == NULL)
+      return NULL;
+    for (m = n ? n : agfstnode(g); m != NULL && rc == 0; m = n ? NULL : agnxtnode(g, m)) {
+      if ((nname = pydecodedname(m, encoding)) == NULL) {
+        rc = -1;
+        break;
+      }
+      if (dir == 0) {
+        for (e = agfstout(g, m); e != NULL && rc == 0; e = agnxtout(g, e))
+          rc = appendedgenames(list, e, m, nname, encoding);
+      } else if (dir == 1) {
+        for (e = agfstin(g, m); e != NULL && rc == 0; e = agnxtin(g, e))
+          rc = appendedgenames(list, e, m, nname, encoding);
+      } else {
+        for (e = agfstedge(g, m); e != NULL && rc == 0; e = agnxtedge(g, e, m))
+          rc = appendedgenames(list, e, m, nname, encoding);
+      }
+      Py_DECREF(nname);
+    }
+    if (rc < 0) {
+      Py_DECREF(list);
+      return NULL;
+    }
+    return list;
+}
+  %}
+
+/* Add the nodes in nbunch in one call.  Items are names or (name, attrdict)
+   pairs; attr holds attributes common to all nodes and columns maps attribute
+   names to sequences of values aligned with nbunch (either may be None). */
+%inline %{
+  PyObject *agnodes_from(Agraph_t *g, PyObject *nbunch, PyObject *attr,
+                         PyObject *columns, char *encoding)
+{
+    PyObject *result = NULL, *it = NULL, *item, *nameobj, *ad;
+    PyObject *key, *value, *owner;
+    PyObject **owners = NULL, **cols = NULL;
+    Agsym_t **syms = NULL;
+    char **vals = NULL;
+    char *name;
+    Agnode_t *n;
+    Py_ssize_t nattr, ncols, i, k, pos;
+
+    nattr = attr == Py_None ? 0 : PyDict_Size(attr);
+    ncols = columns == Py_None ? 0 : PyDict_Size(columns);
+    if (nattr < 0 || ncols < 0)
+      return NULL;
+    syms = calloc((size_t)(nattr + ncols + 1), sizeof(*syms));
+    vals = calloc((size_t)(nattr + 1), sizeof(*vals));
+    owners = calloc((size_t)(nattr + 1), sizeof(*owners));
+    cols = calloc((size_t)(ncols + 1), sizeof(*cols));
+    if (!syms || !vals || !owners || !cols) {
+      PyErr_NoMemory();
+      goto done;
+    }
+
+    /* resolve the attribute symbols and common values once */
+    for (k = 0, pos = 0; k < nattr && PyDict_Next(attr, &pos, &key, &value); k++) {
+      if ((name = pyname(key, encoding, &owner)) == NULL)
+        goto done;
+      syms[k] = safeattr(g, AGNODE, name);
+      Py_DECREF(owner);
+      if ((vals[k] = pyname(value, encoding, &owners[k])) == NULL)
+        goto done;
+      vals[k] = htmlize(agroot(g), syms[k]->name, vals[k]);
+    }
+    for (k = 0, pos = 0; k < ncols && PyDict_Next(columns, &pos, &key, &value); k++) {
+      if ((name = pyname(key, encoding, &owner)) == NULL)
+        goto done;
+      syms[nattr + k] = safeattr(g, AGNODE, name);
+      Py_DECREF(owner);
+      cols[k] = PySequence_Fast(value, "attribute columns must be sequences");
+      if (cols[k] == NULL)
+        goto done;
+    }
+
+    if ((it = PyObject_GetIter(nbunch)) == NULL)
+      goto done;
+    for (i = 0; (item = PyIter_Next(it)) != NULL; i++) {
+      nameobj = item;
+      ad = NULL;
+      if (PyTuple_Check(item) && PyTuple_GET_SIZE(item) == 2 &&
+          PyDict_Check(PyTuple_GET_ITEM(item, 1))) {
+        nameobj = PyTuple_GET_ITEM(item, 0);
+        ad = PyTuple_GET_ITEM(item, 1);
+      }
+      if ((name = pyname(nameobj, encoding, &owner)) == NULL) {
+        Py_DECREF(item);
+        goto done;
+      }
+      n = agnode(g, name, 1);
+      Py_DECREF(owner);
+      for (k = 0; k < nattr; k++)
+        agxset(n, syms[k], vals[k]);
+      if (ad != NULL && pysetattrs(g, n, AGNODE, ad, encoding) < 0) {
+        Py_DECREF(item);
+        goto done;
+      }
+      Py_DECREF(item);
+      for (k = 0; k < ncols; k++) {
+        if (i >= PySequence_Fast_GET_SIZE(cols[k])) {
+          PyErr_SetString(PyExc_ValueError, "attribute column is shorter than nbunch");
+          goto done;
+        }
+        if (pysetattr(g, n, syms[nattr + k], PySequence_Fast_GET_ITEM(cols[k], i),
+                      encoding) < 0)
+          goto done;
+      }
+    }
+    if (!PyErr_Occurred()) {
+      Py_INCREF(Py_None);
+      result = Py_None;
+    }
+
+  done:
+    Py_XDECREF(it);
+    for (k = 0; owners && k < nattr; k++)
+      Py_XDECREF(owners[k]);
+    for (k = 0; cols && k < ncols; k++)
+      Py_XDECREF(cols[k]);
+    free(syms);
+    free(vals);
+    free(owners);
+    free(cols);
+    return result;
+}
+  %}
+
+/* Add the edges (u, v) or (u, v, key) in ebunch in one call, creating missing
+   endpoints.  Existing edges are left as they are, like AGraph.add_edge. */
+%inline %{
+  PyObject *agedges_from(Agraph_t *g, PyObject *ebunch, char *encoding)
+{
+    PyObject *it, *item, *seq;
+    PyObject *uo, *vo, *ko;
+    Agnode_t *u, *v;
+    Agedge_t *e;
+    char *uname, *vname, *key;
+    Py_ssize_t len;
+
+    it = PyObject_GetIter(ebunch);
+    if (it == NULL)
+      return NULL;
+    while ((item = PyIter_Next(it)) != NULL) {
+      seq = PySequence_Fast(item, "edges must be (u, v) or (u, v, key) tuples");
+      Py_DECREF(item);
+      if (seq == NULL)
+        break;
+      len = PySequence_Fast_GET_SIZE(seq);
+      if (len != 2 && len != 3) {
+        PyErr_Format(PyExc_ValueError,
+                     "edges must be (u, v) or (u, v, key) tuples, got %zd items", len);
+        Py_DECREF(seq);
+        break;
+      }
+      vo = ko = NULL;
+      vname = key = NULL;
+      uname = pyname(PySequence_Fast_GET_ITEM(seq, 0), encoding, &uo);
+      if (uname != NULL)
+        vname = pyname(PySequence_Fast_GET_ITEM(seq, 1), encoding, &vo);
+      if (vname != NULL && len == 3 && PySequence_Fast_GET_ITEM(seq, 2) != Py_None)
+        key = pyname(PySequence_Fast_GET_ITEM(seq, 2), encoding, &ko);
+      if (!PyErr_Occurred()) {
+        u = agnode(g, uname, 1);
+        v = agnode(g, vname, 1);
+        /* strict graphs refuse to create a second u-v edge, so find it */
+        e = agedge(g, u, v, key, 1);
+        if (e == NULL)
+          e = agedge(g, u, v, key, 0);
+        if (e == NULL)
+          PyErr_Format(PyExc_KeyError, "agedge: cannot add edge %s-%s", uname, vname);
+      }
+      Py_XDECREF(uo);
+      Py_XDECREF(vo);
+      Py_XDECREF(ko);
+      Py_DECREF(seq);
+      if (PyErr_Occurred())
+        break;
+    }
+    Py_DECREF(it);
+    if (PyErr_Occurred())
+      return NULL;
+    Py_RETURN_NONE;
+}
+  %}
+
+
+/* Return a bytearray with a 1 for each name in names that is a node of g
+   and a 0 otherwise. */
+%inline %{
+  PyObject *agnodes_has(Agraph_t *g, PyObject *names, char *encoding)
+{
+    PyObject *seq, *found, *owner;
+    Py_ssize_t i, len;
+    char *name, *out;
+
+    if ((seq = PySequence_Fast(names, "nodes must be iterable")) == NULL)
+      return NULL;
+    len = PySequence_Fast_GET_SIZE(seq);
+    if ((found = PyByteArray_FromStringAndSize(NULL, len)) == NULL) {
+      Py_DECREF(seq);
+      return NULL;
+    }
+    out = PyByteArray_AS_STRING(found);
+    for (i = 0; i < len; i++) {
+      if ((name = pyname(PySequence_Fast_GET_ITEM(seq, i), encoding, &owner)) == NULL) {
+        Py_XDECREF(owner);
+        Py_CLEAR(found);
+        break;
+      }
+      out[i] = agnode(g, name, 0) != NULL;
+      Py_DECREF(owner);
+    }
+    Py_DECREF(seq);
+    return found;
+}
+  %}
+
+/* Return a bytearray with a 1 for each (u, v) or (u, v, key) in pairs that is
+   an edge of g and a 0 otherwise.  keys, if not None, gives the key of each
+   pair instead. */
+%inline %{
+  PyObject *agedges_has(Agraph_t *g, PyObject *pairs, PyObject *keys, char *encoding)
+{
+    PyObject *seq, *kseq = NULL, *found = NULL, *item;
+    PyObject *uo, *vo, *ko, *keyobj;
+    Py_ssize_t i, len, n;
+    Agnode_t *u, *v;
+    char *uname, *vname, *key, *out;
+
+    if ((seq = PySequence_Fast(pairs, "edges must be iterable")) == NULL)
+      return NULL;
+    len = PySequence_Fast_GET_SIZE(seq);
+    if (keys != Py_None) {
+      if ((kseq = PySequence_Fast(keys, "keys must be iterable")) == NULL)
+        goto done;
+      if (PySequence_Fast_GET_SIZE(kseq) != len) {
+        PyErr_Format(PyExc_ValueError, "got %zd keys for %zd edges",
+                     PySequence_Fast_GET_SIZE(kseq), len);
+        goto done;
+      }
+    }
+    if ((found = PyByteArray_FromStringAndSize(NULL, len)) == NULL)
+      goto done;
+    out = PyByteArray_AS_STRING(found);
+    for (i = 0; i < len; i++) {
+      item = PySequence_Fast(PySequence_Fast_GET_ITEM(seq, i),
+                             "edges must be (u, v) or (u, v, key) tuples");
+      if (item == NULL)
+        break;
+      n = PySequence_Fast_GET_SIZE(item);
+      if (n != 2 && n != 3) {
+        PyErr_Format(PyExc_ValueError,
+                     "edges must be (u, v) or (u, v, key) tuples, got %zd items", n);
+        Py_DECREF(item);
+        break;
+      }
+      keyobj = kseq != NULL ? PySequence_Fast_GET_ITEM(kseq, i)
+               : n == 3     ? PySequence_Fast_GET_ITEM(item, 2)
+                            : Py_None;
+      vo = ko = NULL;
+      vname = key = NULL;
+      uname = pyname(PySequence_Fast_GET_ITEM(item, 0), encoding, &uo);
+      if (uname != NULL)
+        vname = pyname(PySequence_Fast_GET_ITEM(item, 1), encoding, &vo);
+      if (vname != NULL && keyobj != Py_None)
+        key = pyname(keyobj, encoding, &ko);
+      if (!PyErr_Occurred()) {
+        u = agnode(g, uname, 0);
+        v = u != NULL ? agnode(g, vname, 0) : NULL;
+        out[i] = v != NULL && agedge(g, u, v, key, 0) != NULL;
+      }
+      Py_XDECREF(uo);
+      Py_XDECREF(vo);
+      Py_XDECREF(ko);
+      Py_DECREF(item);
+      if (PyErr_Occurred())
+        break;
+    }
+    if (PyErr_Occurred())
+      Py_CLEAR(found);
+
+  done:
+    Py_DECREF(seq);
+    Py_XDECREF(kseq);
+    return found;
+}
+  %}
+
+
+%{
+  /** append an attribute value to list, decoding it unless it is the
+   * attribute's default and fill is not NULL
+   *
+   * @param memo [in,out] The last value decoded, and its string in *memoval
+   */
+  static int appendattr(PyObject *list, char *val, char *defval, PyObject *fill,
+                        char **memoval, PyObject **memo, const char *encoding) {
+    PyObject *item;
+
+    if (fill != NULL && (val == defval || strcmp(val, defval) == 0))
+      return PyList_Append(list, fill);
+    /* values are interned by Graphviz, so repeats are usually the same pointer */
+    if (*memo == NULL || val != *memoval) {
+      item = PyUnicode_Decode(val, (Py_ssize_t)strlen(val), encoding, "strict");
+      if (item == NULL)
+        return -1;
+      Py_XDECREF(*memo);
+      *memo = item;
+      *memoval = val;
+    }
+    return PyList_Append(list, *memo);
+  }
+%}
+
+/* Return a list of the values of attribute name of every node (kind AGNODE)
+   or edge (kind AGEDGE) of g, in node or edge order.  Values equal to the
+   attribute's default are replaced by fill unless it is None.  If the
+   attribute is not declared every value is fill. */
+%inline %{
+  PyObject *agattrcolumn(Agraph_t *g, int kind, char *name, PyObject *fill, char *encoding)
+{
+    PyObject *list, *memo = NULL;
+    Agsym_t *sym = agattr(g, kind, name, NULL);
+    Agnode_t *n;
+    Agedge_t *e;
+    char *memoval = NULL;
+    int rc = 0;
+
+    if (fill == Py_None)
+      fill = NULL;
+    if (sym == NULL) {
+      Py_ssize_t i, len = kind == AGNODE ? agnnodes(g) : agnedges(g);
+
+      if ((list = PyList_New(len)) == NULL)
+        return NULL;
+      fill = fill != NULL ? fill : Py_None;
+      for (i = 0; i < len; i++) {
+        Py_INCREF(fill);
+        PyList_SET_ITEM(list, i, fill);
+      }
+      return list;
+    }
+    if ((list = PyList_New(0)) == NULL)
+      return NULL;
+    for (n = agfstnode(g); n != NULL && rc == 0; n = agnxtnode(g, n)) {
+      if (kind == AGNODE) {
+        rc = appendattr(list, agxget(n, sym), sym->defval, fill, &memoval, &memo, encoding);
+        continue;
+      }
+      for (e = agfstout(g, n); e != NULL && rc == 0; e = agnxtout(g, e))
+        rc = appendattr(list, agxget(e, sym), sym->defval, fill, &memoval, &memo, encoding);
+    }
+    Py_XDECREF(memo);
+    if (rc < 0) {
+      Py_DECREF(list);
+      return NULL;
+    }
+    return list;
+}
+  %}
+
+%{
+  /** find the node named by key, or the edge given by a (u, v) or
+   * (u, v, key) tuple
+   *
+   * @return The node or edge, or NULL with a Python exception set
+   */
+  static void *pyfindobj(Agraph_t *g, int kind, PyObject *key, const char *encoding) {
+    PyObject *seq, *owners[3] = {NULL, NULL, NULL};
+    Agnode_t *u = NULL, *v = NULL;
+    void *obj = NULL;
+    char *names[3] = {NULL, NULL, NULL};
+    Py_ssize_t i, len;
+
+    if (kind == AGNODE) {
+      if ((names[0] = pyname(key, encoding, &owners[0])) != NULL &&
+          (obj = agnode(g, names[0], 0)) == NULL)
+        PyErr_Format(PyExc_KeyError, "Node %s not in graph.", names[0]);
+      Py_XDECREF(owners[0]);
+      return obj;
+    }
+    if ((seq = PySequence_Fast(key, "edges must be (u, v) or (u, v, key) tuples")) == NULL)
+      return NULL;
+    len = PySequence_Fast_GET_SIZE(seq);
+    if (len != 2 && len != 3) {
+      PyErr_Format(PyExc_ValueError,
+                   "edges must be (u, v) or (u, v, key) tuples, got %zd items", len);
+      Py_DECREF(seq);
+      return NULL;
+    }
+    for (i = 0; i < len; i++) {
+      if (i == 2 && PySequence_Fast_GET_ITEM(seq, i) == Py_None)
+        break;
+      if ((names[i] = pyname(PySequence_Fast_GET_ITEM(seq, i), encoding, &owners[i])) == NULL)
+        break;
+    }
+    if (!PyErr_Occurred()) {
+      if ((u = agnode(g, names[0], 0)) != NULL && (v = agnode(g, names[1], 0)) != NULL)
+        obj = agedge(g, u, v, names[2], 0);
+      if (obj == NULL)
+        PyErr_Format(PyExc_KeyError, "Edge %s-%s not in graph.", names[0], names[1]);
+    }
+    for (i = 0; i < 3; i++)
+      Py_XDECREF(owners[i]);
+    Py_DECREF(seq);
+    return obj;
+  }
+%}
+
+/* Set attribute name of the nodes (kind AGNODE) or edges (kind AGEDGE) of g.
+   values is either a dict mapping nodes or (u, v[, key]) edges to values, or
+   a sequence of values for every node or edge in node or edge order.  The
+   attribute is declared once and set with agxset, keeping HTML-like labels. */
+%inline %{
+  PyObject *agsetattrcolumn(Agraph_t *g, int kind, char *name, PyObject *values,
+                            char *encoding)
+{
+    PyObject *seq, *key, *value;
+    Py_ssize_t pos = 0, i = 0, len;
+    Agsym_t *sym = safeattr(g, kind, name);
+    Agnode_t *n;
+    Agedge_t *e;
+    void *obj;
+
+    if (PyDict_Check(values)) {
+      while (PyDict_Next(values, &pos, &key, &value)) {
+        if ((obj = pyfindobj(g, kind, key, encoding)) == NULL ||
+            pysetattr(g, obj, sym, value, encoding) < 0)
+          return NULL;
+      }
+      Py_RETURN_NONE;
+    }
+    if ((seq = PySequence_Fast(values, "values must be a dict or a sequence")) == NULL)
+      return NULL;
+    len = kind == AGNODE ? agnnodes(g) : agnedges(g);
+    if (PySequence_Fast_GET_SIZE(seq) != len) {
+      PyErr_Format(PyExc_ValueError, "got %zd values for %zd %s",
+                   PySequence_Fast_GET_SIZE(seq), len, kind == AGNODE ? "nodes" : "edges");
+      Py_DECREF(seq);
+      return NULL;
+    }
+    for (n = agfstnode(g); n != NULL && !PyErr_Occurred(); n = agnxtnode(g, n)) {
+      if (kind == AGNODE) {
+        pysetattr(g, n, sym, PySequence_Fast_GET_ITEM(seq, i++), encoding);
+        continue;
+      }
+      for (e = agfstout(g, n); e != NULL && !PyErr_Occurred(); e = agnxtout(g, e))
+        pysetattr(g, e, sym, PySequence_Fast_GET_ITEM(seq, i++), encoding);
+    }
+    Py_DECREF(seq);
+    if (PyErr_Occurred())
+      return NULL;
+    Py_RETURN_NONE;
+}
+  %}
+
+%{
+  /** parse up to count comma separated numbers from s into out, padding
+   * with NaN; Graphviz appends '!' to pinned positions, which is ignored.
+   * A number followed by other text, as in "1,2abc", makes all of out NaN.
+   *
+   * @return The end of the parsed text, or s if it is malformed
+   */
+  static char *parsefloats(char *s, double *out, int count) {
+    char *start = s, *end;
+    int i;
+
+    for (i = 0; i < count; i++)
+      out[i] = Py_NAN;
+    for (i = 0; s != NULL && i < count; i++) {
+      while (*s == ',' || *s == ' ')
+        s++;
+      out[i] = PyOS_string_to_double(s, &end, NULL);
+      if (end == s) {
+        PyErr_Clear();
+        out[i] = Py_NAN;
+        break;
+      }
+      if (*end != '\0' && strchr(",! \t\r\n;\\", *end) == NULL) {
+        for (i = 0; i < count; i++)
+          out[i] = Py_NAN;
+        return start;
+      }
+      s = end;
+    }
+    return s;
+  }
+%}
+
+/* Parse count numbers from each of the attributes named in attrs of every
+   node (kind AGNODE) or edge (kind AGEDGE) of g, or of g itself (kind
+   AGRAPH), as a bytearray of float64 with one row per object.  Unset or
+   malformed values are NaN. */
+%inline %{
+  PyObject *agattrfloats(Agraph_t *g, int kind, PyObject *attrs, int count)
+{
+    PyObject *seq, *result;
+    Py_ssize_t k, nattrs, nobjs;
+    Agsym_t **syms;
+    Agnode_t *n;
+    Agedge_t *e;
+    double *out;
+    char *s;
+
+    if ((seq = PySequence_Fast(attrs, "attrs must be a sequence")) == NULL)
+      return NULL;
+    nattrs = PySequence_Fast_GET_SIZE(seq);
+    nobjs = kind == AGRAPH ? 1 : kind == AGNODE ? agnnodes(g) : agnedges(g);
+    syms = PyMem_Calloc(nattrs ? nattrs : 1, sizeof(Agsym_t *));
+    result = PyByteArray_FromStringAndSize(NULL, nobjs * nattrs * count * sizeof(double));
+    if (syms == NULL || result == NULL) {
+      Py_DECREF(seq);
+      Py_XDECREF(result);
+      PyMem_Free(syms);
+      return syms == NULL ? PyErr_NoMemory() : NULL;
+    }
+    for (k = 0; k < nattrs; k++) {
+      if ((s = PyBytes_AsString(PySequence_Fast_GET_ITEM(seq, k))) == NULL) {
+        Py_DECREF(seq);
+        Py_DECREF(result);
+        PyMem_Free(syms);
+        return NULL;
+      }
+      syms[k] = agattr(agroot(g), kind, s, NULL);
+    }
+    Py_DECREF(seq);
+    out = (double *)PyByteArray_AS_STRING(result);
+#define PARSEOBJ(obj)                                                       \
+    for (k = 0; k < nattrs; k++, out += count)                              \
+      parsefloats(syms[k] != NULL ? agxget((obj), syms[k]) : NULL, out, count)
+    if (kind == AGRAPH) {
+      PARSEOBJ(g);
+    } else {
+      for (n = agfstnode(g); n != NULL; n = agnxtnode(g, n)) {
+        if (kind == AGNODE) {
+          PARSEOBJ(n);
+          continue;
+        }
+        for (e = agfstout(g, n); e != NULL; e = agnxtout(g, e)) {
+          PARSEOBJ(e);
+        }
+      }
+    }
+#undef PARSEOBJ
+    PyMem_Free(syms);
+    return result;
+}
+  %}
+
+/* Parse the pos attribute of every edge of g, in edge order, into the spline
+   control points.  Returns (points, offsets): points a bytearray of float64
+   x, y pairs, and offsets a bytearray of int64 such that the points of edge
+   i are offsets[i] to offsets[i + 1].  The "s,x,y" and "e,x,y" arrowhead end
+   points are left out; multiple splines of an edge are concatenated. */
+%inline %{
+  PyObject *agsplinepoints(Agraph_t *g)
+{
+    PyObject *points, *offsets;
+    Py_ssize_t npoints = 0, i = 0;
+    Agsym_t *sym = agattr(agroot(g), AGEDGE, "pos", NULL);
+    Agnode_t *n;
+    Agedge_t *e;
+    double xy[2];
+    char *s, *end;
+
+    points = PyByteArray_FromStringAndSize(NULL, 0);
+    offsets = PyByteArray_FromStringAndSize(NULL, (agnedges(g) + 1) * sizeof(int64_t));
+    if (points == NULL || offsets == NULL)
+      goto fail;
+    ((int64_t *)PyByteArray_AS_STRING(offsets))[0] = 0;
+    for (n = agfstnode(g); n != NULL; n = agnxtnode(g, n)) {
+      for (e = agfstout(g, n); e != NULL; e = agnxtout(g, e)) {
+        for (s = sym != NULL ? agxget(e, sym) : ""; *s != '\0'; s = end) {
+          while (*s == ' ' || *s == ';' || *s == '\n' || *s == '\\')
+            s++;
+          if (*s == '\0')
+            break;
+          end = parsefloats(s, xy, 2);
+          if (end == s || isnan(xy[1])) {
+            /* an arrowhead end point, or not a point at all */
+            end = s + strcspn(s, " ;");
+            continue;
+          }
+          if (PyByteArray_Resize(points, (npoints + 1) * 2 * sizeof(double)) < 0)
+            goto fail;
+          memcpy(PyByteArray_AS_STRING(points) + npoints * 2 * sizeof(double), xy,
+                 sizeof(xy));
+          npoints++;
+        }
+        ((int64_t *)PyByteArray_AS_STRING(offsets))[++i] = (int64_t)npoints;
+      }
+    }
+    return Py_BuildValue("(NN)", points, offsets);
+
+  fail:
+    Py_XDECREF(points);
+    Py_XDECREF(offsets);
+    return NULL;
+}
+  %}
+
 /* subgraphs */
 Agraph_t *agsubg(Agraph_t *g, char *name, int createflag);
 Agraph_t *agfstsubg(Agraph_t *g);
@@ -363,6 +1636,795 @@ int gvRenderData(GVC_t *gvc, Agraph_t* g, char *format, char **result, unsigned
 /* Free memory allocated and pointed to by *result in gvRenderData */
 extern void gvFreeRenderData (char* data);
 
+/* Read the layout computed by gvLayout straight from the layout records of
+   g, before gvFreeLayout.  Returns (positions, sizes, points, offsets, bb)
+   as bytearrays laid out as by agattrfloats and agsplinepoints: positions
+   and sizes hold two float64 per node (x, y in points and width, height in
+   inches), points the spline control points and offsets int64 per edge
+   boundaries into them, and bb four float64. */
+%inline %{
+  PyObject *aglayoutarrays(Agraph_t *g)
+{
+    PyObject *positions, *sizes, *points, *offsets, *bb;
+    Py_ssize_t npoints = 0, j, k;
+    Agnode_t *n;
+    Agedge_t *e;
+    splines *spl;
+    double *pos, *size, *xy;
+    int64_t *off;
+
+    for (n = agfstnode(g); n != NULL; n = agnxtnode(g, n))
+      for (e = agfstout(g, n); e != NULL; e = agnxtout(g, e))
+        if ((spl = ED_spl(e)) != NULL)
+          for (j = 0; j < (Py_ssize_t)spl->size; j++)
+            npoints += (Py_ssize_t)spl->list[j].size;
+
+    positions = PyByteArray_FromStringAndSize(NULL, agnnodes(g) * 2 * sizeof(double));
+    sizes = PyByteArray_FromStringAndSize(NULL, agnnodes(g) * 2 * sizeof(double));
+    points = PyByteArray_FromStringAndSize(NULL, npoints * 2 * sizeof(double));
+    offsets = PyByteArray_FromStringAndSize(NULL, (agnedges(g) + 1) * sizeof(int64_t));
+    bb = PyByteArray_FromStringAndSize(NULL, 4 * sizeof(double));
+    if (positions == NULL || sizes == NULL || points == NULL || offsets == NULL || bb == NULL) {
+      Py_XDECREF(positions);
+      Py_XDECREF(sizes);
+      Py_XDECREF(points);
+      Py_XDECREF(offsets);
+      Py_XDECREF(bb);
+      return NULL;
+    }
+    pos = (double *)PyByteArray_AS_STRING(positions);
+    size = (double *)PyByteArray_AS_STRING(sizes);
+    xy = (double *)PyByteArray_AS_STRING(points);
+    off = (int64_t *)PyByteArray_AS_STRING(offsets);
+    *off++ = 0;
+    npoints = 0;
+    for (n = agfstnode(g); n != NULL; n = agnxtnode(g, n)) {
+      *pos++ = ND_coord(n).x;
+      *pos++ = ND_coord(n).y;
+      *size++ = ND_width(n);
+      *size++ = ND_height(n);
+      for (e = agfstout(g, n); e != NULL; e = agnxtout(g, e)) {
+        if ((spl = ED_spl(e)) != NULL) {
+          for (j = 0; j < (Py_ssize_t)spl->size; j++) {
+            for (k = 0; k < (Py_ssize_t)spl->list[j].size; k++) {
+              *xy++ = spl->list[j].list[k].x;
+              *xy++ = spl->list[j].list[k].y;
+            }
+            npoints += (Py_ssize_t)spl->list[j].size;
+          }
+        }
+        *off++ = (int64_t)npoints;
+      }
+    }
+    ((double *)PyByteArray_AS_STRING(bb))[0] = GD_bb(g).LL.x;
+    ((double *)PyByteArray_AS_STRING(bb))[1] = GD_bb(g).LL.y;
+    ((double *)PyByteArray_AS_STRING(bb))[2] = GD_bb(g).UR.x;
+    ((double *)PyByteArray_AS_STRING(bb))[3] = GD_bb(g).UR.y;
+    return Py_BuildValue("(NNNNN)", positions, sizes, points, offsets, bb);
+}
+  %}
+
+/* Generation counter: a record on the root graph counting modifications.
+   Callbacks pushed on the root graph increment it whenever an object is
+   created, deleted or has an attribute set, in the root graph or any of
+   its subgraphs.  The layout macros (GD_bb etc.) expect their record at
+   the front of the record list.  agbindrec() puts a new record at the
+   front unless the graph is locked by a record bound move-to-front, which
+   the layout binds its record as.  So the generation record does not
+   displace a layout record bound before it, and one bound after it takes
+   the front. */
+%{
+  #define PGV_GENERATION "pygraphviz_generation"
+
+  typedef struct {
+    Agrec_t h;
+    unsigned long long generation;
+  } pgv_generation_t;
+
+  static void pgv_generation_bump(Agraph_t *g, Agobj_t *obj, void *state) {
+    ++*(unsigned long long *)state;
+  }
+
+  static void pgv_generation_bump_upd(Agraph_t *g, Agobj_t *obj, void *state,
+                                      Agsym_t *sym) {
+    ++*(unsigned long long *)state;
+  }
+
+  static Agcbdisc_t pgv_generation_disc = {
+    {pgv_generation_bump, pgv_generation_bump_upd, pgv_generation_bump},
+    {pgv_generation_bump, pgv_generation_bump_upd, pgv_generation_bump},
+    {pgv_generation_bump, pgv_generation_bump_upd, pgv_generation_bump},
+  };
+
+  static pgv_generation_t *pgv_generation(Agraph_t *g) {
+    Agraph_t *root = agroot(g);
+    pgv_generation_t *rec =
+        (pgv_generation_t *)aggetrec(root, PGV_GENERATION, 0);
+    if (rec == NULL) {
+      rec = agbindrec(root, PGV_GENERATION, sizeof(pgv_generation_t), 0);
+      rec->generation = 0;
+      agpushdisc(root, &pgv_generation_disc, &rec->generation);
+    }
+    return rec;
+  }
+%}
+
+%inline %{
+  unsigned long long aggeneration(Agraph_t *g)
+{
+    return pgv_generation(g)->generation;
+}
+
+  void agsetgeneration(Agraph_t *g, unsigned long long generation)
+{
+    pgv_generation(g)->generation = generation;
+}
+
+  void agtouch(Agraph_t *g)
+{
+    ++pgv_generation(g)->generation;
+}
+  %}
+
+/* Merge: add the attributes, nodes, edges and subgraphs of one graph to
+   another.  Subgraphs and nodes are matched by name and edges by their
+   ends and key; an anonymous edge matches the anonymous edge between the
+   same nodes at the same position among the parallel ones, so merging a
+   graph twice changes nothing.  The rules for attribute values are
+   documented with AGraph.concat().  The edges of src are merged as they
+   are, reversed, or both ways (one edge each way), by direction. */
+%{
+  #define PGV_MERGE_FORWARD 0
+  #define PGV_MERGE_REVERSE 1
+  #define PGV_MERGE_BOTH 2
+
+  typedef struct {
+    Agnode_t *owner, *other;  /* ends of the edge in the merged graph */
+    Agedge_t *edge;
+  } pgv_pair_t;
+
+  typedef struct {
+    Agraph_t *dst;
+    int direction;
+    bool empty;              /* dst had no nodes, so nothing to match */
+    int count[3];            /* attributes of src, by kind */
+    Agsym_t **src[3];        /* their symbols as seen from src */
+    Agsym_t **sym[3];        /* the same attributes in dst */
+    Agnode_t **nodes;        /* dst node per src node sequence number */
+    Agedge_t **edges;        /* dst edge per src edge sequence number */
+    Agedge_t **back;         /* and reversed, with PGV_MERGE_BOTH */
+  } pgv_merge_t;
+
+  static bool pgv_anonymous(const char *name) {
+    return name == NULL || name[0] == '\0' || name[0] == '%';
+  }
+
+  /* declare the attributes of src in dst; a default set (not empty) in
+     src replaces the one in dst, as do graph attributes of src */
+  static int pgv_merge_syms(pgv_merge_t *m, Agraph_t *src) {
+    Agraph_t *root = agroot(src);
+    Agsym_t *sym, *dsym;
+    char *value;
+    int kind, i;
+
+    for (kind = AGRAPH; kind <= AGEDGE; kind++) {
+      for (sym = agnxtattr(root, kind, NULL); sym; sym = agnxtattr(root, kind, sym))
+        m->count[kind]++;
+      m->src[kind] = calloc(m->count[kind] + 1, sizeof(Agsym_t *));
+      m->sym[kind] = calloc(m->count[kind] + 1, sizeof(Agsym_t *));
+      if (m->src[kind] == NULL || m->sym[kind] == NULL)
+        return -1;
+      i = 0;
+      for (sym = agnxtattr(root, kind, NULL); sym; sym = agnxtattr(root, kind, sym)) {
+        m->src[kind][i] = agattr(src, kind, sym->name, NULL);
+        value = kind == AGRAPH ? agxget(src, m->src[kind][i]) : m->src[kind][i]->defval;
+        dsym = agattr(m->dst, kind, sym->name, NULL);
+        if (dsym == NULL)
+          dsym = agattr(m->dst, kind, sym->name, "");
+        if (value[0] != '\0' &&
+            strcmp(value, kind == AGRAPH ? agxget(m->dst, dsym) : dsym->defval) != 0)
+          dsym = agattr(m->dst, kind, sym->name, value);
+        if (dsym == NULL)
+          return -1;
+        m->sym[kind][i++] = dsym;
+      }
+    }
+    return 0;
+  }
+
+  /* copy the attribute values of obj to obj2: those set in obj (not the
+     default of src), or all of them if obj2 was just created */
+  static void pgv_merge_values(pgv_merge_t *m, int kind, void *obj, void *obj2,
+                               bool created) {
+    char *value;
+    int i;
+
+    for (i = 0; i < m->count[kind]; i++) {
+      value = agxget(obj, m->src[kind][i]);
+      if ((created || strcmp(value, m->src[kind][i]->defval) != 0) &&
+          strcmp(value, agxget(obj2, m->sym[kind][i])) != 0)
+        agxset(obj2, m->sym[kind][i], value);
+    }
+  }
+
+  static int pgv_merge_nodes(pgv_merge_t *m, Agraph_t *src) {
+    Agraph_t *root = agroot(m->dst);
+    Agnode_t *n, *n2;
+    char *name;
+    bool created;
+
+    for (n = agfstnode(src); n; n = agnxtnode(src, n)) {
+      name = agnameof(n);
+      if (name != NULL && name[0] == '%')
+        name = NULL;
+      n2 = name != NULL && !m->empty ? agnode(root, name, 0) : NULL;
+      created = n2 == NULL;
+      n2 = created ? agnode(m->dst, name, 1) : agsubnode(m->dst, n2, 1);
+      if (n2 == NULL)
+        return -1;
+      m->nodes[AGSEQ(n)] = n2;
+      pgv_merge_values(m, AGNODE, n, n2, created);
+    }
+    return 0;
+  }
+
+  static int pgv_pair_cmp(const void *a, const void *b) {
+    const pgv_pair_t *p = a, *q = b;
+
+    if (AGSEQ(p->owner) != AGSEQ(q->owner))
+      return AGSEQ(p->owner) < AGSEQ(q->owner) ? -1 : 1;
+    if (AGSEQ(p->other) != AGSEQ(q->other))
+      return AGSEQ(p->other) < AGSEQ(q->other) ? -1 : 1;
+    if (AGSEQ(p->edge) != AGSEQ(q->edge))
+      return AGSEQ(p->edge) < AGSEQ(q->edge) ? -1 : 1;
+    return 0;
+  }
+
+  /* the ends in dst of edge e of src, reversed or not */
+  static void pgv_merge_ends(pgv_merge_t *m, Agedge_t *e, bool reverse,
+                             Agnode_t **t, Agnode_t **h) {
+    *t = m->nodes[AGSEQ(reverse ? aghead(e) : agtail(e))];
+    *h = m->nodes[AGSEQ(reverse ? agtail(e) : aghead(e))];
+  }
+
+  /* match the anonymous edges of src to the existing ones of dst, before
+     any are created: sort both by their ends and pair them off in order,
+     filling in map */
+  static int pgv_merge_anonymous(pgv_merge_t *m, Agraph_t *src, bool reverse,
+                                 Agedge_t **map) {
+    Agraph_t *root = agroot(m->dst);
+    bool undirected = agisundirected(root);
+    pgv_pair_t *pairs, *cands = NULL, *grown;
+    size_t npairs = 0, ncands, size = 0, i, j, k;
+    Agnode_t *n, *t, *h, *owner;
+    Agedge_t *e;
+    int rc = -1;
+
+    if (m->empty)
+      return 0;
+    pairs = malloc((agnedges(src) + 1) * sizeof(pgv_pair_t));
+    if (pairs == NULL)
+      return -1;
+    for (n = agfstnode(src); n; n = agnxtnode(src, n))
+      for (e = agfstout(src, n); e; e = agnxtout(src, e)) {
+        if (!pgv_anonymous(agnameof(e)))
+          continue;
+        pgv_merge_ends(m, e, reverse, &t, &h);
+        if (undirected && AGSEQ(h) < AGSEQ(t)) {
+          pairs[npairs].owner = h;
+          pairs[npairs].other = t;
+        } else {
+          pairs[npairs].owner = t;
+          pairs[npairs].other = h;
+        }
+        pairs[npairs++].edge = e;
+      }
+    qsort(pairs, npairs, sizeof(pgv_pair_t), pgv_pair_cmp);
+
+    for (i = 0; i < npairs; i = j) {
+      owner = pairs[i].owner;
+      for (j = i; j < npairs && pairs[j].owner == owner; j++)
+        ;
+      /* the anonymous edges of dst from owner, or to it as well with the
+         other end coming later if undirected, as the pairs above */
+      ncands = 0;
+      for (e = agfstedge(root, owner); e; e = agnxtedge(root, e, owner)) {
+        Agnode_t *other = agtail(e) == owner ? aghead(e) : agtail(e);
+        if (!pgv_anonymous(agnameof(e)))
+          continue;
+        if (undirected ? AGSEQ(other) < AGSEQ(owner) : agtail(e) != owner)
+          continue;
+        if (ncands == size) {
+          size = size ? 2 * size : 16;
+          grown = realloc(cands, size * sizeof(pgv_pair_t));
+          if (grown == NULL)
+            goto done;
+          cands = grown;
+        }
+        cands[ncands].owner = owner;
+        cands[ncands].other = other;
+        cands[ncands++].edge = AGTYPE(e) == AGINEDGE ? agopp(e) : e;
+      }
+      qsort(cands, ncands, sizeof(pgv_pair_t), pgv_pair_cmp);
+      for (k = 0; i < j && k < ncands; ) {
+        int cmp = AGSEQ(pairs[i].other) == AGSEQ(cands[k].other) ? 0 :
+                  AGSEQ(pairs[i].other) < AGSEQ(cands[k].other) ? -1 : 1;
+        if (cmp == 0)
+          map[AGSEQ(pairs[i].edge)] = cands[k].edge;
+        if (cmp <= 0)
+          i++;
+        if (cmp >= 0)
+          k++;
+      }
+    }
+    rc = 0;
+  done:
+    free(cands);
+    free(pairs);
+    return rc;
+  }
+
+  /* merge edge e of src, reversed or not, into the edge map[AGSEQ(e)] */
+  static void pgv_merge_edge(pgv_merge_t *m, Agedge_t *e, bool reverse,
+                             Agedge_t **map) {
+    Agraph_t *root = agroot(m->dst);
+    bool strict = agisstrict(root), created = false;
+    Agedge_t *e2 = map[AGSEQ(e)];
+    Agnode_t *t, *h;
+    char *key;
+
+    if (e2 == NULL) {
+      pgv_merge_ends(m, e, reverse, &t, &h);
+      key = agnameof(e);
+      if (pgv_anonymous(key))
+        key = NULL;
+      /* a strict graph keeps one edge between two nodes, whatever its key */
+      if (key != NULL || strict)
+        e2 = agedge(root, t, h, key, 0);
+      if (e2 == NULL) {
+        e2 = agedge(m->dst, t, h, key, 1);
+        created = e2 != NULL;
+      }
+      if (e2 == NULL && strict)
+        e2 = agedge(root, t, h, NULL, 0);
+      if (e2 == NULL)
+        return;  /* a loop where none are allowed */
+      map[AGSEQ(e)] = e2;
+    }
+    if (!created)
+      e2 = agsubedge(m->dst, e2, 1);
+    pgv_merge_values(m, AGEDGE, e, e2, created);
+  }
+
+  static int pgv_merge_edges(pgv_merge_t *m, Agraph_t *src) {
+    Agnode_t *n;
+    Agedge_t *e;
+
+    if (m->direction != PGV_MERGE_REVERSE &&
+        pgv_merge_anonymous(m, src, false, m->edges) < 0)
+      return -1;
+    if (m->direction != PGV_MERGE_FORWARD &&
+        pgv_merge_anonymous(m, src, true, m->back) < 0)
+      return -1;
+    for (n = agfstnode(src); n; n = agnxtnode(src, n))
+      for (e = agfstout(src, n); e; e = agnxtout(src, e)) {
+        if (m->direction != PGV_MERGE_REVERSE)
+          pgv_merge_edge(m, e, false, m->edges);
+        if (m->direction != PGV_MERGE_FORWARD)
+          pgv_merge_edge(m, e, true, m->back);
+      }
+    return 0;
+  }
+
+  /* merge the subgraphs of src into dst, recursively; attributes and
+     defaults count as set in a subgraph if it declares them itself, or for
+     graph attributes, if they differ from the default */
+  static int pgv_merge_subgraphs(pgv_merge_t *m, Agraph_t *dst, Agraph_t *src) {
+    Agraph_t *sub, *sub2;
+    Agsym_t *sym, *parent;
+    Agnode_t *n;
+    Agedge_t *e;
+    char *name, *value;
+    int kind, i;
+
+    for (sub = agfstsubg(src); sub; sub = agnxtsubg(sub)) {
+      name = agnameof(sub);
+      sub2 = agsubg(dst, pgv_anonymous(name) ? NULL : name, 1);
+      if (sub2 == NULL)
+        return -1;
+      for (i = 0; i < m->count[AGRAPH]; i++) {
+        name = m->src[AGRAPH][i]->name;
+        sym = agattr(sub, AGRAPH, name, NULL);
+        value = agxget(sub, sym);
+        if ((sym != agattr(src, AGRAPH, name, NULL) || strcmp(value, sym->defval) != 0) &&
+            strcmp(value, agxget(sub2, m->sym[AGRAPH][i])) != 0)
+          agattr(sub2, AGRAPH, name, value);
+      }
+      for (kind = AGNODE; kind <= AGEDGE; kind++)
+        for (i = 0; i < m->count[kind]; i++) {
+          name = m->src[kind][i]->name;
+          sym = agattr(sub, kind, name, NULL);
+          parent = agattr(src, kind, name, NULL);
+          if (sym != parent &&
+              strcmp(sym->defval, agattr(sub2, kind, name, NULL)->defval) != 0)
+            agattr(sub2, kind, name, sym->defval);
+        }
+      for (n = agfstnode(sub); n; n = agnxtnode(sub, n))
+        agsubnode(sub2, m->nodes[AGSEQ(n)], 1);
+      for (n = agfstnode(sub); n; n = agnxtnode(sub, n))
+        for (e = agfstout(sub, n); e; e = agnxtout(sub, e)) {
+          if (m->edges[AGSEQ(e)] != NULL)
+            agsubedge(sub2, m->edges[AGSEQ(e)], 1);
+          if (m->back != m->edges && m->back[AGSEQ(e)] != NULL)
+            agsubedge(sub2, m->back[AGSEQ(e)], 1);
+        }
+      if (pgv_merge_subgraphs(m, sub2, sub) < 0)
+        return -1;
+    }
+    return 0;
+  }
+%}
+
+%inline %{
+  /* merge src into dst, with its edges in direction: 0 as they are, 1
+     reversed or 2 both ways */
+  PyObject *agmerge(Agraph_t *dst, Agraph_t *src, int direction)
+{
+    pgv_merge_t m = {dst, direction, agfstnode(agroot(dst)) == NULL};
+    unsigned long long nseq = 0, eseq = 0;
+    Agnode_t *n;
+    Agedge_t *e;
+    int rc = -1, kind;
+
+    if (direction < PGV_MERGE_FORWARD || direction > PGV_MERGE_BOTH) {
+      PyErr_SetString(PyExc_ValueError, "agmerge: bad direction");
+      return NULL;
+    }
+    if (dst == src && direction == PGV_MERGE_FORWARD)
+      Py_RETURN_NONE;
+    if (agroot(dst) == agroot(src)) {
+      /* would merge src while adding to it */
+      PyErr_SetString(PyExc_ValueError, "agmerge: graphs share a root graph");
+      return NULL;
+    }
+    for (n = agfstnode(src); n; n = agnxtnode(src, n)) {
+      if (AGSEQ(n) > nseq)
+        nseq = AGSEQ(n);
+      for (e = agfstout(src, n); e; e = agnxtout(src, e))
+        if (AGSEQ(e) > eseq)
+          eseq = AGSEQ(e);
+    }
+    m.nodes = calloc(nseq + 1, sizeof(Agnode_t *));
+    m.edges = calloc(eseq + 1, sizeof(Agedge_t *));
+    m.back = direction == PGV_MERGE_BOTH ? calloc(eseq + 1, sizeof(Agedge_t *)) : m.edges;
+    if (m.nodes != NULL && m.edges != NULL && m.back != NULL && pgv_merge_syms(&m, src) == 0 &&
+        pgv_merge_nodes(&m, src) == 0 && pgv_merge_edges(&m, src) == 0 &&
+        pgv_merge_subgraphs(&m, dst, src) == 0)
+      rc = 0;
+    for (kind = AGRAPH; kind <= AGEDGE; kind++) {
+      free(m.src[kind]);
+      free(m.sym[kind]);
+    }
+    if (m.back != m.edges)
+      free(m.back);
+    free(m.nodes);
+    free(m.edges);
+    if (rc < 0)
+      return PyErr_NoMemory();
+    Py_RETURN_NONE;
+}
+  %}
+
+/* In-memory writer: agwrite() through an I/O discipline appending to a
+   growing buffer instead of a FILE*.  The discipline is swapped in for the
+   call only; a graph shares it with its root and subgraphs, so this is
+   done under gvlock like agwrite(). */
+%{
+  typedef struct {
+    char *data;
+    size_t size;
+    size_t capacity;
+    bool failed;
+  } pgv_buffer_t;
+
+  static int pgv_buffer_putstr(void *chan, const char *str) {
+    pgv_buffer_t *buf = chan;
+    size_t len = strlen(str);
+    if (buf->size + len > buf->capacity) {
+      size_t capacity = buf->capacity ? buf->capacity : 4096;
+      char *data;
+      while (buf->size + len > capacity)
+        capacity *= 2;
+      data = realloc(buf->data, capacity);
+      if (data == NULL) {
+        buf->failed = true;
+        return EOF;
+      }
+      buf->data = data;
+      buf->capacity = capacity;
+    }
+    memcpy(buf->data + buf->size, str, len);
+    buf->size += len;
+    return 0;
+  }
+
+  static int pgv_buffer_flush(void *chan) {
+    return 0;
+  }
+%}
+
+%inline %{
+  PyObject *agwritebytes(Agraph_t *g)
+{
+    pgv_buffer_t buf = {NULL, 0, 0, false};
+    Agiodisc_t io, *saved;
+    PyObject *result;
+    int rc;
+
+    if (!pgv_lock_free())
+      return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    pgv_lock();
+    saved = AGDISC(g, io);
+    io = *saved;
+    io.putstr = pgv_buffer_putstr;
+    io.flush = pgv_buffer_flush;
+    AGDISC(g, io) = &io;
+    rc = agwrite(g, &buf);
+    AGDISC(g, io) = saved;
+    pgv_unlock();
+    Py_END_ALLOW_THREADS
+
+    if (buf.failed) {
+      free(buf.data);
+      return PyErr_NoMemory();
+    }
+    if (rc == EOF) {
+      free(buf.data);
+      PyErr_SetString(PyExc_OSError, "agwrite: error writing graph");
+      return NULL;
+    }
+    result = PyBytes_FromStringAndSize(buf.data ? buf.data : "", buf.size);
+    free(buf.data);
+    return result;
+}
+  %}
+
+/* Streams: read and write graphs through Python file objects, such as
+   gzip.GzipFile, with I/O disciplines calling their read() and write()
+   methods.  Graphviz runs without the GIL, under gvlock, and the callbacks
+   take the GIL back to call Python, still under gvlock: the parser and the
+   writer keep their state in globals, which another thread must not use
+   meanwhile.  An exception raised by a callback is left set and ends the
+   read or write. */
+%{
+  #define PGV_READER "pygraphviz.reader"
+  #define PGV_CHUNK 65536
+
+  typedef struct {
+    PyObject *file;
+    char *data;
+    size_t pos, end;
+    bool eof;
+  } pgv_reader_t;
+
+  typedef struct {
+    PyObject *file;
+    char *data;
+    size_t size;
+    bool failed;
+  } pgv_writer_t;
+
+  /* read the next chunk from the file, with the GIL held */
+  static int pgv_reader_fill(pgv_reader_t *reader) {
+    PyObject *chunk;
+    Py_buffer view;
+    char *data;
+
+    chunk = PyObject_CallMethod(reader->file, "read", "n", (Py_ssize_t)PGV_CHUNK);
+    if (chunk == NULL)
+      return -1;
+    if (PyObject_GetBuffer(chunk, &view, PyBUF_SIMPLE) < 0) {
+      Py_DECREF(chunk);
+      return -1;
+    }
+    data = realloc(reader->data, view.len > 0 ? (size_t)view.len : 1);
+    if (data == NULL) {
+      PyBuffer_Release(&view);
+      Py_DECREF(chunk);
+      PyErr_NoMemory();
+      return -1;
+    }
+    memcpy(data, view.buf, (size_t)view.len);
+    reader->data = data;
+    reader->pos = 0;
+    reader->end = (size_t)view.len;
+    reader->eof = view.len == 0;
+    PyBuffer_Release(&view);
+    Py_DECREF(chunk);
+    return 0;
+  }
+
+  static int pgv_reader_read(void *chan, char *buf, int bufsize) {
+    pgv_reader_t *reader = chan;
+    size_t n;
+    char *newline;
+
+    if (reader->pos == reader->end) {
+      PyGILState_STATE state;
+      int rc;
+      if (reader->eof)
+        return 0;
+      state = PyGILState_Ensure();
+      rc = PyErr_Occurred() ? -1 : pgv_reader_fill(reader);
+      PyGILState_Release(state);
+      if (rc < 0) {
+        reader->eof = true;
+        return 0;
+      }
+      if (reader->pos == reader->end)
+        return 0;
+    }
+    /* a line at a time, as fgets() in the default discipline, so that the
+       next agread() from the stream starts right after the graph */
+    n = reader->end - reader->pos;
+    if (n > (size_t)bufsize)
+      n = (size_t)bufsize;
+    newline = memchr(reader->data + reader->pos, '\n', n);
+    if (newline != NULL)
+      n = (size_t)(newline - (reader->data + reader->pos)) + 1;
+    memcpy(buf, reader->data + reader->pos, n);
+    reader->pos += n;
+    return (int)n;
+  }
+
+  static void pgv_reader_free(PyObject *capsule) {
+    pgv_reader_t *reader = PyCapsule_GetPointer(capsule, PGV_READER);
+    if (reader != NULL) {
+      Py_XDECREF(reader->file);
+      free(reader->data);
+      free(reader);
+    }
+  }
+
+  static int pgv_writer_flush(void *chan) {
+    pgv_writer_t *writer = chan;
+    PyGILState_STATE state;
+    PyObject *chunk, *rc = NULL;
+
+    if (writer->failed)
+      return EOF;
+    if (writer->size == 0)
+      return 0;
+    state = PyGILState_Ensure();
+    chunk = PyBytes_FromStringAndSize(writer->data, (Py_ssize_t)writer->size);
+    if (chunk != NULL) {
+      rc = PyObject_CallMethod(writer->file, "write", "O", chunk);
+      Py_DECREF(chunk);
+    }
+    writer->failed = rc == NULL;
+    Py_XDECREF(rc);
+    PyGILState_Release(state);
+    writer->size = 0;
+    return writer->failed ? EOF : 0;
+  }
+
+  static int pgv_writer_putstr(void *chan, const char *str) {
+    pgv_writer_t *writer = chan;
+    size_t len = strlen(str), n;
+
+    while (len > 0) {
+      if (writer->size == PGV_CHUNK && pgv_writer_flush(writer) == EOF)
+        return EOF;
+      n = PGV_CHUNK - writer->size;
+      if (n > len)
+        n = len;
+      memcpy(writer->data + writer->size, str, n);
+      writer->size += n;
+      str += n;
+      len -= n;
+    }
+    return 0;
+  }
+%}
+
+%exception agreadnext {
+  $action
+  if (PyErr_Occurred()) SWIG_fail;
+}
+
+%inline %{
+  /* a reader of graphs from file, a Python binary file object */
+  PyObject *agreader(PyObject *file)
+{
+    pgv_reader_t *reader = calloc(1, sizeof(pgv_reader_t));
+    PyObject *capsule;
+
+    if (reader == NULL)
+      return PyErr_NoMemory();
+    capsule = PyCapsule_New(reader, PGV_READER, pgv_reader_free);
+    if (capsule == NULL) {
+      free(reader);
+      return NULL;
+    }
+    Py_INCREF(file);
+    reader->file = file;
+    return capsule;
+}
+
+  /* the next graph from a reader, or NULL (None) at the end of the file */
+  Agraph_t *agreadnext(PyObject *capsule)
+{
+    pgv_reader_t *reader = PyCapsule_GetPointer(capsule, PGV_READER);
+    Agdisc_t disc = AgDefaultDisc;
+    Agiodisc_t io = AgIoDisc;
+    Agraph_t *g;
+    int errors;
+
+    if (reader == NULL || !pgv_lock_free())
+      return NULL;
+    io.afread = pgv_reader_read;
+    disc.io = &io;
+
+    Py_BEGIN_ALLOW_THREADS
+    pgv_lock();
+    agreseterrors();
+    g = agread(reader, &disc);
+    errors = agreseterrors();
+    if (g != NULL)
+      AGDISC(g, io) = &AgIoDisc;  /* io is gone after returning */
+    pgv_unlock();
+    Py_END_ALLOW_THREADS
+
+    if (PyErr_Occurred()) {
+      if (g != NULL)
+        agclose(g);
+      return NULL;
+    }
+    if (g == NULL && errors > 0)
+      PyErr_SetString(PyExc_ValueError, "agread: bad input data");
+    return g;
+}
+
+  /* write g to file, a Python binary file object, in chunks */
+  PyObject *agwritestream(Agraph_t *g, PyObject *file)
+{
+    pgv_writer_t writer = {file, malloc(PGV_CHUNK), 0, false};
+    Agiodisc_t io, *saved;
+    int rc;
+
+    if (writer.data == NULL)
+      return PyErr_NoMemory();
+    if (!pgv_lock_free()) {
+      free(writer.data);
+      return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    pgv_lock();
+    saved = AGDISC(g, io);
+    io = *saved;
+    io.putstr = pgv_writer_putstr;
+    io.flush = pgv_writer_flush;
+    AGDISC(g, io) = &io;
+    rc = agwrite(g, &writer);
+    if (rc != EOF)
+      rc = pgv_writer_flush(&writer);
+    AGDISC(g, io) = saved;
+    pgv_unlock();
+    Py_END_ALLOW_THREADS
+
+    free(writer.data);
+    if (PyErr_Occurred())
+      return NULL;
+    if (rc == EOF) {
+      PyErr_SetString(PyExc_OSError, "agwrite: error writing graph");
+      return NULL;
+    }
+    Py_RETURN_NONE;
+}
+  %}
+
 /* --- Wheel-compatible context with builtin plugins ---                */
 /* Wheels build graphviz with demand-loading (ltdl/config6) disabled,    */
 /* so plugins must be registered as builtins -- see                      */
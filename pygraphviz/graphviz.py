@@ -84,6 +84,9 @@ def agclose(g):
 def agread(input_file, arg2):
     return _graphviz.agread(input_file, arg2)
 
+def agmemread(cp):
+    return _graphviz.agmemread(cp)
+
 def agwrite(g, output_file):
     return _graphviz.agwrite(g, output_file)
 
@@ -186,6 +189,66 @@ def agsafeset_label(g, obj, name, val, _def):
 def agattr_label(g, kind, name, val):
     return _graphviz.agattr_label(g, kind, name, val)
 
+def agnode_find(g, name):
+    return _graphviz.agnode_find(g, name)
+
+def agedge_find(g, t, h, key):
+    return _graphviz.agedge_find(g, t, h, key)
+
+def agedge_add(g, t, h, key):
+    return _graphviz.agedge_add(g, t, h, key)
+
+def agnode_has(g, name):
+    return _graphviz.agnode_has(g, name)
+
+def agedge_has(g, tail, head, key):
+    return _graphviz.agedge_has(g, tail, head, key)
+
+def agedges_from_arrays(g, src, dst, attrs, encoding):
+    return _graphviz.agedges_from_arrays(g, src, dst, attrs, encoding)
+
+def agcsr(g, attrs, defval):
+    return _graphviz.agcsr(g, attrs, defval)
+
+def agseq(obj):
+    return _graphviz.agseq(obj)
+
+def agnodeseqs(g):
+    return _graphviz.agnodeseqs(g)
+
+def agedgeends(g):
+    return _graphviz.agedgeends(g)
+
+def agnodenames(g, encoding):
+    return _graphviz.agnodenames(g, encoding)
+
+def agedgenames(g, n, dir, encoding):
+    return _graphviz.agedgenames(g, n, dir, encoding)
+
+def agnodes_from(g, nbunch, attr, columns, encoding):
+    return _graphviz.agnodes_from(g, nbunch, attr, columns, encoding)
+
+def agedges_from(g, ebunch, encoding):
+    return _graphviz.agedges_from(g, ebunch, encoding)
+
+def agnodes_has(g, names, encoding):
+    return _graphviz.agnodes_has(g, names, encoding)
+
+def agedges_has(g, pairs, keys, encoding):
+    return _graphviz.agedges_has(g, pairs, keys, encoding)
+
+def agattrcolumn(g, kind, name, fill, encoding):
+    return _graphviz.agattrcolumn(g, kind, name, fill, encoding)
+
+def agsetattrcolumn(g, kind, name, values, encoding):
+    return _graphviz.agsetattrcolumn(g, kind, name, values, encoding)
+
+def agattrfloats(g, kind, attrs, count):
+    return _graphviz.agattrfloats(g, kind, attrs, count)
+
+def agsplinepoints(g):
+    return _graphviz.agsplinepoints(g)
+
 def agsubg(g, name, createflag):
     return _graphviz.agsubg(g, name, createflag)
 
@@ -264,6 +327,33 @@ def gvRenderData(gvc, g, format):
 def gvFreeRenderData(data):
     return _graphviz.gvFreeRenderData(data)
 
+def aglayoutarrays(g):
+    return _graphviz.aglayoutarrays(g)
+
+def aggeneration(g):
+    return _graphviz.aggeneration(g)
+
+def agsetgeneration(g, generation):
+    return _graphviz.agsetgeneration(g, generation)
+
+def agtouch(g):
+    return _graphviz.agtouch(g)
+
+def agmerge(dst, src, direction):
+    return _graphviz.agmerge(dst, src, direction)
+
+def agwritebytes(g):
+    return _graphviz.agwritebytes(g)
+
+def agreader(file):
+    return _graphviz.agreader(file)
+
+def agreadnext(capsule):
+    return _graphviz.agreadnext(capsule)
+
+def agwritestream(g, file):
+    return _graphviz.agwritestream(g, file)
+
 def gvContextWithBuiltins():
     return _graphviz.gvContextWithBuiltins()
 
@@ -0,0 +1,35 @@
+import pygraphviz as pgv
+
+
+def _graphs(count):
+    return [pgv.AGraph(data={i: [i + 1, i + 2]}, directed=True) for i in range(count)]
+
+
+def test_render_many_ordered():
+    graphs = _graphs(7)
+    expected = [G.draw(format="dot", prog="dot") for G in graphs]
+    results = list(pgv.render_many(iter(graphs), format="dot", workers=2))
+    assert [r.index for r in results] == list(range(7))
+    assert [r.error for r in results] == [None] * 7
+    assert [r.data for r in results] == expected
+
+
+def test_render_many_unordered():
+    graphs = _graphs(5)
+    results = list(pgv.render_many(graphs, format="svg", workers=3, ordered=False))
+    assert sorted(r.index for r in results) == list(range(5))
+    assert all(r.data.startswith(b"<?xml") for r in results)
+
+
+def test_render_many_failures():
+    graphs = _graphs(2) + ["digraph { a -> }", "digraph { a -> b }"]
+    results = list(pgv.render_many(graphs, prog="dot", format="dot", workers=2))
+    assert [r.error is None for r in results] == [True, True, False, True]
+    assert results[2].data is None
+    assert isinstance(results[2].error, Exception)
+    results = list(pgv.render_many(graphs[:1], prog="no-such-prog", workers=1))
+    assert isinstance(results[0].error, ValueError)
+
+
+def test_render_many_empty():
+    assert list(pgv.render_many([])) == []
@@ -0,0 +1,231 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pygraphviz as pgv
+
+
+def _graph():
+    G = pgv.AGraph(directed=True)
+    G.add_edge("a", "b", label="ab")
+    G.add_edge("b", "c")
+    G.add_subgraph(["a", "b"], name="cluster_0", label="c0")
+    return G
+
+
+def _layout_attrs(G):
+    return (
+        G.graph_attr["bb"],
+        G.get_subgraph("cluster_0").graph_attr.get("bb"),
+        list(G.get_node_attribute("pos")),
+        list(G.get_node_attribute("width")),
+        list(G.get_edge_attribute("pos")),
+        list(G.get_edge_attribute("lp")),
+    )
+
+
+def test_layout_cache_restores_attributes():
+    cache = pgv.LayoutCache(maxsize=4)
+    G = _graph()
+    G.layout(prog="dot", cache=cache)
+    H = _graph()
+    H.layout(prog="dot", cache=cache)
+    assert cache.info() == (1, 1, 4, 1)
+    assert H.has_layout
+    assert _layout_attrs(H) == _layout_attrs(G)
+    assert H.draw(format="plain") == G.draw(format="plain")
+
+
+def test_layout_cache_key():
+    cache = pgv.LayoutCache()
+    G = _graph()
+    key = cache.key(G, "dot")
+    assert key == cache.key(_graph(), "dot")
+    assert key != cache.key(G, "neato")
+    assert key != cache.key(G, "dot", "-Grankdir=LR")
+    assert key != cache.key(G, "dot", attributes=False)
+    G.get_node("a").attr["shape"] = "box"
+    assert key != cache.key(G, "dot")
+
+
+def test_cache_key_leaves_graph_unchanged():
+    # Run in a new interpreter: graphs created before any Graphviz context
+    # lack the default node label declaration, which the key must not add.
+    code = """if True:
+        import pygraphviz as pgv
+        G = pgv.AGraph(directed=True)
+        G.add_edge("a", "b")
+        dot, generation = G.to_string(), G.generation
+        layout_key = pgv.LayoutCache().key(G, "dot")
+        render_key = pgv.RenderCache().key(G, "svg", "dot")
+        assert (G.to_string(), G.generation) == (dot, generation)
+        pgv.get_context()  # graphs created from now on declare the label
+        H = pgv.AGraph(directed=True)
+        H.add_edge("a", "b")
+        assert H.to_string() != dot
+        assert pgv.LayoutCache().key(H, "dot") == layout_key
+        assert pgv.RenderCache().key(H, "svg", "dot") == render_key
+        """
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_layout_cache_miss_on_change():
+    cache = pgv.LayoutCache()
+    G = _graph()
+    G.layout(prog="dot", cache=cache)
+    H = _graph()
+    H.add_edge("c", "d")
+    H.layout(prog="dot", cache=cache)
+    H.layout(prog="neato", cache=cache)
+    assert cache.info().hits == 0
+    assert cache.info().misses == 3
+
+
+def test_layout_cache_lru():
+    cache = pgv.LayoutCache(maxsize=2)
+    graphs = [pgv.AGraph(data={i: [i + 1]}) for i in range(3)]
+    for G in graphs:
+        G.layout(prog="dot", cache=cache)
+    assert cache.info().currsize == 2
+    pgv.AGraph(data={0: [1]}).layout(prog="dot", cache=cache)  # evicted
+    pgv.AGraph(data={2: [3]}).layout(prog="dot", cache=cache)
+    assert cache.info()[:2] == (1, 4)
+    cache.clear()
+    assert cache.info() == (0, 0, 2, 0)
+
+
+def test_layout_cache_arrays():
+    cache = pgv.LayoutCache()
+    G = _graph()
+    G.layout(prog="dot", attributes=False, cache=cache)
+    H = _graph()
+    H.layout(prog="dot", attributes=False, cache=cache)
+    assert cache.info().hits == 1
+    assert not H.has_layout
+    assert "pos" not in H.get_node("a").attr.keys()
+    assert H.bounding_box().tolist() == G.bounding_box().tolist()
+    assert H.node_positions()[0].tolist() == G.node_positions()[0].tolist()
+
+
+def test_layout_cache_disk(tmp_path):
+    cache = pgv.LayoutCache(directory=tmp_path)
+    G = _graph()
+    G.layout(prog="dot", cache=cache)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # a new cache, as in another process, finds the layout on disk
+    other = pgv.LayoutCache(directory=tmp_path)
+    H = _graph()
+    H.layout(prog="dot", cache=other)
+    assert other.info() == (1, 0, 128, 1)
+    assert _layout_attrs(H) == _layout_attrs(G)
+
+    other.clear()
+    assert os.listdir(tmp_path) == []
+
+
+def test_layout_cache_disk_eviction(tmp_path):
+    cache = pgv.LayoutCache(maxsize=0, directory=tmp_path, disk_maxsize=2)
+    for i in range(4):
+        pgv.AGraph(data={i: [i + 1]}).layout(prog="dot", cache=cache)
+        assert len(os.listdir(tmp_path)) == min(i + 1, 2)
+    assert cache.info().currsize == 0
+
+
+def test_layout_cache_disk_corrupt(tmp_path):
+    cache = pgv.LayoutCache(maxsize=0, directory=tmp_path)
+    G = _graph()
+    G.layout(prog="dot", cache=cache)
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(b"garbage")
+    H = _graph()
+    H.layout(prog="dot", cache=cache)
+    assert cache.info()[:2] == (0, 2)
+    assert H.has_layout
+
+
+def test_layout_cache_maxsize():
+    with pytest.raises(ValueError):
+        pgv.LayoutCache(maxsize=-1)
+
+
+def test_render_cache():
+    cache = pgv.RenderCache(maxbytes=10**6)
+    svg = _graph().draw(format="svg", prog="dot")
+    G = _graph()
+    assert G.draw(format="svg", prog="dot", cache=cache) == svg
+    assert G.draw(format="svg", prog="dot", cache=cache) == svg
+    assert _graph().draw(format="svg", prog="dot", cache=cache) == svg
+    # Graphviz sets bb on the graph it lays out for draw(), not the key,
+    # so the output is kept under the keys before and after the first draw
+    assert cache.info() == (2, 1, 10**6, 2 * len(svg))
+
+    G.draw(format="svg", prog="neato", cache=cache)
+    G.draw(format="plain", prog="dot", cache=cache)
+    G.draw(format="svg", prog="dot", args="-Grankdir=LR", cache=cache)
+    assert cache.info()[:2] == (2, 4)
+
+
+def test_render_cache_path(tmp_path):
+    cache = pgv.RenderCache()
+    G = _graph()
+    G.draw(tmp_path / "a.svg", prog="dot", cache=cache)
+    G.draw(str(tmp_path / "b.svg"), prog="dot", cache=cache)
+    with open(tmp_path / "c.svg", "wb") as fh:
+        G.draw(fh, format="svg", prog="dot", cache=cache)
+    assert cache.info()[:2] == (2, 1)
+    data = (tmp_path / "a.svg").read_bytes()
+    assert data.startswith(b"<?xml")
+    assert (tmp_path / "b.svg").read_bytes() == data
+    assert (tmp_path / "c.svg").read_bytes() == data
+
+
+def test_render_cache_layout():
+    cache = pgv.RenderCache()
+    G = _graph()
+    with pytest.raises(AttributeError):
+        G.draw(format="svg", cache=cache)
+    G.layout(prog="dot")
+    first = G.draw(format="plain", cache=cache)
+    G.get_node("a").attr["pos"] = "0,0"
+    assert G.draw(format="plain", cache=cache) != first
+    assert cache.info()[:2] == (0, 2)
+
+
+def test_render_cache_byte_budget():
+    graphs = [pgv.AGraph(data={i: [i + 1]}) for i in range(3)]
+    sizes = [len(G.draw(format="svg", prog="dot")) for G in graphs]
+    cache = pgv.RenderCache(maxbytes=sizes[0] + sizes[1])
+    for G in graphs:
+        G.draw(format="svg", prog="dot", cache=cache)
+    assert cache.info().currbytes == sizes[1] + sizes[2]
+    graphs[0].draw(format="svg", prog="dot", cache=cache)  # evicted
+    graphs[2].draw(format="svg", prog="dot", cache=cache)
+    assert cache.info()[:2] == (1, 4)
+
+    cache = pgv.RenderCache(maxbytes=10)  # too large to keep
+    graphs[0].draw(format="svg", prog="dot", cache=cache)
+    assert cache.info().currbytes == 0
+
+
+def test_render_cache_disk(tmp_path):
+    cache = pgv.RenderCache(maxbytes=0, directory=tmp_path)
+    G = _graph()
+    svg = G.draw(format="svg", prog="dot", cache=cache)
+    assert [p.read_bytes() for p in tmp_path.iterdir()] == [svg, svg]
+
+    other = pgv.RenderCache(directory=tmp_path)
+    assert _graph().draw(format="svg", prog="dot", cache=other) == svg
+    assert other.info() == (1, 0, 64 * 2**20, len(svg))
+
+
+def test_render_cache_disk_eviction(tmp_path):
+    graphs = [pgv.AGraph(data={i: [i + 1]}) for i in range(4)]
+    size = max(len(G.draw(format="svg", prog="dot")) for G in graphs)
+    cache = pgv.RenderCache(maxbytes=0, directory=tmp_path, disk_maxbytes=2 * size)
+    for G in graphs:
+        G.draw(format="svg", prog="dot", cache=cache)
+        assert sum(p.stat().st_size for p in tmp_path.iterdir()) <= 2 * size
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import pygraphviz as pgv
+
+
+def test_default_context_is_reused():
+    pgv.release_context()
+    context = pgv.get_context()
+    assert pgv.get_context() is context
+    A = pgv.AGraph()
+    A.add_edge(1, 2)
+    A.layout(prog="dot")
+    assert A.draw(format="dot", prog="dot")
+    assert pgv.get_context() is context
+    pgv.release_context()
+    assert context.closed
+    assert pgv.get_context() is not context
+
+
+def test_default_context_per_thread():
+    contexts = []
+    thread = threading.Thread(target=lambda: contexts.append(pgv.get_context()))
+    thread.start()
+    thread.join()
+    assert contexts[0] is not pgv.get_context()
+
+
+def test_explicit_context():
+    A = pgv.AGraph()
+    A.add_edge(1, 2)
+    with pgv.GVContext() as context:
+        A.layout(prog="dot", context=context)
+        assert A.draw(format="svg", prog="neato", context=context).startswith(b"<?xml")
+    assert context.closed
+    context.close()  # closing twice is fine
+    with pytest.raises(ValueError, match="context is closed"):
+        A.layout(context=context)
+    with pytest.raises(ValueError, match="context is closed"):
+        A.draw(format="dot", prog="dot", context=context)
+
+
+def test_context_survives_errors():
+    A = pgv.AGraph()
+    A.add_edge(1, 2)
+    with pytest.raises(ValueError):
+        A.draw(format="no-such-format", prog="dot")
+    with pytest.raises(ValueError):
+        A.layout(prog="no-such-prog")
+    A.layout(prog="dot")
+    assert A.draw(format="dot")
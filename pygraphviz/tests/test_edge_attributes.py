@@ -1,3 +1,4 @@
+import pytest
 import pygraphviz as pgv
 
 stringify = pgv.testing.stringify
@@ -66,3 +67,27 @@ def test_edge_attribute_update_nonstrict():
     A.add_edge(1, 2, label="update", spam="", key="one")
     ans = """graph { 1 -- 2 [key=one, label=update]; }"""
     assert stringify(A) == " ".join(ans.split())
+
+
+def test_get_edge_attribute():
+    A = pgv.AGraph(directed=True)
+    A.add_edges_from([(1, 2), (3, 1), (1, 3)])
+    A.get_edge(3, 1).attr["weight"] = 2
+    expected = [e.attr["weight"] for e in A.edges()]
+    assert list(A.get_edge_attribute("weight")) == expected
+    assert list(A.get_edge_attribute("weight", default="1")) == ["1", "1", "2"]
+    assert list(A.get_edge_attribute("color")) == [None] * 3
+
+
+def test_set_edge_attribute():
+    A = pgv.AGraph(directed=True, strict=False)
+    A.add_edges_from([(1, 2), (2, 3), (1, 2, "k")])
+    A.set_edge_attribute("weight", range(3))
+    assert [e.attr["weight"] for e in A.edges()] == ["0", "1", "2"]
+    A.set_edge_attribute("color", {(2, 3): "red", (1, 2, "k"): "blue"})
+    assert A.get_edge(2, 3).attr["color"] == "red"
+    assert A.get_edge(1, 2, "k").attr["color"] == "blue"
+    with pytest.raises(KeyError, match="Edge 3-2 not in graph"):
+        A.set_edge_attribute("color", {(3, 2): "red"})
+    with pytest.raises(ValueError, match="got 1 values for 3 edges"):
+        A.set_edge_attribute("color", ["red"])
@@ -374,6 +374,43 @@ class TestGraph(unittest.TestCase):
         # Verify edges, including keys, are identical to original graph
         assert set(A.edges(keys=True)) == set(AC.edges(keys=True))
 
+    def test_copy_subgraphs(self):
+        A = pgv.AGraph(
+            'strict digraph G { charset=latin1; node [shape=box]; "\xe9" -> b [color=red]; '
+            "subgraph cluster_0 { label=c0; edge [style=bold]; b -> c "
+            "subgraph cluster_1 { d } } }"
+        )
+        AC = A.copy()
+        assert AC.to_string() == A.to_string()
+        assert AC.get_subgraph("cluster_0").get_subgraph("cluster_1").nodes() == ["d"]
+        AC.get_subgraph("cluster_0").add_node("e")
+        assert "e" not in A
+
+        R = A.reverse()
+        assert R.edges() == [("b", "\xe9"), ("c", "b")]
+        assert R.get_edge("b", "\xe9").attr["color"] == "red"
+        assert R.get_subgraph("cluster_0").edges() == [("c", "b")]
+        assert R.reverse().to_string() == A.to_string()
+
+    def test_to_directed_undirected(self):
+        U = pgv.AGraph(strict=False)
+        U.add_edge(1, 2, color="red")
+        U.add_edge(2, 3)
+        U.add_subgraph([2, 3], name="cluster_0")
+        D = U.to_directed()
+        assert D.directed and not D.strict
+        assert D.edges() == [("1", "2"), ("2", "1"), ("2", "3"), ("3", "2")]
+        assert D.get_edge(2, 1).attr["color"] == "red"
+        assert D.get_subgraph("cluster_0").edges() == [("2", "3"), ("3", "2")]
+
+        B = D.to_undirected()
+        assert not B.directed
+        assert len(B.edges()) == 4
+        B = pgv.AGraph(D.to_string().replace("digraph", "strict digraph"))
+        B = B.to_undirected()
+        assert sorted(map(sorted, B.edges())) == [["1", "2"], ["2", "3"]]
+        assert B.get_subgraph("cluster_0").number_of_edges() == 1
+
     def test_add_path(self):
         A = pgv.AGraph()
         A.add_path([1, 2, 3])
@@ -590,3 +627,259 @@ def test_long_node(node):
     A.layout()  # Smoke test - should not raise
     # Check each node was assigned a position
     assert A.to_string().count("pos") == 6
+
+
+def test_add_edges_from_keys():
+    A = pgv.AGraph(strict=False, directed=True)
+    A.add_edges_from([(1, 2), (1, 2, "a"), ("x", "y", None), (1, 2, "a")])
+    assert sorted(A.nodes()) == ["1", "2", "x", "y"]
+    assert sorted(A.edges(keys=True), key=str) == sorted(
+        [("1", "2", None), ("1", "2", "a"), ("x", "y", None)], key=str
+    )
+
+
+def test_add_edges_from_strict_existing():
+    A = pgv.AGraph()
+    A.add_edge(1, 2, color="red")
+    A.add_edges_from([(2, 1), (2, 3)])
+    assert sorted(A.edges()) == [("1", "2"), ("2", "3")]
+    assert A.get_edge(1, 2).attr["color"] == "red"
+
+
+def test_add_edges_from_bad_input():
+    A = pgv.AGraph()
+    with pytest.raises(ValueError, match="edges must be"):
+        A.add_edges_from([(1, 2, 3, 4)])
+    with pytest.raises(TypeError, match="edges must be"):
+        A.add_edges_from([1])
+
+
+def test_from_edge_arrays():
+    import array
+
+    src = array.array("q", [0, 1, 2, 2])
+    dst = array.array("i", [1, 2, 0, 0])
+    weight = array.array("d", [1.0, 0.25, 3.5, 4.0])
+    A = pgv.AGraph.from_edge_arrays(
+        src, dst, edge_attrs={"weight": weight, "color": ["a", "b", "c", "d"]}
+    )
+    assert A.is_strict() and not A.is_directed()
+    assert sorted(A.nodes()) == ["0", "1", "2"]
+    assert sorted(A.edges()) == [("0", "1"), ("1", "2"), ("2", "0")]
+    assert A.get_edge(0, 1).attr["weight"] == "1.0"
+    # a repeated edge in a strict graph keeps the last values
+    assert A.get_edge(2, 0).attr["weight"] == "4.0"
+    assert A.get_edge(2, 0).attr["color"] == "d"
+
+    B = pgv.AGraph.from_edge_arrays([5, 5], [6, 6], strict=False, directed=True)
+    assert B.number_of_edges() == 2
+
+
+def test_from_edge_arrays_numpy():
+    np = pytest.importorskip("numpy")
+    src = np.arange(10, dtype=np.int64)
+    dst = (src + 1) % 10
+    weight = np.linspace(0, 1, 10)
+    A = pgv.AGraph.from_edge_arrays(src, dst[::-1][::-1], edge_attrs={"w": weight})
+    assert A.number_of_nodes() == A.number_of_edges() == 10
+    assert A.get_edge(9, 0).attr["w"] == "1.0"
+    # strided views are read in place
+    B = pgv.AGraph.from_edge_arrays(src[::2], src[1::2], directed=True)
+    assert B.edges() == [("0", "1"), ("2", "3"), ("4", "5"), ("6", "7"), ("8", "9")]
+
+
+def test_from_edge_arrays_mismatch():
+    with pytest.raises(ValueError, match="same length"):
+        pgv.AGraph.from_edge_arrays([1, 2], [3])
+    with pytest.raises(ValueError, match="Edge attribute w"):
+        pgv.AGraph.from_edge_arrays([1, 2], [3, 4], edge_attrs={"w": [1]})
+
+
+def test_node_index():
+    A = pgv.AGraph()
+    A.add_nodes_from(["a", "b", "c", "d"])
+    assert [A.node_index(n) for n in A.nodes()] == [0, 1, 2, 3]
+    assert [A.node_name(i) for i in range(4)] == ["a", "b", "c", "d"]
+    A.remove_node("b")
+    A.add_node("e")
+    assert A.node_index("c") == 1
+    assert A.node_index("e") == 3
+    assert A.node_name(3) == "e"
+    # same node count, different node set
+    A.remove_node("e")
+    A.add_node("f")
+    assert A.node_name(3) == "f"
+    with pytest.raises(KeyError):
+        A.node_index("b")
+    with pytest.raises(IndexError):
+        A.node_name(4)
+
+
+def test_node_index_after_read():
+    A = pgv.AGraph(string="graph {a; b}")
+    assert A.node_name(1) == "b"
+    A.from_string("graph {x; y}")
+    assert A.node_name(1) == "y"
+
+
+def test_edge_endpoints():
+    A = pgv.AGraph(strict=False)
+    A.add_edges_from([(1, 2), (2, 3), (3, 1), (1, 1)])
+    tails, heads = A.edge_endpoints()
+    nodes = A.nodes()
+    assert [
+        (nodes[t], nodes[h]) for t, h in zip(tails, heads, strict=True)
+    ] == A.edges()
+
+
+@pytest.mark.parametrize("directed", [True, False])
+def test_raw_iterators(directed):
+    A = pgv.AGraph(directed=directed, strict=False)
+    A.add_edges_from([(1, 2), (2, 3), (3, 3), (3, 1), (1, 2, "x")])
+    A.add_node("é")
+    assert list(A.nodes_iter(raw=True)) == A.nodes()
+    assert all(type(n) is str for n in A.nodes_iter(raw=True))
+    for nbunch in [None, 3, [1, 2], [2, "missing"]]:
+        for keys in [False, True]:
+            for method in ["edges_iter", "out_edges_iter", "in_edges_iter"]:
+                if not directed and method != "edges_iter":
+                    continue
+                iterator = getattr(A, method)
+                expected = [tuple(e) for e in iterator(nbunch, keys=keys)]
+                raw = list(iterator(nbunch, keys=keys, raw=True))
+                assert raw == expected
+                assert all(type(e) is tuple for e in raw)
+    for n in A:
+        assert list(A.neighbors_iter(n, raw=True)) == A.neighbors(n)
+
+
+def test_lazy_item_attr():
+    A = pgv.AGraph(string='graph { charset="latin1"; a -- b [color=red] }')
+    n = A.get_node("a")
+    assert "attr" not in vars(n)
+    n.attr["shape"] = "box"
+    assert n.attr is n.attr
+    assert n.attr.encoding == "latin1"
+    assert A.get_node("a").attr["shape"] == "box"
+    assert A.get_edge("a", "b").attr["color"] == "red"
+
+
+def test_name_cache():
+    A = pgv.AGraph(string='graph { charset="latin1"; "é" -- b }')
+    A.add_edge(1, 2)
+    assert A.has_node("é") and A.has_node(1) and A.has_node("1")
+    assert not A.has_node(1.0) and not A.has_node(True)
+    info = A.name_cache_info()
+    assert info.hits > 0 and info.misses > 0
+    assert 0 < info.currsize <= 2 * info.maxsize
+    assert sorted(A.nodes()) == ["1", "2", "b", "é"]
+    A.add_node(True)
+    assert A.has_node("True") and not A.has_node(1.0)
+    A.clear()
+    assert A.name_cache_info() == (0, 0, info.maxsize, 0)
+    A.add_node("a")
+    A.from_string("graph { x }")
+    assert A.name_cache_info().currsize == 0
+    assert A.nodes() == ["x"]
+
+
+def test_name_cache_bounded(monkeypatch):
+    monkeypatch.setattr(pgv.agraph._NameCache, "maxsize", 4)
+    A = pgv.AGraph()
+    A.add_nodes_from(range(10))
+    for n in range(10):
+        assert A.has_node(n)
+    assert A.name_cache_info().currsize <= 8
+
+
+def test_lookup_primitives():
+    A = pgv.AGraph(strict=False)
+    A.add_edge(1, 2, key=3)
+    assert A.has_node(1) is True and (2 in A) is True
+    assert A.has_node("x") is False and ("x" in A) is False
+    assert A.has_edge(1, 2) is True and A.has_edge((1, 2)) is True
+    assert A.has_edge(1, 2, 3) is True and A.has_edge(1, 2, "4") is False
+    assert A.has_edge(1, "x") is False and A.has_edge("x", "y") is False
+    with pytest.raises(KeyError, match="Node x not in graph"):
+        A.get_node("x")
+    assert A.get_node(1).handle == A.get_node("1").handle
+    # adding an existing edge to a strict graph finds it
+    B = pgv.AGraph(strict=True)
+    B.add_edge("a", "b")
+    B.add_edge("a", "b", color="red")
+    assert B.number_of_edges() == 1
+    assert B.get_edge("a", "b").attr["color"] == "red"
+
+
+def test_has_nodes_has_edges():
+    A = pgv.AGraph(strict=False, directed=True)
+    A.add_edges_from([(1, 2, "x"), (2, 3)])
+    found = A.has_nodes([1, "2", 4, "3"])
+    assert [bool(b) for b in found] == [True, True, False, True]
+    edges = [(1, 2), (2, 1), (2, 3, None), (1, 2, "x"), (1, 2, "y"), (5, 6)]
+    found = A.has_edges(edges)
+    assert [bool(b) for b in found] == [A.has_edge(*e) for e in edges]
+    found = A.has_edges([(1, 2), (1, 2), (2, 3)], keys=["x", "y", None])
+    assert [bool(b) for b in found] == [True, False, True]
+    assert len(A.has_nodes([])) == 0
+    with pytest.raises(ValueError, match="got 1 keys for 2 edges"):
+        A.has_edges([(1, 2), (2, 3)], keys=["x"])
+    with pytest.raises(ValueError, match="edges must be"):
+        A.has_edges([(1,)])
+
+
+def test_has_nodes_has_edges_numpy():
+    np = pytest.importorskip("numpy")
+    A = pgv.AGraph()
+    A.add_edge("a", "b")
+    found = A.has_nodes(np.array(["a", "c"]))
+    assert found.dtype == np.bool_
+    assert found.tolist() == [True, False]
+    assert A.has_edges([("b", "a")]).tolist() == [True]
+
+
+def test_generation():
+    A = pgv.AGraph(strict=False)
+    seen = [A.generation]
+
+    def changed():
+        seen.append(A.generation)
+        return seen[-1] > seen[-2]
+
+    assert not changed()
+    A.add_node(1)
+    assert changed()
+    A.add_edge(1, 2, key="k")
+    assert changed()
+    A.get_node(1).attr["color"] = "red"
+    assert changed()
+    A.get_edge(1, 2, "k").attr["color"] = "red"
+    assert changed()
+    A.set_node_attribute("shape", ["box", "circle"])
+    assert changed()
+    A.node_attr["fontsize"] = "8"
+    assert changed()
+    A.graph_attr["rankdir"] = "LR"
+    assert changed()
+    S = A.add_subgraph([1], name="s")
+    assert changed()
+    S.graph_attr["color"] = "blue"
+    assert changed()
+    S.add_node(3)
+    assert changed()
+    A.delete_subgraph("s")
+    assert changed()
+    A.remove_edge(1, 2, "k")
+    assert changed()
+    A.remove_node(3)
+    assert changed()
+    # reads don't count
+    A.nodes(), A.edges(), A.to_string(), A.get_node(1).attr["color"]
+    assert not changed()
+    # the count goes on when the graph is replaced
+    A.from_string("graph { a -- b }")
+    assert changed()
+    A.clear()
+    assert changed()
+    A.layout(prog="dot")
+    assert changed()
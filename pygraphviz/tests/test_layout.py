@@ -61,6 +61,65 @@ def test_bad_prog_arg_raises():
         A.layout(prog="not-a-valid-layout")
 
 
+def _flat(values):
+    # flatten a float array, NumPy or array.array, to a list
+    return memoryview(values).cast("B").cast("d").tolist()
+
+
+def test_layout_arrays():
+    A = pgv.AGraph(name="test graph", directed=True, strict=False)
+    A.add_edges_from([(1, 2), (2, 3), (1, 3), (3, 3)])
+    A.add_node(4, pos="1,2!")
+    positions, nodes = A.node_positions()
+    assert nodes == A.nodes()
+    assert _flat(positions)[6:] == [1.0, 2.0]
+    assert all(v != v for v in _flat(positions)[:6])  # NaN before layout
+    A.layout(prog="dot")
+    positions, _ = A.node_positions()
+    expected = [float(v) for n in A.nodes() for v in n.attr["pos"].split(",")]
+    assert _flat(positions) == expected
+
+    points, offsets = A.edge_splines()
+    assert len(offsets) == A.number_of_edges() + 1
+    assert offsets[0] == 0 and offsets[-1] * 2 == len(_flat(points))
+    for i, e in enumerate(A.edges()):
+        controls = [t for t in e.attr["pos"].split() if t[:2] not in ("s,", "e,")]
+        assert offsets[i + 1] - offsets[i] == len(controls)
+        xy = [float(v) for t in controls for v in t.split(",")]
+        assert _flat(points)[2 * offsets[i] : 2 * offsets[i + 1]] == xy
+
+    sizes = A.node_sizes()
+    assert _flat(sizes)[:2] == [0.75, 0.5]
+    bb = [float(v) for v in A.graph_attr["bb"].split(",")]
+    assert _flat(A.bounding_box()) == bb
+
+
+def test_layout_arrays_malformed():
+    A = pgv.AGraph()
+    A.add_node(1, pos="1,2!")
+    A.add_node(2, pos="1,2abc")
+    A.add_node(3, pos="1abc,2")
+    A.add_node(4, pos="3 4")
+    positions, _ = A.node_positions()
+    flat = _flat(positions)
+    assert flat[:2] == [1.0, 2.0] and flat[6:] == [3.0, 4.0]
+    assert all(v != v for v in flat[2:6])
+
+
+def test_layout_arrays_numpy():
+    np = pytest.importorskip("numpy")
+    A = pgv.AGraph()
+    A.add_path([1, 2, 3])
+    A.layout(prog="dot")
+    positions, _ = A.node_positions()
+    assert positions.shape == (3, 2)
+    assert A.node_sizes().shape == (3, 2)
+    points, offsets = A.edge_splines()
+    assert points.ndim == 2 and points.shape[1] == 2
+    assert offsets.dtype == np.int64
+    assert A.bounding_box().shape == (4,)
+
+
 class TestExperimentalGraphvizLibInterface:
     def test_layout(self):
         A = pgv.AGraph(name="test graph")
@@ -109,3 +168,40 @@ class TestExperimentalGraphvizLibInterface:
         A.layout(prog="nop")
         result = [n.attr["pos"] for n in A.nodes()]
         assert result != dot_pos
+
+
+@pytest.mark.parametrize("prog", ("dot", "neato"))
+def test_layout_without_attributes(prog):
+    A = pgv.AGraph(directed=True, strict=False)
+    A.add_edges_from([(1, 2), (2, 3), (1, 3), (1, 3)])
+    A.layout(prog=prog)
+    expected = [
+        _flat(A.node_positions()[0]),
+        _flat(A.node_sizes()),
+        _flat(A.edge_splines()[0]),
+        list(A.edge_splines()[1]),
+        _flat(A.bounding_box()),
+    ]
+
+    B = pgv.AGraph(directed=True, strict=False)
+    B.add_edges_from([(1, 2), (2, 3), (1, 3), (1, 3)])
+    B.layout(prog=prog, attributes=False)
+    assert not B.has_layout
+    assert all(n.attr["pos"] is None for n in B)
+    assert all(e.attr["pos"] is None for e in B.edges())
+    result = [
+        _flat(B.node_positions()[0]),
+        _flat(B.node_sizes()),
+        _flat(B.edge_splines()[0]),
+        list(B.edge_splines()[1]),
+        _flat(B.bounding_box()),
+    ]
+    assert result[3] == expected[3]
+    for got, want in zip(result, expected, strict=True):
+        assert got == pytest.approx(want, rel=1e-4, abs=1e-2)
+
+    # the arrays are dropped once the graph changes
+    B.add_node(4)
+    positions, nodes = B.node_positions()
+    assert nodes == ["1", "2", "3", "4"]
+    assert all(v != v for v in _flat(positions))
@@ -0,0 +1,120 @@
+import io
+
+import pytest
+
+import pygraphviz as pgv
+
+
+def test_concat_attributes():
+    G = pgv.AGraph("digraph { node [shape=box]; a [color=red]; b [color=red]; a -> b }")
+    G.concat(
+        "digraph { rankdir=LR; node [shape=circle, style=filled]; "
+        'a [color=blue]; b [color=""]; c; a -> b [label=ab] }'
+    )
+    assert G.graph_attr["rankdir"] == "LR"
+    assert G.node_attr["shape"] == "circle"
+    # existing nodes keep their values under the new defaults
+    assert G.get_node("a").attr["shape"] == "box"
+    assert G.get_node("a").attr["style"] == ""
+    assert G.get_node("c").attr["shape"] == "circle"
+    # set values win, empty ones do not erase
+    assert G.get_node("a").attr["color"] == "blue"
+    assert G.get_node("b").attr["color"] == "red"
+    assert G.get_edge("a", "b").attr["label"] == "ab"
+
+
+def test_concat_edges():
+    G = pgv.AGraph(strict=False, directed=True)
+    G.add_edge("a", "b", color="red")
+    G.add_edge("a", "b", key="k")
+    H = pgv.AGraph(
+        "digraph { a -> b; a -> b [style=bold]; a -> b [key=k, label=k]; b -> a }"
+    )
+    G.concat(H)
+    assert sorted(G.edges(keys=True), key=str) == [
+        ("a", "b", "k"),
+        ("a", "b", None),
+        ("a", "b", None),
+        ("b", "a", None),
+    ]
+    assert sorted(e.attr["style"] for e in G.edges() if e.attr["color"]) == [""]
+    assert G.get_edge("a", "b", "k").attr["label"] == "k"
+    dot = G.to_string()
+    G.concat(H)
+    G.concat(G)
+    assert G.to_string() == dot
+
+
+def test_concat_undirected_and_strict():
+    G = pgv.AGraph("graph { a -- b; c -- a }", strict=False)
+    G.concat("graph { b -- a; a -- b; a -- c }")
+    assert sorted(map(sorted, G.edges())) == [["a", "b"], ["a", "b"], ["a", "c"]]
+
+    S = pgv.AGraph(strict=True, directed=True)
+    S.concat("digraph { a -> b [key=x]; a -> b [key=y, color=red]; b -> a }")
+    assert S.edges() == [("a", "b"), ("b", "a")]
+    assert S.get_edge("a", "b").attr["color"] == "red"
+
+
+def test_concat_subgraphs():
+    G = pgv.AGraph("digraph { subgraph cluster_0 { label=zero; a } }")
+    G.concat(
+        "digraph { subgraph cluster_0 { node [color=blue]; b } "
+        "subgraph cluster_1 { label=one; edge [color=red]; "
+        "subgraph cluster_2 { c -> d } } }"
+    )
+    zero = G.get_subgraph("cluster_0")
+    assert zero.graph_attr["label"] == "zero"
+    assert zero.node_attr["color"] == "blue"
+    assert sorted(zero.nodes()) == ["a", "b"]
+    one = G.get_subgraph("cluster_1")
+    assert one.graph_attr["label"] == "one"
+    assert one.edge_attr["color"] == "red"
+    assert one.get_subgraph("cluster_2").edges() == [("c", "d")]
+
+
+def test_concat_into_subgraph():
+    G = pgv.AGraph(directed=True)
+    G.add_node("a", color="red")
+    sub = G.add_subgraph(name="cluster_0")
+    sub.concat("digraph { a -> b }")
+    assert sorted(sub.nodes()) == ["a", "b"]
+    assert G.get_node("a").attr["color"] == "red"
+    assert G.edges() == [("a", "b")]
+
+
+def test_concat_sources(tmp_path):
+    path = tmp_path / "parts.dot"
+    path.write_text("digraph { a -> b }\ndigraph { b -> c }\n")
+    G = pgv.AGraph(directed=True)
+    G.concat(path)
+    G.concat(str(path))
+    G.concat(io.StringIO("digraph { c -> d }"))
+    G.concat(b"digraph { d -> e }")
+    assert G.edges() == [("a", "b"), ("b", "c"), ("c", "d"), ("d", "e")]
+    with pytest.raises(pgv.DotError):
+        G.concat("digraph { -> }")
+
+
+def test_concat_encoding():
+    G = pgv.AGraph()
+    H = pgv.AGraph(charset="latin1")
+    with pytest.raises(ValueError):
+        G.concat(H)
+    H.add_node("\xe9")
+    L = pgv.AGraph(charset="iso-8859-1")
+    L.concat(H)
+    assert L.nodes() == ["\xe9"]
+
+
+def test_union():
+    assert pgv.union([]).nodes() == []
+    parts = [pgv.AGraph(data={i: [i + 1]}, directed=True) for i in range(100)]
+    G = pgv.union(parts)
+    assert G.directed and G.strict
+    assert G.number_of_nodes() == 101
+    assert G.number_of_edges() == 100
+    U = pgv.union(["strict graph u { a -- b }", "digraph { b -> c }"])
+    assert (U.name, U.directed, U.strict) == ("u", False, True)
+    assert sorted(map(sorted, U.edges())) == [["a", "b"], ["b", "c"]]
+    assert pgv.union([pgv.AGraph(charset="latin1")]).encoding == "latin1"
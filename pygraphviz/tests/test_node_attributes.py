@@ -1,3 +1,4 @@
+import pytest
 import pygraphviz as pgv
 
 stringify = pgv.testing.stringify
@@ -47,3 +48,57 @@ def test_node_attribute_remove():
     A.add_node(1, label=r"\N", spam="")  # use \N to signify null label, else ''
     ans = """strict graph { node [label="\\N"]; 1; }"""
     assert stringify(A) == ans
+
+
+def test_add_nodes_from_attributes():
+    A = pgv.AGraph()
+    A.add_nodes_from([1, (2, {"label": "two"}), (3, {"spam": "eggs"})], color="red")
+    ans = """strict graph { node [label="\\N"]; 1 [color=red]; 2 [color=red, label=two];
+             3 [color=red, spam=eggs]; }"""
+    assert stringify(A) == " ".join(ans.split())
+
+
+def test_add_nodes_from_columns():
+    A = pgv.AGraph()
+    A.add_nodes_from(
+        iter(["a", "b"]), columns={"width": [1, 2.5], "label": ["<<B>a</B>>", "b"]}
+    )
+    assert A.get_node("a").attr["width"] == "1"
+    assert A.get_node("b").attr["width"] == "2.5"
+    assert "label=<<B>a</B>>" in stringify(A)
+
+
+def test_add_nodes_from_columns_length_mismatch():
+    A = pgv.AGraph()
+    with pytest.raises(ValueError, match="Attribute column width"):
+        A.add_nodes_from(["a", "b"], columns={"width": [1]})
+    assert len(A) == 0
+
+
+def test_get_node_attribute():
+    A = pgv.AGraph()
+    A.node_attr["shape"] = "box"
+    A.add_nodes_from(["a", "b", "c"])
+    A.get_node("b").attr["shape"] = "circle"
+    A.get_node("c").attr["label"] = "<<B>c</B>>"
+    assert list(A.get_node_attribute("shape")) == ["box", "circle", "box"]
+    assert list(A.get_node_attribute("shape", default="")) == ["", "circle", ""]
+    assert list(A.get_node_attribute("label")) == ["\\N", "\\N", "<B>c</B>"]
+    assert list(A.get_node_attribute("spam")) == [None, None, None]
+    assert list(A.get_node_attribute("spam", default=0)) == [0, 0, 0]
+    assert [n.attr["shape"] for n in A] == list(A.get_node_attribute("shape"))
+
+
+def test_set_node_attribute():
+    A = pgv.AGraph()
+    A.add_nodes_from(["a", "b", "c"])
+    A.set_node_attribute("width", [1, 2.5, "3"])
+    assert list(A.get_node_attribute("width")) == ["1", "2.5", "3"]
+    A.set_node_attribute("label", {"a": "<<B>a</B>>", "c": "see"})
+    assert A.get_node("a").attr["label"] == "<B>a</B>"
+    assert A.get_node("b").attr["label"] == "\\N"
+    assert "label=<<B>a</B>>" in stringify(A)
+    with pytest.raises(ValueError, match="got 2 values for 3 nodes"):
+        A.set_node_attribute("width", [1, 2])
+    with pytest.raises(KeyError, match="Node x not in graph"):
+        A.set_node_attribute("width", {"x": 1})
@@ -1,3 +1,5 @@
+import io
+
 import pytest
 import pygraphviz as pgv
 
@@ -55,3 +57,163 @@ def test_readwrite_pathobj(tmp_path):
 def test_sequential_reads_windows():
     for _ in range(512):
         pgv.AGraph("digraph {1 -> 2}")
+
+
+def test_write_file_objects(tmp_path):
+    A = pgv.AGraph(string='graph test { charset="latin1"; "é" -- b }')
+    expected = A.to_string()
+    assert expected.startswith("graph test {") and "é" in expected
+
+    text = io.StringIO()
+    A.write(text)
+    assert text.getvalue() == expected
+
+    binary = io.BytesIO()
+    A.write(binary)
+    assert binary.getvalue() == expected.encode("latin1")
+
+    with open(tmp_path / "test.dot", "w", encoding="latin1") as fh:
+        A.write(fh)
+    A.write(tmp_path / "test2.dot")
+    for name in ("test.dot", "test2.dot"):
+        assert (tmp_path / name).read_bytes() == expected.encode("latin1")
+
+
+def test_to_string_large():
+    A = pgv.AGraph()
+    A.add_edges_from((i, i + 1) for i in range(20000))
+    s = A.to_string()
+    assert s.count("--") == 20000
+    assert pgv.AGraph(string=s).number_of_edges() == 20000
+
+
+@pytest.mark.parametrize("ext", [".gz", ".bz2", ".xz", ".lzma", ".zst"])
+def test_readwrite_compressed(tmp_path, ext):
+    if ext == ".zst":
+        try:
+            import compression.zstd
+        except ImportError:
+            pytest.importorskip("zstandard")
+    A = pgv.AGraph(string='digraph G { charset="latin1"; "\xe9" -> b [color=red] }')
+    A.add_edges_from((i, i + 1) for i in range(5000))
+    path = tmp_path / f"test.dot{ext}"
+    A.write(path)
+    B = pgv.AGraph(path)
+    assert B.to_string() == A.to_string()
+    C = pgv.AGraph(str(path))
+    assert C.to_string() == A.to_string()
+    with pgv.agraph._open_compressed(path, "r") as fh:
+        assert fh.read() == A.to_string().encode("latin1")
+
+
+def test_read_file_objects():
+    data = "graph { a -- b }"
+    for fh in (io.StringIO(data), io.BytesIO(data.encode())):
+        A = pgv.AGraph()
+        A.read(fh)
+        assert A.edges() == [("a", "b")]
+    A = pgv.AGraph(filename=io.StringIO('graph { charset=latin1; "\xe9" }'))
+    assert A.nodes() == ["\xe9"]
+    with pytest.raises(pgv.DotError):
+        A.read(io.BytesIO(b"  "))
+    with pytest.raises(pgv.DotError):
+        A.read(io.BytesIO(b"graph { a -- "))
+
+
+def test_read_text_file_after_readline(tmp_path):
+    path = tmp_path / "two.dot"
+    data = 'graph a { x }\ngraph b { charset=latin1; "\xe9" }\n'
+    path.write_text(data, encoding="latin1")
+    with open(path, encoding="latin1") as fh:
+        fh.readline()
+        A = pgv.AGraph(filename=fh)
+    assert A.name == "b" and A.nodes() == ["\xe9"]
+    with open(path, encoding="latin1") as fh:
+        fh.readline()
+        assert [G.name for G in pgv.iter_graphs(fh)] == ["b"]
+
+
+def test_read_write_errors():
+    class Failing(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def writable(self):
+            return True
+
+        def read(self, size=-1):
+            raise RuntimeError("read failed")
+
+        def write(self, data):
+            raise RuntimeError("write failed")
+
+    A = pgv.AGraph()
+    with pytest.raises(RuntimeError, match="read failed"):
+        A.read(Failing())
+    A = pgv.AGraph(data={1: [2]})
+    with pytest.raises(RuntimeError, match="write failed"):
+        A.write(Failing())
+
+    class NotAFile:
+        def write(self, data):
+            pass
+
+    with pytest.raises(TypeError, match="not a file handle"):
+        A.write(NotAFile())
+    with pytest.raises(TypeError):
+        A.write(1)
+
+
+def test_read_write_reentrant():
+    # a file object using Graphviz while it is read or written fails
+    # instead of deadlocking
+    class Reentrant(io.BytesIO):
+        def read(self, size=-1):
+            pgv.AGraph("graph { a }")
+            return super().read(size)
+
+        def write(self, data):
+            pgv.AGraph().to_string()
+            return super().write(data)
+
+    A = pgv.AGraph()
+    with pytest.raises(RuntimeError, match="busy"):
+        A.read(Reentrant(b"graph { a }"))
+    A = pgv.AGraph(data={1: [2]})
+    with pytest.raises(RuntimeError, match="busy"):
+        A.write(Reentrant())
+    A.read(io.BytesIO(b"graph { a }"))  # and Graphviz is usable afterwards
+    assert A.nodes() == ["a"]
+
+
+def test_read_graphs_in_sequence():
+    # a reader continues where the previous graph ended
+    reader = pgv.graphviz.agreader(io.BytesIO(b"graph a { x }\ndigraph b { y -> z }\n"))
+    first = pgv.AGraph(handle=pgv.graphviz.agreadnext(reader))
+    second = pgv.AGraph(handle=pgv.graphviz.agreadnext(reader))
+    assert first.name == "a" and first.nodes() == ["x"]
+    assert second.name == "b" and second.edges() == [("y", "z")]
+    assert pgv.graphviz.agreadnext(reader) is None
+    first._owns_handle = second._owns_handle = True  # close them
+
+
+def test_iter_graphs(tmp_path):
+    graphs = [pgv.AGraph(data={i: [i + 1]}, name=f"g{i}") for i in range(50)]
+    path = tmp_path / "many.dot.gz"
+    with pgv.agraph._open_path(path, "wb") as fh:
+        for G in graphs:
+            G.write(fh)
+    read = list(pgv.iter_graphs(path))
+    assert [G.name for G in read] == [f"g{i}" for i in range(50)]
+    assert read[7].edges() == [("7", "8")]
+    assert list(pgv.iter_graphs(io.StringIO(""))) == []
+
+
+def test_iter_graphs_lazy():
+    data = io.StringIO("graph a { x }\ngraph b { y }\ngraph { -- }\n")
+    graphs = pgv.iter_graphs(data)
+    assert next(graphs).name == "a"
+    assert data.tell() == len(data.getvalue())  # read, but not parsed
+    assert next(graphs).name == "b"
+    with pytest.raises(pgv.DotError):
+        next(graphs)
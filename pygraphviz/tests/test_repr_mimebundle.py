@@ -23,3 +23,13 @@ def test_svg_repr_error():
     with pytest.raises(AttributeError):
         A = pgv.AGraph()
         A._svg_repr()
+
+
+def test_svg_repr_cached():
+    A = pgv.AGraph()
+    A.add_path([1, 2, 3])
+    A.layout()
+    svg = A._svg_repr()
+    assert A._svg_repr() is svg
+    A.get_node(1).attr["color"] = "red"
+    assert A._svg_repr() != svg
@@ -0,0 +1,53 @@
+import pytest
+
+import pygraphviz as pgv
+
+
+def test_to_csr_directed():
+    A = pgv.AGraph(directed=True, strict=False)
+    A.add_edges_from([("a", "b"), ("b", "c"), ("c", "a"), ("a", "c"), ("a", "a")])
+    A.add_node("d")
+    indptr, indices, nodes, values = A.to_csr()
+    assert nodes == A.nodes() == ["a", "b", "c", "d"]
+    assert values == {}
+    assert indptr.tolist() == [0, 3, 4, 5, 5]
+    assert sorted(indices[0:3].tolist()) == [0, 1, 2]
+    assert indices[3:].tolist() == [2, 0]
+
+
+def test_to_csr_undirected_attrs():
+    A = pgv.AGraph()
+    A.add_edge(1, 2, weight=3)
+    A.add_edge(2, 3, weight="heavy")
+    A.add_edge(3, 3, weight="2abc")
+    indptr, indices, nodes, values = A.to_csr(["weight", "missing"], default=-1)
+    assert nodes == ["1", "2", "3"]
+    assert indptr.tolist() == [0, 1, 3, 5]
+    assert indices.tolist()[0:1] == [1]
+    assert sorted(indices.tolist()[1:3]) == [0, 2]
+    assert sorted(indices.tolist()[3:5]) == [1, 2]
+    assert values["weight"].tolist()[:1] == [3.0]
+    assert sorted(values["weight"].tolist()[1:3]) == [-1.0, 3.0]
+    assert values["weight"].tolist()[3:5] == [-1.0, -1.0]
+    assert values["missing"].tolist() == [-1.0] * 5
+
+
+def test_to_csr_subgraph():
+    A = pgv.AGraph(directed=True)
+    A.add_edges_from([(1, 2), (2, 3), (3, 4)])
+    S = A.add_subgraph([2, 3, 4], name="s")
+    indptr, indices, nodes, _ = S.to_csr()
+    assert nodes == ["2", "3", "4"]
+    assert indptr.tolist() == [0, 1, 2, 2]
+    assert indices.tolist() == [1, 2]
+
+
+def test_to_sparse():
+    pytest.importorskip("scipy")
+    A = pgv.AGraph(directed=True)
+    A.add_edge("a", "b", weight=2.5)
+    A.add_edge("b", "c")
+    M = A.to_sparse(weight="weight")
+    assert M.shape == (3, 3)
+    assert M.toarray().tolist() == [[0, 2.5, 0], [0, 0, 1.0], [0, 0, 0]]
+    assert A.to_sparse().sum() == 2
@@ -37,3 +37,38 @@ def test_string_representation_large():
 def test_bad_dot_input():
     with pytest.raises(pgv.DotError):
         A = pgv.AGraph(string="graph {1--1")
+
+
+def test_from_bytes():
+    A = pgv.AGraph(b"digraph { a -> b }")
+    assert A.directed and A.edges() == [("a", "b")]
+    B = pgv.AGraph(string='graph { charset="latin1"; "\xe9" -- b }'.encode("latin1"))
+    assert B.encoding == "latin1" and "\xe9" in B
+    B.from_string(b"graph { c }")
+    assert B.nodes() == ["c"]
+
+
+def test_from_string_charset():
+    A = pgv.AGraph('graph { charset=latin1; "\xe9" -- b }')
+    assert A.encoding == "latin1" and "\xe9" in A
+    assert "\xe9" in A.to_string()
+
+
+def test_from_string_charset_late(monkeypatch):
+    # a charset declared past the prefix that is looked at is still used
+    monkeypatch.setattr(pgv.agraph, "_SNIFF_SIZE", 12)
+    A = pgv.AGraph('graph { "\xe9" -- b; charset="latin1" }')
+    assert A.encoding == "latin1" and sorted(A.nodes()) == ["b", "\xe9"]
+
+
+def test_string_sniffing_bounded(monkeypatch):
+    monkeypatch.setattr(pgv.agraph, "_SNIFF_SIZE", 64)
+    A = pgv.AGraph("graph {" + " " * 100 + "a }")
+    assert A.nodes() == ["a"]
+    # with the opening brace past the prefix the string is still dot data
+    B = pgv.AGraph("graph " + "x" * 100 + " { a }")
+    assert (B.name, B.nodes()) == ("x" * 100, ["a"])
+    C = pgv.AGraph("/* " + "x" * 100 + " */\ngraph { a }")
+    assert C.nodes() == ["a"]
+    with pytest.raises(OSError):
+        pgv.AGraph("graph " + "x" * 100)
@@ -0,0 +1,56 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygraphviz as pgv
+
+
+def _graph(n, seed):
+    A = pgv.AGraph()
+    A.add_edges_from((i, (i * seed + 3) % n) for i in range(n))
+    A.add_edges_from((i, (i * (seed + 6) + 5) % n) for i in range(n))
+    return A
+
+
+def test_layout_releases_gil():
+    # This thread only runs while the layout thread blocks or releases the
+    # GIL: the switch interval is too long for it to be preempted.  So the
+    # counter advances during layout() only if the layout releases the GIL.
+    A = _graph(200, 7)
+    counter = [0]
+    progress = []
+
+    def work():
+        pgv.get_context()  # created here rather than during the layout
+        before = counter[0]
+        A.layout(prog="neato", attributes=False)
+        progress.append(counter[0] - before)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(60)
+    try:
+        thread = threading.Thread(target=work)
+        thread.start()
+        while thread.is_alive():
+            counter[0] += 1
+            time.sleep(0.001)
+        thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert progress[0] > 0
+
+
+def test_concurrent_layouts_and_renders():
+    # Graphviz calls are serialized internally; results from many threads
+    # match those of sequential calls.
+    graphs = [_graph(30, seed) for seed in range(2, 10)]
+
+    def run(A):
+        A.layout(prog="dot")
+        return [n.attr["pos"] for n in A], A.draw(format="svg", prog="dot")
+
+    expected = [run(A) for A in graphs]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(run, graphs))
+    assert results == expected